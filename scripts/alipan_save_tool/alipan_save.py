@@ -16,10 +16,13 @@ from __future__ import annotations
 import json
 import logging
 import os
+import queue
 import random
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import requests
@@ -33,6 +36,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger("alipan_save")
 
+# 自适应限速时 429 不计入 max_retries，但单个请求最多因限流重试这么多次
+MAX_THROTTLE_RETRIES = 20
+# 流水线复制：复制队列不满一批时最多等待的秒数；有列目录任务时主线程取新页的间隔
+PACK_WAIT_SECONDS = 1.0
+PAGE_POLL_SECONDS = 0.05
+# 异步任务连续查询失败（含查不到该任务）这么多次、或提交后超过这么多秒仍未结束，就放弃等待
+# （整体转存任务不设时长上限，见 _wait_whole_copy）
+ASYNC_TASK_MAX_ERRORS = 5
+ASYNC_TASK_MAX_WAIT = 3600.0
+
 
 def _ensure_file_logger(log_path: str) -> None:
     """把日志写入同目录文件（同时保留控制台输出）。
@@ -58,6 +71,10 @@ def _ensure_file_logger(log_path: str) -> None:
     root.addHandler(fh)
 
 
+class AuthError(RuntimeError):
+    """HTTP 401/403：token 过期或无权限，重试没有意义，调用方应直接抛给用户。"""
+
+
 @dataclass(frozen=True)
 class Secrets:
     access_token: str
@@ -72,10 +89,135 @@ class Secrets:
     target_folder_name: str = ""
     # v4/batch 单次请求里包含的 /file/copy 数量。
     batch_size: int = 500
+    # 逐层转存时同时进行的列目录/建目录/复制请求数。
+    concurrency: int = 4
+    # 每类接口（list / copy / createWithFolders / async_task）的初始速率（次/秒），<=0 表示不限速。
+    requests_per_second: float = 5.0
+    # 自适应限速：成功时逐步提速、遇到 429 减半，速率不超过 max_requests_per_second。
+    adaptive_rate: bool = True
+    max_requests_per_second: float = 50.0
+    # 断点续传日志路径：为空则为脚本同目录的 alipan_save.<share_id>.journal.jsonl。
+    journal_path: str = ""
+
+
+class RateLimiter:
+    """线程安全的令牌桶：所有请求共用一个实例控制整体请求速率（代替各处固定 sleep）。"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """AIMD 令牌桶：每次成功把速率加性提高（约每秒 +increase 次/秒），遇到 429 乘性降低并清空令牌。
+
+    同一时刻在途的请求常会一起收到 429，cooldown 秒内只降速一次；
+    速率在服务端限额附近呈锯齿状收敛。
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        *,
+        min_rate: float = 0.2,
+        max_rate: float = 50.0,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        super().__init__(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._last_cut = float("-inf")
+        self.throttled = 0
+
+    def on_success(self) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / max(1.0, self.rate))
+
+    def on_throttle(self, retry_after: float = 0.0) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self.throttled += 1
+            now = time.monotonic()
+            if now - self._last_cut >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_cut = now
+            # 负令牌 = 需要先等待：服务端给了 Retry-After 时按它暂停
+            self._tokens = min(self._tokens, -retry_after * self.rate, 0.0)
+
+
+ENDPOINT_CLASSES = ("list", "copy", "createWithFolders", "async_task")
+
+
+class EndpointRateLimiter:
+    """按接口类别各自限速：list / copy / createWithFolders / async_task 的限额互不影响，其余请求归入 default。"""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        *,
+        adaptive: bool = True,
+        max_rate: float = 50.0,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.adaptive = adaptive and rate > 0
+        self.max_rate = max_rate
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str) -> RateLimiter:
+        with self._lock:
+            limiter = self._limiters.get(endpoint)
+            if limiter is None:
+                if self.adaptive:
+                    limiter = AdaptiveRateLimiter(self.rate, self.burst, max_rate=self.max_rate)
+                else:
+                    limiter = RateLimiter(self.rate, self.burst)
+                self._limiters[endpoint] = limiter
+            return limiter
+
+    def describe(self) -> str:
+        with self._lock:
+            limiters = sorted(self._limiters.items())
+        return "，".join(f"{name}={limiter.rate:.1f}/s" for name, limiter in limiters if limiter.rate > 0)
 
 
 class AliPanApi:
-    def __init__(self, access_token: str, drive_id: str, *, base_url: str):
+    def __init__(
+        self,
+        access_token: str,
+        drive_id: str,
+        *,
+        base_url: str,
+        limiter: Optional[EndpointRateLimiter] = None,
+    ):
         token = access_token.strip()
         if token.lower().startswith("bearer "):
             # 避免用户把 "Bearer xxx" 整段贴进来，导致请求头变成 "Bearer Bearer xxx"。
@@ -84,7 +226,11 @@ class AliPanApi:
         self.base_url = base_url.rstrip("/")
         self.access_token = token
         self.drive_id = str(drive_id)
-        self.session = requests.Session()
+        self.limiter = limiter or EndpointRateLimiter(0)
+        # requests.Session 不保证线程安全：每个工作线程各用一个（连接池按线程复用）。
+        self._local = threading.local()
+        # 查询异步任务可用的方式："batch"（/adrive/v4/batch 合并查询）或 "get"（v2 GET 逐个查询）；None 表示尚未探测
+        self.async_task_endpoint: Optional[str] = None
 
         self.common_headers = {
             "Content-Type": "application/json",
@@ -97,6 +243,14 @@ class AliPanApi:
             ),
         }
 
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
     def _request_json(
         self,
         method: str,
@@ -106,6 +260,7 @@ class AliPanApi:
         json_body: Optional[Dict[str, Any]] = None,
         max_retries: int = 5,
         timeout: int = 30,
+        endpoint: str = "default",
     ) -> Dict[str, Any]:
         url = path if path.startswith("http") else f"{self.base_url}{path}"
         req_headers = dict(self.common_headers)
@@ -117,8 +272,14 @@ class AliPanApi:
                 else:
                     req_headers[k] = v
 
+        limiter = self.limiter.get(endpoint)
+        adaptive = isinstance(limiter, AdaptiveRateLimiter)
         last_err: Optional[BaseException] = None
-        for attempt in range(1, max_retries + 1):
+        attempt = 0
+        throttled = 0
+        while attempt < max_retries:
+            attempt += 1
+            limiter.acquire()
             try:
                 resp: Response = self.session.request(
                     method,
@@ -133,6 +294,8 @@ class AliPanApi:
                     raise RequestException(f"HTTP {resp.status_code}", response=resp)
 
                 resp.raise_for_status()
+                if adaptive:
+                    limiter.on_success()
                 return resp.json()
 
             except RequestException as e:
@@ -155,7 +318,7 @@ class AliPanApi:
                         except Exception:
                             payload = {}
                         if payload.get("code") == "ForbiddenDriveLocked":
-                            raise RuntimeError(
+                            raise AuthError(
                                 "网盘被锁定（ForbiddenDriveLocked）。需要你先在官方网页/客户端解锁网盘后才能调用写入类 API（创建文件夹/转存）。\n"
                                 "处理方法：\n"
                                 "1) 打开 https://www.alipan.com/ 并登录\n"
@@ -164,7 +327,7 @@ class AliPanApi:
                                 f"响应: {body[:500]}"
                             )
 
-                    raise RuntimeError(
+                    raise AuthError(
                         f"鉴权失败(HTTP {status})。通常是 access_token 过期/退出登录导致。\n"
                         "请按以下步骤更新配置里的 access_token：\n"
                         "1) 打开 https://www.alipan.com/ 并登录\n"
@@ -174,6 +337,14 @@ class AliPanApi:
                         f"响应: {body[:500]}"
                     ) from e
 
+                if status == 429 and adaptive and throttled < MAX_THROTTLE_RETRIES:
+                    # 自适应限速：429 交给该类接口的令牌桶降速，不计入重试次数，也不再额外 sleep
+                    throttled += 1
+                    attempt -= 1
+                    limiter.on_throttle(_retry_after(err_resp))
+                    logger.info("限流(429 %s)，%s 接口降速至 %.2f 次/秒", path, endpoint, limiter.rate)
+                    continue
+
                 # 退避时间（带抖动），尽量避免一直撞 429。
                 base = 1.0 if status == 429 else 0.8
                 backoff = base * (2 ** (attempt - 1))
@@ -234,6 +405,19 @@ class AliPanApi:
         limit: int = 200,
     ) -> List[Dict[str, Any]]:
         items: List[Dict[str, Any]] = []
+        for page in self.iter_files_by_share(share_id, share_token, parent_file_id, limit=limit):
+            items.extend(page)
+        return items
+
+    def iter_files_by_share(
+        self,
+        share_id: str,
+        share_token: str,
+        parent_file_id: str,
+        *,
+        limit: int = 200,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """逐页列出分享目录：每拿到一页就产出，调用方可以边列边复制。"""
         marker: Optional[str] = None
         while True:
             body: Dict[str, Any] = {
@@ -252,12 +436,12 @@ class AliPanApi:
                 headers={"Authorization": None, "X-Share-Token": share_token},
                 json_body=body,
                 max_retries=5,
+                endpoint="list",
             )
-            items.extend(resp.get("items", []) or [])
+            yield resp.get("items", []) or []
             marker = resp.get("next_marker")
             if not marker:
                 break
-        return items
 
     def create_folder(
         self,
@@ -277,6 +461,7 @@ class AliPanApi:
                 "type": "folder",
             },
             max_retries=5,
+            endpoint="createWithFolders",
         )
 
     def batch_copy_one(
@@ -305,6 +490,7 @@ class AliPanApi:
                 "resource": "file",
             },
             max_retries=3,
+            endpoint="copy",
         )
         responses = resp.get("responses") or []
         if not responses:
@@ -317,15 +503,33 @@ class AliPanApi:
         share_token: str,
         file_ids: List[str],
         to_parent_file_id: str,
+        *,
+        auto_rename: bool = True,
+    ) -> List[Dict[str, Any]]:
+        return self.batch_copy_items(
+            share_id,
+            share_token,
+            [(fid, to_parent_file_id) for fid in file_ids],
+            auto_rename=auto_rename,
+        )
+
+    def batch_copy_items(
+        self,
+        share_id: str,
+        share_token: str,
+        items: List[Tuple[str, str]],
+        *,
+        auto_rename: bool = True,
     ) -> List[Dict[str, Any]]:
+        """一次 v4/batch 复制多个 (file_id, 目标目录)：每个子请求各带 to_parent_file_id，可跨目录打包。"""
         requests_data: List[Dict[str, Any]] = []
-        for idx, fid in enumerate(file_ids):
+        for idx, (fid, to_parent_file_id) in enumerate(items):
             requests_data.append(
                 {
                     "body": {
                         "file_id": fid,
                         "share_id": share_id,
-                        "auto_rename": True,
+                        "auto_rename": auto_rename,
                         "to_parent_file_id": to_parent_file_id,
                         "to_drive_id": self.drive_id,
                     },
@@ -342,43 +546,364 @@ class AliPanApi:
             headers={"X-Share-Token": share_token},
             json_body={"requests": requests_data, "resource": "file"},
             max_retries=3,
+            endpoint="copy",
         )
         return resp.get("responses") or []
 
     def check_async_task(self, async_task_id: str) -> Dict[str, Any]:
-        # 先尝试“batch + /async_task/get”（不少脚本这样用）；失败则回退到 v2 GET 端点。
-        try:
-            resp = self._request_json(
-                "POST",
-                "/adrive/v4/batch",
-                json_body={
-                    "requests": [
-                        {
-                            "body": {"async_task_id": async_task_id},
-                            "headers": {"Content-Type": "application/json"},
-                            "id": async_task_id,
-                            "method": "POST",
-                            "url": "/async_task/get",
-                        }
-                    ],
-                    "resource": "file",
-                },
-                max_retries=3,
-            )
-            responses = resp.get("responses") or []
-            if not responses:
-                return {"state": "Unknown", "raw": resp}
-            return responses[0].get("body") or {"state": "Unknown", "raw": responses[0]}
-        except Exception:
-            resp2 = self._request_json(
-                "GET",
-                f"/v2/async_task/get?async_task_id={async_task_id}",
-                max_retries=3,
-            )
-            if "state" not in resp2 and "status" in resp2:
-                resp2 = dict(resp2)
-                resp2["state"] = resp2.get("status")
-            return resp2
+        return self.check_async_tasks([async_task_id])[async_task_id]
+
+    def check_async_tasks(self, async_task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量查询异步任务状态：优先一次 batch 请求带上全部 /async_task/get；不可用则逐个走 v2 GET 端点。
+
+        第一次探测后记住可用的方式，之后不再为失败的 batch 调用付出一次请求。
+        """
+        ids = [str(task_id) for task_id in async_task_ids]
+        results: Dict[str, Dict[str, Any]] = {}
+        if ids and self.async_task_endpoint != "get":
+            probing = self.async_task_endpoint is None
+            try:
+                resp = self._request_json(
+                    "POST",
+                    "/adrive/v4/batch",
+                    json_body={
+                        "requests": [
+                            {
+                                "body": {"async_task_id": task_id},
+                                "headers": {"Content-Type": "application/json"},
+                                "id": task_id,
+                                "method": "POST",
+                                "url": "/async_task/get",
+                            }
+                            for task_id in ids
+                        ],
+                        "resource": "file",
+                    },
+                    # 探测时不重试：不支持时尽快回退
+                    max_retries=1 if probing else 3,
+                    endpoint="async_task",
+                )
+                for r in resp.get("responses") or []:
+                    body = r.get("body") or {}
+                    if str(r.get("id")) in ids and body.get("state"):
+                        results[str(r["id"])] = body
+                if probing and not results:
+                    raise RuntimeError(f"batch 响应中没有任务状态：{str(resp)[:200]}")
+                if probing:
+                    self.async_task_endpoint = "batch"
+                    logger.info("异步任务查询：使用 batch 合并查询")
+            except AuthError:
+                raise
+            except Exception as e:
+                if not probing:
+                    raise
+                self.async_task_endpoint = "get"
+                logger.info("异步任务查询：batch 不可用（%s），改用 GET /v2/async_task/get", str(e)[:200])
+        for task_id in ids:
+            if task_id not in results:
+                results[task_id] = self._get_async_task(task_id)
+        return results
+
+    def _get_async_task(self, async_task_id: str) -> Dict[str, Any]:
+        resp = self._request_json(
+            "GET",
+            f"/v2/async_task/get?async_task_id={async_task_id}",
+            max_retries=3,
+            endpoint="async_task",
+        )
+        if "state" not in resp and "status" in resp:
+            resp = dict(resp)
+            resp["state"] = resp.get("status")
+        return resp
+
+
+ASYNC_DONE_STATES = ("Succeed", "Failed", "Cancelled")
+
+
+class AsyncTaskManager:
+    """集中轮询异步任务：后台线程把到期的 async_task_id 合并成一次查询，完成后设置对应 Future 的结果（任务 body）。
+
+    轮询间隔与任务年龄成正比（age * age_factor，限制在 [min_interval, max_interval]）：
+    刚提交的任务很快再查，跑了很久的大任务查得越来越稀；即将到期的任务顺带一起查，尽量凑成一批。
+
+    查不到结果时不会无限等下去：某个任务连续 max_errors 次查询失败（请求异常或响应里没有它的状态，
+    如任务 id 已过期）、或提交后超过 max_wait 秒仍未结束，它的 Future 以异常结束；
+    鉴权失败（AuthError）时所有任务立即以该异常结束，由调用方提示用户更新 token。
+    """
+
+    def __init__(
+        self,
+        api: AliPanApi,
+        *,
+        min_interval: float = 1.0,
+        max_interval: float = 30.0,
+        age_factor: float = 0.2,
+        batch_limit: int = 50,
+        max_errors: int = ASYNC_TASK_MAX_ERRORS,
+        max_wait: Optional[float] = ASYNC_TASK_MAX_WAIT,
+    ):
+        self.api = api
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.age_factor = age_factor
+        self.batch_limit = max(1, batch_limit)
+        self.max_errors = max(1, max_errors)
+        self.max_wait = max_wait
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def __enter__(self) -> "AsyncTaskManager":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def submit(self, async_task_id: str) -> Future:
+        task_id = str(async_task_id)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("异步任务轮询已停止")
+            task = self._tasks.get(task_id)
+            if task is None:
+                now = time.monotonic()
+                task = {"future": Future(), "started": now, "next": now + self.min_interval, "errors": 0}
+                self._tasks[task_id] = task
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="alipan-async-task", daemon=True)
+                    self._thread.start()
+                self._cond.notify()
+            return task["future"]
+
+    def wait(self, async_task_id: str) -> Dict[str, Any]:
+        return self.submit(async_task_id).result()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            for task in self._tasks.values():
+                task["future"].cancel()
+            self._tasks.clear()
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _interval(self, age: float) -> float:
+        return min(self.max_interval, max(self.min_interval, age * self.age_factor))
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and not self._tasks:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                now = time.monotonic()
+                first = min(task["next"] for task in self._tasks.values())
+                if first > now:
+                    self._cond.wait(first - now)
+                    continue
+                slack = now + self.min_interval / 2
+                due = sorted(
+                    (task_id for task_id, task in self._tasks.items() if task["next"] <= slack),
+                    key=lambda task_id: self._tasks[task_id]["next"],
+                )[: self.batch_limit]
+
+            error: Optional[Exception] = None
+            try:
+                states = self.api.check_async_tasks(due)
+            except AuthError as e:
+                self._fail_all(e)
+                continue
+            except Exception as e:
+                logger.warning("查询异步任务失败，稍后重试：%s", str(e)[:300])
+                states, error = {}, e
+
+            with self._cond:
+                now = time.monotonic()
+                for task_id in due:
+                    task = self._tasks.get(task_id)
+                    if task is None:
+                        continue
+                    state = states.get(task_id) or {}
+                    if state.get("state") in ASYNC_DONE_STATES:
+                        del self._tasks[task_id]
+                        task["future"].set_result(state)
+                        continue
+                    task["errors"] = 0 if state.get("state") else task["errors"] + 1
+                    age = now - task["started"]
+                    if task["errors"] >= self.max_errors:
+                        reason = error or RuntimeError(f"查询不到异步任务状态：{str(state)[:200]}")
+                        self._fail(task_id, RuntimeError(f"异步任务 {task_id} 连续 {task['errors']} 次查询失败：{reason}"))
+                    elif self.max_wait is not None and age >= self.max_wait:
+                        self._fail(task_id, TimeoutError(f"异步任务 {task_id} 已等待 {age:.0f}s 仍未结束"))
+                    else:
+                        task["next"] = now + self._interval(age)
+
+    def _fail(self, task_id: str, error: BaseException) -> None:
+        """持有 _cond 时调用：移除任务并让等待它的调用方收到异常。"""
+        task = self._tasks.pop(task_id)
+        logger.warning("放弃等待异步任务：%s", str(error)[:300])
+        task["future"].set_exception(error)
+
+    def _fail_all(self, error: BaseException) -> None:
+        with self._cond:
+            for task in self._tasks.values():
+                task["future"].set_exception(error)
+            self._tasks.clear()
+
+
+class TransferJournal:
+    """JSON-lines 转存日志：中途退出（token 过期、关掉窗口）后重新运行，从断点继续。
+
+    每行一个事件，追加写入并立即 flush：
+    - target：分享 id、源目录、目标父目录 -> 目标目录（重跑时复用，不再新建自动重命名的目录）
+    - whole：整体转存的异步任务 id
+    - folder：源目录 -> 已创建的目标目录
+    - listed：已列出的目录内容（文件 id、子目录 id/名称），重跑时不再列出
+    - batch / copied：提交的复制批次（可跨目录，逐文件记目标目录）与逐文件结果（pending 为返回 202、等待异步任务的文件）；
+      只有 batch 没有 copied 的批次、以及异步任务没等到结果的文件状态未知
+    - done：全部完成
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset_state()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        # 进程被杀时最后一行可能不完整
+                        continue
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def _reset_state(self) -> None:
+        self.target: Optional[Dict[str, Any]] = None
+        self.whole_task: Optional[str] = None
+        self.done = False
+        self.folders: Dict[str, str] = {}
+        self.listings: Dict[str, Tuple[List[str], List[Dict[str, str]]]] = {}
+        self.copied: set = set()
+        self.failed: set = set()
+        self.unknown_batches: Dict[int, List[Tuple[str, str]]] = {}
+        # 复制返回 202 的文件：file_id -> 目标目录，等异步任务结束后再记结果
+        self.pending_files: Dict[str, str] = {}
+        self._next_batch = 0
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        kind = event.get("type")
+        if kind == "target":
+            self.target = event
+        elif kind == "whole":
+            self.whole_task = event.get("task")
+        elif kind == "folder":
+            self.folders[event["source"]] = event["target"]
+        elif kind == "listed":
+            self.listings[event["source"]] = (list(event["files"]), list(event["folders"]))
+        elif kind == "batch":
+            files = list(event["files"])
+            targets = event.get("targets") or [event.get("target")] * len(files)
+            self.unknown_batches[event["batch"]] = list(zip(files, targets))
+            self._next_batch = max(self._next_batch, event["batch"] + 1)
+        elif kind == "copied":
+            self.unknown_batches.pop(event["batch"], None)
+            self.copied.update(event["ok"])
+            self.failed.difference_update(event["ok"])
+            self.failed.update(event["failed"])
+            for fid in event["ok"] + event["failed"]:
+                self.pending_files.pop(fid, None)
+            self.pending_files.update(event.get("pending") or {})
+        elif kind == "done":
+            self.done = True
+
+    def _append(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self._apply(event)
+            self._fh.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._fh.flush()
+
+    def matches(self, share_id: str, source_id: str, parent_id: str) -> bool:
+        target = self.target or {}
+        return (
+            target.get("share") == share_id
+            and target.get("source") == source_id
+            and target.get("parent") == parent_id
+        )
+
+    def reset(self) -> None:
+        """分享/源目录/目标父目录变了：清空旧日志重新开始。"""
+        with self._lock:
+            self._fh.close()
+            self._fh = open(self.path, "w", encoding="utf-8")
+            self._reset_state()
+
+    @property
+    def has_progress(self) -> bool:
+        return bool(self.listings or self.folders or self.copied or self.unknown_batches or self.pending_files)
+
+    def record_target(self, share_id: str, source_id: str, parent_id: str, target_id: str) -> None:
+        self._append({"type": "target", "share": share_id, "source": source_id, "parent": parent_id, "target": target_id})
+
+    def record_whole_task(self, task_id: str) -> None:
+        self._append({"type": "whole", "task": task_id})
+
+    def record_folder(self, source_id: str, target_id: str) -> None:
+        self._append({"type": "folder", "source": source_id, "target": target_id})
+
+    def record_listing(self, source_id: str, file_ids: List[str], folders: List[Dict[str, str]]) -> None:
+        self._append({"type": "listed", "source": source_id, "files": file_ids, "folders": folders})
+
+    def begin_batch(self, items: List[Tuple[str, str]]) -> int:
+        with self._lock:
+            batch_id = self._next_batch
+            self._next_batch += 1
+        self._append({
+            "type": "batch",
+            "batch": batch_id,
+            "files": [fid for fid, _ in items],
+            "targets": [target_id for _, target_id in items],
+        })
+        return batch_id
+
+    def finish_batch(
+        self,
+        batch_id: int,
+        ok_ids: List[str],
+        failed_ids: List[str],
+        pending: Optional[Dict[str, str]] = None,
+    ) -> None:
+        event: Dict[str, Any] = {"type": "copied", "batch": batch_id, "ok": ok_ids, "failed": failed_ids}
+        if pending:
+            event["pending"] = pending
+        self._append(event)
+
+    def unconfirmed(self) -> List[Tuple[str, str]]:
+        """状态未知、需要以 auto_rename=false 重新确认的 (file_id, 目标目录)。"""
+        with self._lock:
+            items: Dict[str, str] = {}
+            for batch in self.unknown_batches.values():
+                items.update(batch)
+            items.update(self.pending_files)
+            return [(fid, target_id) for fid, target_id in items.items() if fid not in self.copied]
+
+    def record_done(self) -> None:
+        self._append({"type": "done"})
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+def _retry_after(resp: Optional[Response]) -> float:
+    """429 响应的 Retry-After（秒）；没有或无法解析时返回 0。"""
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After") or 0)) if resp is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
 
 
 def extract_ids_from_link(share_link: str) -> Tuple[str, Optional[str]]:
@@ -404,87 +929,295 @@ def save_shared_folder(
     target_folder_id: str,
     *,
     batch_size: int,
+    concurrency: int = 4,
+    journal: Optional[TransferJournal] = None,
 ) -> None:
-    """转存分享目录：优先整体转存；失败则递归逐层转存。"""
+    """转存分享目录：优先整体转存；失败则并发逐层转存。给定 journal 时记录进度并从断点继续。"""
 
-    # 1) 优先整体转存（异步任务）
-    try:
-        res0 = api.batch_copy_one(share_id, share_token, source_folder_id, target_folder_id)
-        if res0.get("status") == 202:
-            body = res0.get("body") or {}
-            async_task_id = body.get("async_task_id")
-            if async_task_id:
-                while True:
-                    task = api.check_async_task(str(async_task_id))
-                    state = task.get("state")
-                    if state == "Succeed":
-                        logger.info("整体转存成功：total_process=%s", task.get("total_process"))
-                        return
-                    if state in ("Failed", "Cancelled"):
-                        logger.warning("整体转存失败：%s", str(task)[:500])
-                        break
-                    time.sleep(1)
-        elif res0.get("status") == 201:
-            logger.info("整体转存返回201，视为成功")
+    # 1) 优先整体转存（异步任务）。已有逐层转存进度时直接续传，避免整体再复制一份
+    if journal is not None and journal.whole_task and not journal.has_progress:
+        logger.info("续传：检查上次的整体转存任务 %s", journal.whole_task)
+        if _wait_whole_copy(api, journal.whole_task):
             return
-        else:
-            logger.warning("整体转存未成功：%s", str(res0)[:500])
+    elif journal is not None and journal.has_progress:
+        logger.info(
+            "续传：已列出目录 %d 个、已复制文件 %d 个，跳过整体转存",
+            len(journal.listings),
+            len(journal.copied),
+        )
+    else:
+        try:
+            res0 = api.batch_copy_one(share_id, share_token, source_folder_id, target_folder_id)
+            if res0.get("status") == 202:
+                body = res0.get("body") or {}
+                async_task_id = body.get("async_task_id")
+                if async_task_id:
+                    if journal is not None:
+                        journal.record_whole_task(str(async_task_id))
+                    if _wait_whole_copy(api, str(async_task_id)):
+                        return
+            elif res0.get("status") == 201:
+                logger.info("整体转存返回201，视为成功")
+                return
+            else:
+                logger.warning("整体转存未成功：%s", str(res0)[:500])
+        except AuthError:
+            raise
+        except Exception as e:
+            logger.warning("整体转存发生异常，将回退递归：%s", str(e))
+
+    # 2) 回退：并发逐层转存（列目录 / 建目录 / 批量复制文件都进同一个线程池，速率由 api.limiter 控制）
+    copy_tree(
+        api,
+        share_id,
+        share_token,
+        source_folder_id,
+        target_folder_id,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        journal=journal,
+    )
+
+
+def _wait_whole_copy(api: AliPanApi, async_task_id: str) -> bool:
+    """等待整体转存的异步任务；成功返回 True，失败/取消/查不到结果返回 False（回退逐层转存）。鉴权失败直接抛出。"""
+    try:
+        # 整体任务可能跑很久：只在连续查询失败时放弃，不设总时长上限。
+        # 任务仍在运行时回退逐层转存会把同一批文件再复制一遍
+        with AsyncTaskManager(api, max_wait=None) as tasks:
+            task = tasks.wait(async_task_id)
+    except AuthError:
+        raise
     except Exception as e:
-        logger.warning("整体转存发生异常，将回退递归：%s", str(e))
+        logger.warning("整体转存任务查不到结果，将回退递归：%s", str(e)[:500])
+        return False
+    if task.get("state") == "Succeed":
+        logger.info("整体转存成功：total_process=%s", task.get("total_process"))
+        return True
+    logger.warning("整体转存失败：%s", str(task)[:500])
+    return False
 
-    # 2) 回退：逐层列目录 + 批量拷贝文件 + 递归拷贝子目录
-    items = api.list_files_by_share(share_id, share_token, source_folder_id)
-    if not items:
-        logger.info("目录为空或无法列出：source_folder_id=%s", source_folder_id)
-        return
 
-    files: List[Dict[str, Any]] = []
-    folders: List[Dict[str, Any]] = []
-    for it in items:
-        if it.get("type") == "folder":
-            folders.append(it)
-        else:
-            files.append(it)
-
-    if files:
-        file_ids = [str(f["file_id"]) for f in files if f.get("file_id")]
-        ok = 0
-        fail = 0
-        for i in range(0, len(file_ids), max(1, batch_size)):
-            chunk = file_ids[i : i + batch_size]
-            responses = api.batch_copy_many(share_id, share_token, chunk, target_folder_id)
-            for r in responses:
-                if r.get("status") == 201:
-                    ok += 1
-                else:
-                    fail += 1
-            logger.info(
-                "复制文件进度：%d/%d（成功=%d 失败=%d）",
-                min(i + batch_size, len(file_ids)),
-                len(file_ids),
-                ok,
-                fail,
-            )
-            time.sleep(0.2)
+def _rate_note(api: AliPanApi) -> str:
+    limiter = getattr(api, "limiter", None)
+    rates = limiter.describe() if isinstance(limiter, EndpointRateLimiter) else ""
+    return f" 速率：{rates}" if rates else ""
+
 
-    for fd in folders:
-        name = str(fd.get("name") or "")
-        fid = str(fd.get("file_id") or "")
-        if not name or not fid:
-            continue
+def copy_tree(
+    api: AliPanApi,
+    share_id: str,
+    share_token: str,
+    source_folder_id: str,
+    target_folder_id: str,
+    *,
+    batch_size: int,
+    concurrency: int,
+    journal: Optional[TransferJournal] = None,
+) -> None:
+    """广度优先并发转存，列目录与复制流水线进行：同层的兄弟目录同时列出，子目录创建与文件复制并行提交。
+
+    任务都在线程池里执行，主线程负责调度：
+    - 列目录：逐页把内容交回主线程（不等整个目录列完）；文件进入全局复制队列，子目录立即交给建目录任务
+    - 建目录：完成后列出对应的源目录
+    - 复制：队列攒满 batch_size 个文件（可来自不同目录）就提交一批；没有列目录/建目录任务在进行、
+      或队列里最早的文件已等待 PACK_WAIT_SECONDS 秒时，不满一批也提交
+    - 返回 202 的文件交给 AsyncTaskManager 合并轮询，任务结束后再计入
+    给定 journal 时：已列出的目录、已创建的目录直接取日志，已复制成功的文件不再复制；
+    上次提交后没有结果的批次/异步任务以 auto_rename=false 重新提交（已存在的同名文件不会多出一份）。
+    任一任务抛出异常时取消尚未开始的任务并向上抛出。
+    """
 
-        new_folder = api.create_folder(target_folder_id, name)
+    batch_size = max(1, batch_size)
+    stats = {"folders": 0, "files": 0, "ok": 0, "fail": 0, "resumed": 0, "batches": 0}
+    pending: Dict[Future, Tuple[str, Any]] = {}
+    # 列目录任务逐页放入 (源目录, 目标目录, 文件 id 列表, 子目录列表)
+    pages: "queue.Queue[Tuple[str, str, List[str], List[Dict[str, str]]]]" = queue.Queue()
+    # 全局复制队列：(file_id, 目标目录)
+    buffer: List[Tuple[str, str]] = []
+    buffer_since = 0.0
+    unconfirmed = journal.unconfirmed() if journal is not None else []
+    unknown_ids = {fid for fid, _ in unconfirmed}
+    # 本次开始前已复制成功的文件（续传时跳过）；本次重新确认的文件不在其中
+    copied_before = set(journal.copied) if journal is not None else set()
+
+    def split_items(items: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, str]]]:
+        file_ids: List[str] = []
+        folders: List[Dict[str, str]] = []
+        for it in items:
+            if it.get("type") == "folder":
+                name = str(it.get("name") or "")
+                fid = str(it.get("file_id") or "")
+                if name and fid:
+                    folders.append({"file_id": fid, "name": name})
+            elif it.get("file_id"):
+                file_ids.append(str(it["file_id"]))
+        return file_ids, folders
+
+    def list_task(source_id: str, target_id: str) -> int:
+        """逐页列出并把每页交给主线程；返回条目数。整个目录列完才写入 journal。"""
+        if journal is not None and source_id in journal.listings:
+            file_ids, folders = journal.listings[source_id]
+            pages.put((source_id, target_id, file_ids, folders))
+            return len(file_ids) + len(folders)
+        all_files: List[str] = []
+        all_folders: List[Dict[str, str]] = []
+        for page in api.iter_files_by_share(share_id, share_token, source_id):
+            file_ids, folders = split_items(page)
+            pages.put((source_id, target_id, file_ids, folders))
+            all_files.extend(file_ids)
+            all_folders.extend(folders)
+        if journal is not None:
+            journal.record_listing(source_id, all_files, all_folders)
+        return len(all_files) + len(all_folders)
+
+    def copy_task(
+        items: List[Tuple[str, str]], auto_rename: bool = True
+    ) -> Tuple[int, int, Optional[int], Dict[str, List[str]]]:
+        """返回 (成功数, 失败数, 批次号, {async_task_id: [file_id]})。"""
+        batch_id = journal.begin_batch(items) if journal is not None else None
+        responses = api.batch_copy_items(share_id, share_token, items, auto_rename=auto_rename)
+        ok_ids: List[str] = []
+        waiting: Dict[str, List[str]] = {}
+        waiting_targets: Dict[str, str] = {}
+        for idx, r in enumerate(responses):
+            try:
+                fid, target_id = items[int(r.get("id", idx))]
+            except (TypeError, ValueError, IndexError):
+                continue
+            # 不自动重命名时 409 表示目标里已有同名文件，即上次已经复制成功
+            if r.get("status") == 201 or (not auto_rename and r.get("status") == 409):
+                ok_ids.append(fid)
+            elif r.get("status") == 202 and (r.get("body") or {}).get("async_task_id"):
+                waiting.setdefault(str(r["body"]["async_task_id"]), []).append(fid)
+                waiting_targets[fid] = target_id
+        settled = set(ok_ids) | set(waiting_targets)
+        failed_ids = [fid for fid, _ in items if fid not in settled]
+        if journal is not None and batch_id is not None:
+            journal.finish_batch(batch_id, ok_ids, failed_ids, waiting_targets)
+        return len(ok_ids), len(failed_ids), batch_id, waiting
+
+    def create_task(target_parent_id: str, name: str, source_id: str) -> str:
+        if journal is not None and source_id in journal.folders:
+            return journal.folders[source_id]
+        # 同一目录下的子目录名不会重复：refuse 模式下已存在时直接返回它，
+        # 进程在建好目录、写入 journal 之前被杀时，重跑不会多建一份
+        new_folder = api.create_folder(target_parent_id, name, check_name_mode="refuse")
         new_id = str(new_folder.get("file_id"))
-        logger.info("创建文件夹：%s -> %s", name, new_id)
-        save_shared_folder(
-            api,
-            share_id,
-            share_token,
-            fid,
-            new_id,
-            batch_size=batch_size,
-        )
-        time.sleep(0.1)
+        if journal is not None:
+            journal.record_folder(source_id, new_id)
+        return new_id
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, concurrency), thread_name_prefix="alipan"
+    ) as executor, AsyncTaskManager(api) as tasks:
+
+        def submit(kind: str, context: Any, fn, *args) -> None:
+            pending[executor.submit(fn, *args)] = (kind, context)
+
+        def submit_copy(items: List[Tuple[str, str]], auto_rename: bool = True) -> None:
+            stats["batches"] += 1
+            submit("copy", None, copy_task, items, auto_rename)
+
+        def discovering() -> bool:
+            return any(kind in ("list", "create") for kind, _ in pending.values())
+
+        for i in range(0, len(unconfirmed), batch_size):
+            chunk = unconfirmed[i : i + batch_size]
+            logger.info("续传：重新确认上次未返回结果的文件（%d 个）", len(chunk))
+            stats["files"] += len(chunk)
+            submit_copy(chunk, False)
+
+        submit("list", source_folder_id, list_task, source_folder_id, target_folder_id)
+        while pending or buffer:
+            done: set = set()
+            if pending:
+                # 有列目录任务时定期醒来取新的一页；否则等任意任务完成
+                timeout = PAGE_POLL_SECONDS if discovering() else None
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, context = pending.pop(future)
+                try:
+                    result = future.result()
+                except BaseException as e:
+                    if kind != "task" or isinstance(e, AuthError):
+                        for other in pending:
+                            other.cancel()
+                        raise
+                    # 异步任务查不到结果（id 过期、超时）：这些文件按失败计；journal 里仍是待确认，重跑时重新确认
+                    logger.warning("异步任务没有结果，%d 个文件按失败计：%s", len(context[1]), str(e)[:300])
+                    result = None
+
+                if kind == "list":
+                    stats["folders"] += 1
+                    if not result:
+                        logger.info("目录为空或无法列出：source_folder_id=%s", context)
+                elif kind == "create":
+                    source_id, name = context
+                    logger.info("创建文件夹：%s -> %s", name, result)
+                    submit("list", source_id, list_task, source_id, result)
+                else:
+                    if kind == "copy":
+                        ok, fail, batch_id, waiting = result
+                        for task_id, file_ids in waiting.items():
+                            future = tasks.submit(task_id)
+                            if future in pending:
+                                pending[future][1][1].extend(file_ids)
+                            else:
+                                pending[future] = ("task", (batch_id, list(file_ids)))
+                    else:
+                        batch_id, file_ids = context
+                        succeeded = result is not None and result.get("state") == "Succeed"
+                        ok, fail = (len(file_ids), 0) if succeeded else (0, len(file_ids))
+                        if journal is not None and batch_id is not None and result is not None:
+                            journal.finish_batch(batch_id, file_ids if succeeded else [], [] if succeeded else file_ids)
+                    stats["ok"] += ok
+                    stats["fail"] += fail
+                    logger.info(
+                        "复制文件进度：%d/%d（成功=%d 失败=%d，已列出目录 %d，已提交批次 %d，进行中任务 %d）%s",
+                        stats["ok"] + stats["fail"],
+                        stats["files"],
+                        stats["ok"],
+                        stats["fail"],
+                        stats["folders"],
+                        stats["batches"],
+                        len(pending),
+                        _rate_note(api),
+                    )
+
+            # 列目录任务结束前放入的页一定已在队列里：先处理完成的任务再取页，不会漏掉尾页
+            while True:
+                try:
+                    source_id, target_id, file_ids, folders = pages.get_nowait()
+                except queue.Empty:
+                    break
+                if copied_before or unknown_ids:
+                    stats["resumed"] += sum(1 for fid in file_ids if fid in copied_before)
+                    file_ids = [fid for fid in file_ids if fid not in copied_before and fid not in unknown_ids]
+                stats["files"] += len(file_ids)
+                if file_ids and not buffer:
+                    buffer_since = time.monotonic()
+                buffer.extend((fid, target_id) for fid in file_ids)
+                for fd in folders:
+                    submit("create", (fd["file_id"], fd["name"]), create_task, target_id, fd["name"], fd["file_id"])
+
+            while len(buffer) >= batch_size:
+                submit_copy(buffer[:batch_size])
+                del buffer[:batch_size]
+                buffer_since = time.monotonic()
+            if buffer and (not discovering() or time.monotonic() - buffer_since >= PACK_WAIT_SECONDS):
+                submit_copy(list(buffer))
+                buffer.clear()
+
+    logger.info(
+        "逐层转存结束：目录 %d 个，文件 %d 个，复制批次 %d 个（成功=%d 失败=%d）%s",
+        stats["folders"],
+        stats["files"],
+        stats["batches"],
+        stats["ok"],
+        stats["fail"],
+        f"，另有 {stats['resumed']} 个文件此前已复制" if stats["resumed"] else "",
+    )
 
 
 def load_secrets(path: str) -> Secrets:
@@ -509,6 +1242,11 @@ def load_secrets(path: str) -> Secrets:
         target_parent_file_id=str(raw.get("target_parent_file_id") or "root"),
         target_folder_name=str(raw.get("target_folder_name") or ""),
         batch_size=int(raw.get("batch_size") or 500),
+        concurrency=int(raw.get("concurrency") or 4),
+        requests_per_second=float(5.0 if raw.get("requests_per_second") is None else raw["requests_per_second"]),
+        adaptive_rate=bool(raw.get("adaptive_rate", True)),
+        max_requests_per_second=float(raw.get("max_requests_per_second") or 50.0),
+        journal_path=str(raw.get("journal_path") or ""),
     )
 
 
@@ -539,8 +1277,24 @@ def main() -> None:
     share_id, folder_id = extract_ids_from_link(secrets.share_link)
 
     api_base = secrets.api_base_url.strip() or infer_api_base_url(secrets.share_link)
-    api = AliPanApi(secrets.access_token, secrets.drive_id, base_url=api_base)
+    api = AliPanApi(
+        secrets.access_token,
+        secrets.drive_id,
+        base_url=api_base,
+        limiter=EndpointRateLimiter(
+            secrets.requests_per_second,
+            burst=max(1, secrets.concurrency),
+            adaptive=secrets.adaptive_rate,
+            max_rate=secrets.max_requests_per_second,
+        ),
+    )
     logger.info("API Base: %s", api_base)
+    logger.info(
+        "并发数：%d，每类接口初始速率：%s 次/秒（%s）",
+        secrets.concurrency,
+        secrets.requests_per_second or "不限",
+        "自适应" if api.limiter.adaptive else "固定",
+    )
     logger.info("开始：share_id=%s, drive_id=%s", share_id, secrets.drive_id)
 
     share_token = api.get_share_token(share_id, secrets.share_pwd)
@@ -561,24 +1315,55 @@ def main() -> None:
         share_info.get("file_count"),
     )
 
-    target_name = secrets.target_folder_name.strip() or share_name
-    target_folder = api.create_folder(secrets.target_parent_file_id, target_name)
-    target_folder_id = str(target_folder.get("file_id"))
-    logger.info(
-        "目标目录：parent=%s name=%s file_id=%s",
-        secrets.target_parent_file_id,
-        str(target_folder.get("name") or target_name),
-        target_folder_id,
-    )
+    journal_path = secrets.journal_path.strip() or os.path.join(here, f"alipan_save.{share_id}.journal.jsonl")
+    journal = TransferJournal(journal_path)
+    if journal.target is not None and not journal.matches(share_id, root_folder_id, secrets.target_parent_file_id):
+        logger.info("断点日志对应的源目录/目标父目录已变化，重新开始：%s", journal_path)
+        journal.reset()
+    if journal.done:
+        logger.info("断点日志显示该分享已转存完成（如需重新转存，删除 %s 后再运行）", journal_path)
+        journal.close()
+        return
 
-    save_shared_folder(
-        api,
-        share_id,
-        share_token,
-        root_folder_id,
-        target_folder_id,
-        batch_size=secrets.batch_size,
-    )
+    if journal.target is not None:
+        # 续传：沿用上次创建的目标目录，不再新建一个自动重命名的目录
+        target_folder_id = str(journal.target["target"])
+        logger.info("续传：目标目录 file_id=%s（断点日志 %s）", target_folder_id, journal_path)
+    else:
+        target_name = secrets.target_folder_name.strip() or share_name
+        target_folder = api.create_folder(secrets.target_parent_file_id, target_name)
+        target_folder_id = str(target_folder.get("file_id"))
+        journal.record_target(share_id, root_folder_id, secrets.target_parent_file_id, target_folder_id)
+        logger.info(
+            "目标目录：parent=%s name=%s file_id=%s",
+            secrets.target_parent_file_id,
+            str(target_folder.get("name") or target_name),
+            target_folder_id,
+        )
+
+    try:
+        save_shared_folder(
+            api,
+            share_id,
+            share_token,
+            root_folder_id,
+            target_folder_id,
+            batch_size=secrets.batch_size,
+            concurrency=secrets.concurrency,
+            journal=journal,
+        )
+        unresolved = journal.unconfirmed()
+        if journal.failed or unresolved:
+            # 异步任务没等到结果的文件也不能记 done，否则重跑会直接跳过它们
+            logger.warning(
+                "%d 个文件复制失败、%d 个文件结果未知，再次运行会只重试/确认这些文件",
+                len(journal.failed),
+                len(unresolved),
+            )
+        else:
+            journal.record_done()
+    finally:
+        journal.close()
 
     logger.info("完成：已发起/完成转存（大目录可能仍在后台异步处理）")
 
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""本地模拟阿里云盘 API（只用于联调 alipan_save.py 的并发与限速，不连接真实网盘）
+
+用法：
+
+  python mock_alipan_server.py --port 8787 --limit list=5 --limit copy=3
+  # alipan_secrets.json 里填 "api_base_url": "http://127.0.0.1:8787"，
+  # share_link 任意（如 https://www.alipan.com/s/mock），然后正常运行 alipan_save.py
+
+说明：
+- 模拟一棵分享目录树（--depth / --fanout / --files），实现 alipan_save.py 用到的全部接口
+- 每类接口（list / copy / createWithFolders / async_task / default）各有一个服务端令牌桶，超限返回 429
+- 整体转存默认直接失败（--whole-copy ok 时改为返回 202 异步任务，--task-seconds 秒后完成），以便走逐层转存
+- --async-ratio 让一部分文件复制也返回 202 异步任务；--task-poll get 时 batch 里的 /async_task/get 返回 404，只能用 GET 查询
+- GET /__stats 返回各类接口的接受/429 次数与实际吞吐；Ctrl+C 退出时打印同样的统计
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class ServerBucket:
+    """服务端限额：容量 burst、每秒补充 rate 个令牌；取不到令牌即 429。"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+
+    def take(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.rate <= 0:
+                ok = True
+            else:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                ok = self._tokens >= 1
+                if ok:
+                    self._tokens -= 1
+            if ok:
+                self.accepted += 1
+                self.first = now if self.first is None else self.first
+                self.last = now
+            else:
+                self.rejected += 1
+            return ok
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            span = (self.last - self.first) if self.first is not None and self.last is not None else 0.0
+            return {
+                "limit": self.rate,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "throughput": round(self.accepted / span, 2) if span > 0 else None,
+            }
+
+
+class MockDrive:
+    """分享目录树 + 目标网盘状态（线程安全）。"""
+
+    def __init__(
+        self,
+        depth: int,
+        fanout: int,
+        files: int,
+        whole_copy: str,
+        task_seconds: float,
+        async_ratio: float = 0.0,
+    ):
+        self.whole_copy = whole_copy
+        self.task_seconds = task_seconds
+        self.async_ratio = async_ratio
+        self.task_polls = 0
+        self.share: Dict[str, List[Dict[str, Any]]] = {}
+        self.created: Dict[str, Tuple[str, str]] = {}
+        self.copied: Dict[str, List[str]] = {}
+        self.tasks: Dict[str, float] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._build("root", depth, fanout, files)
+
+    def _build(self, folder_id: str, depth: int, fanout: int, files: int) -> None:
+        items: List[Dict[str, Any]] = []
+        for i in range(fanout if depth > 0 else 0):
+            child = f"d{next(self._ids)}"
+            items.append({"type": "folder", "name": f"folder-{i}", "file_id": child})
+            self._build(child, depth - 1, fanout, files)
+        for i in range(files):
+            items.append({"type": "file", "name": f"file-{i}.bin", "file_id": f"f{next(self._ids)}"})
+        self.share[folder_id] = items
+
+    @property
+    def file_count(self) -> int:
+        return sum(1 for items in self.share.values() for it in items if it["type"] == "file")
+
+    def list_page(self, folder_id: str, limit: int, marker: str) -> Dict[str, Any]:
+        items = self.share.get(folder_id, [])
+        start = int(marker or 0)
+        end = start + max(1, limit)
+        return {"items": items[start:end], "next_marker": str(end) if end < len(items) else ""}
+
+    def create_folder(self, parent_id: str, name: str, check_name_mode: str = "auto_rename") -> Dict[str, Any]:
+        with self._lock:
+            if check_name_mode == "refuse":
+                for folder_id, (parent, existing) in self.created.items():
+                    if parent == parent_id and existing == name:
+                        return {"file_id": folder_id, "name": name, "parent_file_id": parent_id, "exist": True}
+            new_id = f"t{len(self.created) + 1}"
+            self.created[new_id] = (parent_id, name)
+        return {"file_id": new_id, "name": name, "parent_file_id": parent_id, "type": "folder"}
+
+    def copy(self, file_id: str, target_id: str, auto_rename: bool = True) -> Tuple[int, Dict[str, Any]]:
+        if file_id in self.share:
+            if self.whole_copy != "ok":
+                return 400, {"code": "MockWholeCopyDisabled", "message": "整体转存已禁用（--whole-copy fail）"}
+            with self._lock:
+                task_id = f"task-{len(self.tasks) + 1}"
+                self.tasks[task_id] = time.monotonic()
+            return 202, {"async_task_id": task_id}
+        with self._lock:
+            copied = self.copied.setdefault(target_id, [])
+            if not auto_rename and file_id in copied:
+                return 409, {"code": "AlreadyExist.File", "message": "同名文件已存在"}
+            copied.append(file_id)
+            if random.random() < self.async_ratio:
+                task_id = f"task-{len(self.tasks) + 1}"
+                self.tasks[task_id] = time.monotonic()
+                return 202, {"async_task_id": task_id}
+        return 201, {"file_id": f"copy-{file_id}", "drive_id": "mock"}
+
+    def task_state(self, task_id: str) -> Dict[str, Any]:
+        with self._lock:
+            self.task_polls += 1
+        started = self.tasks.get(task_id)
+        if started is None:
+            return {"state": "Failed", "message": "unknown task"}
+        if time.monotonic() - started >= self.task_seconds:
+            return {"state": "Succeed", "total_process": self.file_count}
+        return {"state": "Running"}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            copied = [fid for ids in self.copied.values() for fid in ids]
+            return {
+                "sourceFolders": len(self.share),
+                "sourceFiles": self.file_count,
+                "createdFolders": len(self.created),
+                "copiedFiles": len(copied),
+                "duplicateCopies": len(copied) - len(set(copied)),
+                "asyncTasks": len(self.tasks),
+                "taskPolls": self.task_polls,
+            }
+
+
+def endpoint_class(path: str, body: Dict[str, Any]) -> str:
+    if path == "/adrive/v2/file/list_by_share":
+        return "list"
+    if path == "/adrive/v2/file/createWithFolders":
+        return "createWithFolders"
+    if path == "/v2/async_task/get":
+        return "async_task"
+    if path == "/adrive/v4/batch":
+        urls = {req.get("url") for req in body.get("requests") or []}
+        return "async_task" if urls == {"/async_task/get"} else "copy"
+    return "default"
+
+
+def make_handler(drive: MockDrive, buckets: Dict[str, ServerBucket], latency: float, task_poll: str = "batch"):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            # 请求量很大，默认不逐条打印
+            pass
+
+        def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0:
+                return {}
+            return json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+
+        def _dispatch(self, method: str) -> None:
+            parsed = urlparse(self.path)
+            body = self._body() if method == "POST" else {}
+            if parsed.path == "/__stats":
+                self._send(200, {"drive": drive.stats(), "endpoints": {k: b.stats() for k, b in buckets.items()}})
+                return
+
+            bucket = buckets[endpoint_class(parsed.path, body)]
+            if not bucket.take():
+                self._send(429, {"code": "TooManyRequests", "message": "mock rate limit"})
+                return
+            if latency > 0:
+                time.sleep(latency)
+
+            if parsed.path == "/v2/share_link/get_share_token":
+                self._send(200, {"share_token": "mock-share-token", "expires_in": 7200})
+            elif parsed.path == "/adrive/v3/share_link/get_share_by_anonymous":
+                self._send(200, {
+                    "share_name": "mock-share",
+                    "file_count": drive.file_count,
+                    "file_infos": [{"file_id": "root", "type": "folder", "file_name": "mock-share"}],
+                })
+            elif parsed.path == "/adrive/v2/file/list_by_share":
+                page = drive.list_page(
+                    str(body.get("parent_file_id")), int(body.get("limit") or 100), str(body.get("marker") or "")
+                )
+                self._send(200, page)
+            elif parsed.path == "/adrive/v2/file/createWithFolders":
+                self._send(201, drive.create_folder(
+                    str(body.get("parent_file_id")),
+                    str(body.get("name")),
+                    str(body.get("check_name_mode") or "auto_rename"),
+                ))
+            elif parsed.path == "/adrive/v4/batch":
+                responses = []
+                for req in body.get("requests") or []:
+                    req_body = req.get("body") or {}
+                    if req.get("url") == "/file/copy":
+                        status, payload = drive.copy(
+                            str(req_body.get("file_id")),
+                            str(req_body.get("to_parent_file_id")),
+                            bool(req_body.get("auto_rename", True)),
+                        )
+                    elif req.get("url") == "/async_task/get" and task_poll == "batch":
+                        status, payload = 200, drive.task_state(str(req_body.get("async_task_id")))
+                    else:
+                        status, payload = 404, {"code": "NotFound"}
+                    responses.append({"id": req.get("id"), "status": status, "body": payload})
+                self._send(200, {"responses": responses})
+            elif parsed.path == "/v2/async_task/get":
+                task_id = (parse_qs(parsed.query).get("async_task_id") or [""])[0]
+                self._send(200, drive.task_state(task_id))
+            else:
+                self._send(404, {"code": "NotFound", "message": parsed.path})
+
+        def do_POST(self) -> None:
+            self._dispatch("POST")
+
+        def do_GET(self) -> None:
+            self._dispatch("GET")
+
+    return Handler
+
+
+def parse_limits(values: List[str], default: float, burst: float) -> Dict[str, ServerBucket]:
+    limits = {name: default for name in ("list", "copy", "createWithFolders", "async_task", "default")}
+    for value in values:
+        name, _, rate = value.partition("=")
+        if name not in limits or not rate:
+            raise SystemExit(f"--limit 格式应为 <list|copy|createWithFolders|async_task|default>=<次/秒>，当前为: {value}")
+        limits[name] = float(rate)
+    return {name: ServerBucket(rate, burst) for name, rate in limits.items()}
+
+
+def build_server(args: argparse.Namespace) -> Tuple[ThreadingHTTPServer, MockDrive, Dict[str, ServerBucket]]:
+    drive = MockDrive(args.depth, args.fanout, args.files, args.whole_copy, args.task_seconds, args.async_ratio)
+    buckets = parse_limits(args.limit or [], args.default_limit, args.burst)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(drive, buckets, args.latency, args.task_poll))
+    server.daemon_threads = True
+    return server, drive, buckets
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地模拟阿里云盘 API（限速联调用）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--depth", type=int, default=3, help="目录树深度")
+    parser.add_argument("--fanout", type=int, default=4, help="每个目录的子目录数")
+    parser.add_argument("--files", type=int, default=20, help="每个目录的文件数")
+    parser.add_argument("--limit", action="append", help="某类接口的限额（次/秒），如 list=5；可多次指定")
+    parser.add_argument("--default-limit", type=float, default=10.0, help="未单独指定的接口限额（次/秒，<=0 不限）")
+    parser.add_argument("--burst", type=float, default=5.0, help="服务端令牌桶容量")
+    parser.add_argument("--latency", type=float, default=0.02, help="每个请求的模拟延迟（秒）")
+    parser.add_argument("--whole-copy", default="fail", choices=("fail", "ok"), help="整体转存：fail=直接失败 | ok=返回异步任务")
+    parser.add_argument("--task-seconds", type=float, default=3.0, help="异步任务完成所需秒数")
+    parser.add_argument("--async-ratio", type=float, default=0.0, help="文件复制返回 202 异步任务的比例（0~1）")
+    parser.add_argument("--task-poll", default="batch", choices=("batch", "get"), help="异步任务查询：batch=两种方式都可用 | get=只支持 GET")
+    args = parser.parse_args()
+
+    server, drive, buckets = build_server(args)
+    print(f"模拟服务已启动: http://{args.host}:{args.port}（目录 {len(drive.share)} 个，文件 {drive.file_count} 个）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(
+            {"drive": drive.stats(), "endpoints": {k: b.stats() for k, b in buckets.items()}},
+            ensure_ascii=False,
+            indent=2,
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,763 @@
+"""
+资源脚本基准测试
+- 生成已知网格、间距与噪声的合成卡图/精灵图/图标集（不依赖仓库内真实资源，结果可复现）；卡图另有贴边（无外边距）与无缝（无间距）两种变体
+- 逐阶段计时（墙钟、CPU），单独跑一次 tracemalloc 统计峰值内存（Python 对象与 NumPy 数组；Pillow 内部缓冲不计）
+- 每个阶段都与生成时记录的真值校验（网格行列/起点、空格、内容边界、打包不重叠、图集尺寸等）
+- 结果写 JSON；--baseline 对比上次结果，耗时/内存超出容差或校验失败时返回非 0，便于 CI 发现回归
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import shutil
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError as exc:
+    raise SystemExit("缺少 Pillow 依赖，请先执行: python -m pip install Pillow") from exc
+try:
+    import numpy as np
+except ImportError as exc:
+    raise SystemExit("缺少 NumPy 依赖，请先执行: python -m pip install numpy") from exc
+
+RESULT_VERSION = 1
+DEFAULT_OUT_DIR = Path.cwd() / "temp" / "asset-benchmark"
+# 规模预设：卡图网格 rows×cols、单格尺寸、格间距；精灵图帧数；图标数量；压缩阶段的源图数量
+PRESETS = {
+    "small": {"rows": 4, "cols": 5, "cell_w": 240, "cell_h": 336, "gap": 24, "sprite_frames": 16, "icons": 60, "images": 4},
+    "medium": {"rows": 7, "cols": 8, "cell_w": 420, "cell_h": 588, "gap": 32, "sprite_frames": 48, "icons": 200, "images": 8},
+    "large": {"rows": 8, "cols": 10, "cell_w": 960, "cell_h": 1344, "gap": 40, "sprite_frames": 96, "icons": 600, "images": 16},
+}
+# 贴边卡图与无缝卡图的行列数（不随预设变化）
+EDGE_SHEET_GRID = (3, 3)
+SEAMLESS_SHEET_GRID = (5, 5)
+STAGES = (
+    "grid-scan",
+    "grid-scan-pyramid",
+    "grid-scan-infer-edge",
+    "grid-inference",
+    "grid-inference-edge",
+    "grid-inference-seamless",
+    "grid-occupancy",
+    "grid-occupancy-blank",
+    "sprite-bounds",
+    "sprite-bounds-tiny",
+    "pack-atlas",
+    "pack-rotation",
+    "uniform-atlas",
+    "compress",
+    "compress-args",
+    "compress-variants",
+    "quality-search",
+    "profile-dump",
+)
+# uniform-atlas：流式 PNG 相对 Pillow 整图保存允许的体积倍数
+UNIFORM_ATLAS_MAX_RATIO = 1.2
+# 对比基线时忽略的绝对差（毫秒/字节），避免极短阶段的计时抖动误报
+NOISE_FLOOR_MS = 20.0
+NOISE_FLOOR_BYTES = 1 << 20
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="资源脚本基准测试（合成数据 + 真值校验）")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small", help="数据规模预设")
+    parser.add_argument("--rows", type=int, help="卡图行数（覆盖预设）")
+    parser.add_argument("--cols", type=int, help="卡图列数（覆盖预设）")
+    parser.add_argument("--cell-width", type=int, help="卡牌宽度（覆盖预设）")
+    parser.add_argument("--cell-height", type=int, help="卡牌高度（覆盖预设）")
+    parser.add_argument("--gap", type=int, help="卡牌间距（覆盖预设）")
+    parser.add_argument("--noise", type=float, default=24.0, help="卡面高斯噪声标准差")
+    parser.add_argument("--empty-ratio", type=float, default=0.1, help="空格比例")
+    parser.add_argument("--icons", type=int, help="图标数量（覆盖预设）")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段计时重复次数（取最小值）")
+    parser.add_argument("--stage", action="append", choices=STAGES, help="只跑指定阶段（可重复，默认全部）")
+    parser.add_argument("--workdir", help="合成数据目录（默认 temp/asset-benchmark/work）")
+    parser.add_argument("--output", help="结果 JSON（默认 temp/asset-benchmark/result-<时间>.json）")
+    parser.add_argument("--baseline", help="基线结果 JSON：对比耗时与内存，回归时返回非 0")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="相对基线允许的倍数（默认 1.5）")
+    parser.add_argument("--keep", action="store_true", help="保留合成数据目录")
+    return parser.parse_args()
+
+
+def resolve_params(args: argparse.Namespace) -> dict:
+    params = dict(PRESETS[args.preset])
+    overrides = {
+        "rows": args.rows,
+        "cols": args.cols,
+        "cell_w": args.cell_width,
+        "cell_h": args.cell_height,
+        "gap": args.gap,
+        "icons": args.icons,
+    }
+    params.update({key: value for key, value in overrides.items() if value is not None})
+    params.update({"preset": args.preset, "noise": args.noise, "empty_ratio": args.empty_ratio, "seed": args.seed})
+    return params
+
+
+# ---------------------------------------------------------------------------
+# 合成数据
+# ---------------------------------------------------------------------------
+
+
+def make_card_sheet(
+    params: dict,
+    rng: np.random.Generator,
+    path: Path,
+    gap: int | None = None,
+    margin: int | None = None,
+    grid: tuple[int, int] | None = None,
+) -> dict:
+    """暗底卡图：卡牌之间留 gap 像素间距、四周留 margin（默认与 gap 相同；0 即卡牌贴边），卡面为带噪声的亮色；返回真值。
+    grid 覆盖预设的 (rows, cols)。"""
+    rows, cols = grid or (params["rows"], params["cols"])
+    cell_w, cell_h = params["cell_w"], params["cell_h"]
+    gap = params["gap"] if gap is None else gap
+    margin = gap if margin is None else margin
+    width = cols * cell_w + (cols - 1) * gap + 2 * margin
+    height = rows * cell_h + (rows - 1) * gap + 2 * margin
+    plane = np.full((height, width), 4, dtype=np.uint8)
+    empty = []
+    for index in range(rows * cols):
+        if index and rng.random() < params["empty_ratio"]:
+            empty.append(index)
+            continue
+        r, c = divmod(index, cols)
+        y = margin + r * (cell_h + gap)
+        x = margin + c * (cell_w + gap)
+        base = rng.integers(90, 220)
+        face = rng.normal(base, params["noise"], (cell_h, cell_w))
+        plane[y:y + cell_h, x:x + cell_w] = np.clip(face, 40, 255).astype(np.uint8)
+    Image.fromarray(plane).save(path)
+    return {
+        "path": str(path),
+        "width": width,
+        "height": height,
+        "rows": rows,
+        "cols": cols,
+        "gap": gap,
+        "rowStarts": [margin + r * (cell_h + gap) for r in range(rows)],
+        "colStarts": [margin + c * (cell_w + gap) for c in range(cols)],
+        "emptyCells": empty,
+    }
+
+
+def make_sprite_sheet(params: dict, rng: np.random.Generator, path: Path) -> dict:
+    """透明底精灵图：每帧内随机位置一个不透明矩形；返回每帧内容矩形真值。"""
+    frames = params["sprite_frames"]
+    cols = max(1, int(round(frames ** 0.5)))
+    rows = -(-frames // cols)
+    frame_w, frame_h = 128, 128
+    rgba = np.zeros((rows * frame_h, cols * frame_w, 4), dtype=np.uint8)
+    bounds = []
+    for index in range(rows * cols):
+        r, c = divmod(index, cols)
+        if index >= frames:
+            bounds.append([c * frame_w, r * frame_h, 0, 0])
+            continue
+        w = int(rng.integers(16, frame_w - 8))
+        h = int(rng.integers(16, frame_h - 8))
+        x = c * frame_w + int(rng.integers(2, frame_w - w - 2))
+        y = r * frame_h + int(rng.integers(2, frame_h - h - 2))
+        rgba[y:y + h, x:x + w] = (200, 160, 90, 255)
+        bounds.append([x, y, w, h])
+    Image.fromarray(rgba).save(path)
+    return {"path": str(path), "rows": rows, "cols": cols, "bounds": bounds}
+
+
+def make_icon_set(params: dict, rng: np.random.Generator, directory: Path) -> dict:
+    """随机尺寸的图标（约 10% 与前一张像素相同，覆盖去重路径）。"""
+    directory.mkdir(parents=True, exist_ok=True)
+    previous = None
+    for index in range(params["icons"]):
+        if previous is not None and rng.random() < 0.1:
+            image = previous
+        else:
+            w, h = int(rng.integers(24, 200)), int(rng.integers(24, 200))
+            pixels = rng.integers(0, 255, (h, w, 4), dtype=np.uint8)
+            pixels[..., 3] = 255
+            image = Image.fromarray(pixels)
+        image.save(directory / f"icon-{index:04}.png")
+        previous = image
+    return {"path": str(directory), "count": params["icons"]}
+
+
+def make_cells(params: dict, rng: np.random.Generator, directory: Path) -> dict:
+    """均匀图集的单元格：纯色图片，颜色按序号编码，用于校验拼接位置。"""
+    directory.mkdir(parents=True, exist_ok=True)
+    count = params["rows"] * params["cols"]
+    colors = []
+    for index in range(count):
+        color = (index * 37 % 256, index * 91 % 256, int(rng.integers(0, 256)), 255)
+        Image.new("RGBA", (params["cell_w"], params["cell_h"]), color).save(directory / f"{index + 1}.png")
+        colors.append(list(color))
+    return {"path": str(directory), "count": count, "colors": colors}
+
+
+def make_photos(params: dict, rng: np.random.Generator, directory: Path) -> dict:
+    """压缩阶段的源图：奇数序号的长边为 2304（超过默认 IMAGE_MAX_EDGE=2048），覆盖缩放路径。"""
+    directory.mkdir(parents=True, exist_ok=True)
+    for index in range(params["images"]):
+        edge = 2304 if index % 2 else params["cell_h"]
+        gradient = np.linspace(0, 255, edge, dtype=np.float64)
+        base = np.add.outer(gradient, gradient[: edge * 3 // 4]) / 2
+        pixels = np.clip(base[..., None] + rng.normal(0, 12, (edge, edge * 3 // 4, 3)), 0, 255)
+        Image.fromarray(pixels.astype(np.uint8)).save(directory / f"photo-{index:02}.png")
+    return {"path": str(directory), "count": params["images"]}
+
+
+def generate_data(params: dict, workdir: Path) -> dict:
+    rng = np.random.default_rng(params["seed"])
+    random.seed(params["seed"])
+    if workdir.exists():
+        shutil.rmtree(workdir)
+    workdir.mkdir(parents=True)
+    return {
+        "sheet": make_card_sheet(params, rng, workdir / "cards.png"),
+        # 卡牌贴边（无外边距）与无缝拼接（无间距）：图像四边是卡面而不是背景；行列数固定，覆盖曾推断出错的布局
+        "edgeSheet": make_card_sheet(params, rng, workdir / "cards-edge.png", margin=0, grid=EDGE_SHEET_GRID),
+        "seamlessSheet": make_card_sheet(params, rng, workdir / "cards-seamless.png", gap=0, grid=SEAMLESS_SHEET_GRID),
+        "sprites": make_sprite_sheet(params, rng, workdir / "sprites.png"),
+        "icons": make_icon_set(params, rng, workdir / "icons"),
+        "cells": make_cells(params, rng, workdir / "cells"),
+        "photos": make_photos(params, rng, workdir / "photos"),
+        "workdir": str(workdir),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 阶段：每个阶段是 (准备, 执行, 校验)；执行函数只做被测工作，返回值交给校验
+# ---------------------------------------------------------------------------
+
+
+def near(actual: list, expected: list, tolerance: int) -> bool:
+    return len(actual) == len(expected) and all(abs(a - b) <= tolerance for a, b in zip(actual, expected))
+
+
+def stage_grid_scan(data: dict, pyramid: int = 0, sheet_key: str = "sheet", infer: bool = False):
+    import atlas_grid_scan
+
+    sheet = data[sheet_key]
+    argv = ["--image", sheet["path"], "--no-cache", "--metric", "max", "--threshold", "30"]
+    if pyramid:
+        argv += ["--pyramid", str(pyramid)]
+    if infer:
+        argv.append("--infer-grid")
+    args = atlas_grid_scan.build_parser().parse_args(argv)
+
+    def run():
+        return atlas_grid_scan.build_config_from_args(args)
+
+    def check(config: dict) -> dict:
+        ok = (
+            near(config["rowStarts"], sheet["rowStarts"], 1)
+            and near(config["colStarts"], sheet["colStarts"], 1)
+        )
+        return {"ok": ok, "rows": config["rows"], "cols": config["cols"]}
+
+    return run, check
+
+
+def stage_grid_inference(data: dict, sheet_key: str = "sheet"):
+    from grid_inference import LOW_CONFIDENCE, infer_grid
+    from image_cache import load_plane
+
+    sheet = data[sheet_key]
+    plane = load_plane(sheet["path"], "L", use_cache=False)
+
+    def run():
+        return infer_grid(plane)
+
+    def check(result: dict) -> dict:
+        if sheet["gap"]:
+            ok = (result["rows"], result["cols"]) == (sheet["rows"], sheet["cols"])
+        else:
+            # 无缝拼接没有空隙可循：推断不出来可以，但不能给出可被采用（>1 格且置信度达标）的错误格数
+            ok = all(
+                count == truth or count == 1 or confidence < LOW_CONFIDENCE
+                for count, truth, confidence in (
+                    (result["rows"], sheet["rows"], result["rowConfidence"]),
+                    (result["cols"], sheet["cols"], result["colConfidence"]),
+                )
+            )
+        return {"ok": ok, "rows": result["rows"], "cols": result["cols"], "confidence": result["confidence"]}
+
+    return run, check
+
+
+def stage_grid_occupancy(data: dict):
+    from grid_occupancy import grid_occupancy, starts_to_bounds
+    from image_cache import load_plane
+
+    sheet = data["sheet"]
+    plane = load_plane(sheet["path"], "L", use_cache=False)
+    cell_h = sheet["rowStarts"][1] - sheet["rowStarts"][0] if sheet["rows"] > 1 else sheet["height"]
+    cell_w = sheet["colStarts"][1] - sheet["colStarts"][0] if sheet["cols"] > 1 else sheet["width"]
+    row_bounds = starts_to_bounds(sheet["rowStarts"], [cell_h] * sheet["rows"])
+    col_bounds = starts_to_bounds(sheet["colStarts"], [cell_w] * sheet["cols"])
+
+    def run():
+        return grid_occupancy(plane, row_bounds, col_bounds, inset=8, threshold=20.0)
+
+    def check(result: dict) -> dict:
+        return {"ok": result["emptyCells"] == sheet["emptyCells"], "emptyCells": len(result["emptyCells"])}
+
+    return run, check
+
+
+def stage_grid_occupancy_blank(data: dict):
+    """全黑图扫不出任何行/列时 --occupancy 不应崩溃（曾因空区间列表 IndexError）。"""
+    import atlas_grid_scan
+
+    path = Path(data["workdir"]) / "blank.png"
+    Image.new("RGB", (64, 64)).save(path)
+    args = atlas_grid_scan.build_parser().parse_args(["--image", str(path), "--no-cache", "--occupancy"])
+
+    def run():
+        return atlas_grid_scan.build_config_from_args(args)
+
+    def check(config: dict) -> dict:
+        occupancy = config.get("occupancy") or {}
+        ok = (config["rows"], config["cols"]) == (0, 0) and occupancy.get("occupied") == []
+        return {"ok": ok, "rows": config["rows"], "cols": config["cols"]}
+
+    return run, check
+
+
+def stage_sprite_bounds(data: dict):
+    from image_cache import load_plane
+    from scan_sprite_bounds import scan_all_bounds
+
+    sprites = data["sprites"]
+    rgba = load_plane(sprites["path"], "RGBA", use_cache=False)
+
+    def run():
+        return scan_all_bounds(rgba, sprites["cols"], sprites["rows"], 5, 0)
+
+    def check(result: list) -> dict:
+        actual = [[item.x, item.y, item.width, item.height] for item in result]
+        mismatched = sum(1 for a, b in zip(actual, sprites["bounds"]) if a != b)
+        return {"ok": len(actual) == len(sprites["bounds"]) and mismatched == 0, "mismatched": mismatched}
+
+    return run, check
+
+
+def stage_sprite_bounds_tiny(data: dict):
+    """列数多于图片宽度（帧宽为 0）时每帧返回空矩形（曾因空数组 argmax 抛 ValueError）。"""
+    from scan_sprite_bounds import scan_all_bounds
+
+    rgba = np.full((4, 4, 4), 255, dtype=np.uint8)
+    cols, rows = 8, 2
+
+    def run():
+        return scan_all_bounds(rgba, cols, rows, 5, 0)
+
+    def check(result: list) -> dict:
+        ok = len(result) == cols * rows and all(item.width == 0 and item.height == 0 for item in result)
+        return {"ok": ok, "frames": len(result)}
+
+    return run, check
+
+
+def placements_valid(items: list[dict], positions: dict, width: int, height: int) -> bool:
+    """每个图块都在画布内且两两不重叠（旋转的图块按转后的宽高计）。"""
+    rects = []
+    for item in items:
+        place = positions[item["id"]]
+        w, h = (item["h"], item["w"]) if place["rotated"] else (item["w"], item["h"])
+        rects.append((place["x"], place["y"], place["x"] + w, place["y"] + h))
+    inside = all(x0 >= 0 and y0 >= 0 and x1 <= width and y1 <= height for x0, y0, x1, y1 in rects)
+    boxes = np.array(rects)
+    if len(boxes) > 1:
+        # 两两判断是否相交（按 x 排序后只比较 x 区间重叠的对）
+        order = boxes[np.argsort(boxes[:, 0])]
+        for index, (x0, y0, x1, y1) in enumerate(order):
+            rest = order[index + 1:]
+            rest = rest[rest[:, 0] < x1]
+            if ((rest[:, 1] < y1) & (rest[:, 3] > y0)).any():
+                return False
+    return inside and len(positions) == len(items)
+
+
+def stage_pack_atlas(data: dict):
+    import pack_sprite_atlas
+
+    icons = Path(data["icons"]["path"])
+    padding = 2
+
+    def run():
+        entries = pack_sprite_atlas.collect_images(icons)
+        unique, aliases = pack_sprite_atlas.dedupe_entries(entries)
+        for item in unique:
+            # 与 main 中未启用 --align-max 时一致：单元格即图块本身
+            item["cell_w"], item["cell_h"] = item["w"], item["h"]
+        positions, width, height = pack_sprite_atlas.pack_images(unique, 2048, padding, "maxrects")
+        return unique, aliases, positions, width, height
+
+    def check(result) -> dict:
+        unique, aliases, positions, width, height = result
+        efficiency = pack_sprite_atlas.packing_efficiency(unique, width, height)
+        return {
+            "ok": placements_valid(unique, positions, width, height),
+            "size": [width, height],
+            "duplicates": len(aliases),
+            "efficiency": round(efficiency, 4),
+        }
+
+    return run, check
+
+
+def stage_pack_rotation(data: dict):
+    """比 max-width 还宽、只能旋转后竖放的图块（曾因高度上界按未旋转高度累加而打包失败）。"""
+    import pack_sprite_atlas
+
+    max_width, padding = 64, 2
+    items = [
+        {"id": "wide", "w": 100, "h": 10},
+        {"id": "square", "w": 20, "h": 20},
+    ]
+    for item in items:
+        item["cell_w"], item["cell_h"] = item["w"], item["h"]
+
+    def run():
+        results = {}
+        for packer in ("maxrects", "skyline", "guillotine"):
+            try:
+                results[packer] = pack_sprite_atlas.pack_images(
+                    items, max_width, padding, packer, allow_rotation=True
+                )
+            except SystemExit as e:
+                results[packer] = str(e)
+        return results
+
+    def check(results: dict) -> dict:
+        failed = [
+            packer
+            for packer, result in results.items()
+            if isinstance(result, str) or result[1] > max_width or not placements_valid(items, *result)
+        ]
+        return {"ok": not failed, "failed": failed}
+
+    return run, check
+
+
+def stage_uniform_atlas(data: dict, params: dict):
+    import create_uniform_atlas
+
+    cells = data["cells"]
+    files = create_uniform_atlas.collect_images(Path(cells["path"]), cells["count"])
+    output = Path(data["workdir"]) / "uniform-atlas.png"
+    rows, cols = params["rows"], params["cols"]
+
+    def run():
+        create_uniform_atlas.create_atlas_streaming(files, rows, cols, None, None, 0, output, 1)
+        return output
+
+    def check(path: Path) -> dict:
+        with Image.open(path) as atlas:
+            size_ok = atlas.size == (cols * params["cell_w"], rows * params["cell_h"])
+            pixels_ok = all(
+                list(atlas.getpixel((
+                    (index % cols) * params["cell_w"] + params["cell_w"] // 2,
+                    (index // cols) * params["cell_h"] + params["cell_h"] // 2,
+                ))) == color
+                for index, color in enumerate(cells["colors"])
+            )
+            # 流式写出与 Pillow 整图保存的体积应相当（曾每行都用 None 滤波，体积约为 Pillow 的 2.5 倍）
+            reference = io.BytesIO()
+            atlas.save(reference, format="PNG")
+        size = path.stat().st_size
+        compact = size <= len(reference.getvalue()) * UNIFORM_ATLAS_MAX_RATIO
+        return {"ok": size_ok and pixels_ok and compact, "bytes": size, "pillowBytes": len(reference.getvalue())}
+
+    return run, check
+
+
+def stage_compress(data: dict):
+    import compress_images
+
+    photos = Path(data["photos"]["path"])
+    sources = sorted(photos.glob("*.png"))
+
+    def run():
+        shutil.rmtree(photos / compress_images.SKIP_DIR, ignore_errors=True)
+        return [
+            compress_images.handle_file({
+                "src": str(src),
+                "relative": src.name,
+                "settings": compress_images.encode_settings(False),
+                "entry": None,
+            })
+            for src in sources
+        ]
+
+    def check(results: list) -> dict:
+        max_edge = compress_images.MAX_EDGE
+        ok = all(
+            result["status"] == "processed"
+            and (max_edge <= 0 or max(result["entry"]["width"], result["entry"]["height"]) <= max_edge)
+            for result in results
+        )
+        return {
+            "ok": ok,
+            "inputBytes": sum(result["total_bytes"] for result in results),
+            "outputBytes": sum(result["output_bytes"] for result in results),
+        }
+
+    return run, check
+
+
+def stage_compress_args(data: dict):
+    """--jobs N 与 --jobs=N 等价（曾把 --jobs 后的数字当成根目录）。"""
+    import compress_images
+
+    root = Path(data["photos"]["path"])
+
+    def run():
+        return [
+            compress_images.parse_args(argv)
+            for argv in (["--jobs", "3", str(root)], ["--jobs=3", str(root)], [str(root), "--profile-top", "2"])
+        ]
+
+    def check(results: list) -> dict:
+        ok = all(result[0] == root.resolve() for result in results) and [results[0][2], results[1][2]] == [3, 3]
+        return {"ok": ok and results[2][3]["top"] == 2}
+
+    return run, check
+
+
+def stage_compress_variants(data: dict):
+    """缩小 IMAGE_VARIANT_SIZES 后重跑，旧尺寸的变体应从 compressed/ 删除（曾残留并被继续上传）。"""
+    import compress_images
+
+    root = Path(data["workdir"]) / "variants"
+    photo = sorted(Path(data["photos"]["path"]).glob("*.png"))[0]
+
+    def run():
+        shutil.rmtree(root, ignore_errors=True)
+        root.mkdir(parents=True)
+        shutil.copy(photo, root / photo.name)
+        sizes = compress_images.VARIANT_SIZES
+        try:
+            for compress_images.VARIANT_SIZES in ([64, 128], [64]):
+                compress_images.walk_dir(root, 1)
+        finally:
+            compress_images.VARIANT_SIZES = sizes
+        return sorted(path.name for path in (root / compress_images.SKIP_DIR).iterdir())
+
+    def check(names: list) -> dict:
+        stem = photo.stem
+        expected = sorted([f"{stem}.webp", f"{stem}@64.webp", compress_images.VARIANTS_MANIFEST_NAME])
+        return {"ok": names == expected, "files": len(names)}
+
+    return run, check
+
+
+def stage_quality_search(data: dict):
+    """不透明图的 PSNR 只按 RGB 计（曾把恒为 255 的 alpha 通道算进均值，评分虚高约 25%）；有透明度的精灵图计入 alpha。"""
+    import compress_images
+
+    photo = sorted(Path(data["photos"]["path"]).glob("*.png"))[0]
+    sources = {"opaque": photo, "alpha": Path(data["sprites"]["path"])}
+
+    def run():
+        results = {}
+        for key, path in sources.items():
+            with Image.open(path) as img:
+                img.load()
+                results[key] = (img, *compress_images.search_webp_quality(img, "psnr:30", 40, 95))
+        return results
+
+    def check(results: dict) -> dict:
+        img, quality, score = results["opaque"]
+        buffer = io.BytesIO()
+        img.save(buffer, format="WEBP", quality=quality, method=compress_images.WEBP_METHOD)
+        buffer.seek(0)
+        with Image.open(buffer) as decoded:
+            actual = np.asarray(decoded.convert("RGB"), dtype=np.float64)
+        mse = float(np.mean((np.asarray(img.convert("RGB"), dtype=np.float64) - actual) ** 2))
+        expected = float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+        ok = (
+            abs(score - expected) < 1e-6
+            and not compress_images._has_varying_alpha(img)
+            and compress_images._has_varying_alpha(results["alpha"][0])
+        )
+        return {"ok": ok, "opaqueQuality": quality, "alphaQuality": results["alpha"][1]}
+
+    return run, check
+
+
+def stage_profile_dump(data: dict):
+    """slug 相同的不同路径（a/b.png 与 a_b.png）各自保存 .prof，合并时每个文件只计一次（曾互相覆盖并重复计入）。"""
+    import asset_profile
+
+    dump_dir = Path(data["workdir"]) / "profile"
+    names = ["a/b.png", "a_b.png"]
+
+    def run():
+        shutil.rmtree(dump_dir, ignore_errors=True)
+        settings = asset_profile.options(dump_dir=str(dump_dir))
+        report = asset_profile.ProfileReport(settings)
+        for name in names:
+            with asset_profile.track(name, settings) as record:
+                sum(range(1000))
+            report.add(record)
+        report.finish(io.StringIO())
+        return report.records
+
+    def check(records: list) -> dict:
+        paths = {record["pstats"] for record in records}
+        ok = len(paths) == len(names) and all(Path(path).is_file() for path in paths)
+        return {"ok": ok, "dumps": len(paths)}
+
+    return run, check
+
+
+def build_stage(name: str, data: dict, params: dict):
+    if name == "grid-scan":
+        return stage_grid_scan(data)
+    if name == "grid-scan-pyramid":
+        return stage_grid_scan(data, pyramid=8)
+    if name == "grid-scan-infer-edge":
+        return stage_grid_scan(data, sheet_key="edgeSheet", infer=True)
+    if name == "grid-inference":
+        return stage_grid_inference(data)
+    if name == "grid-inference-edge":
+        return stage_grid_inference(data, "edgeSheet")
+    if name == "grid-inference-seamless":
+        return stage_grid_inference(data, "seamlessSheet")
+    if name == "grid-occupancy":
+        return stage_grid_occupancy(data)
+    if name == "grid-occupancy-blank":
+        return stage_grid_occupancy_blank(data)
+    if name == "sprite-bounds":
+        return stage_sprite_bounds(data)
+    if name == "sprite-bounds-tiny":
+        return stage_sprite_bounds_tiny(data)
+    if name == "pack-atlas":
+        return stage_pack_atlas(data)
+    if name == "pack-rotation":
+        return stage_pack_rotation(data)
+    if name == "uniform-atlas":
+        return stage_uniform_atlas(data, params)
+    if name == "compress-args":
+        return stage_compress_args(data)
+    if name == "compress-variants":
+        return stage_compress_variants(data)
+    if name == "profile-dump":
+        return stage_profile_dump(data)
+    if name == "quality-search":
+        return stage_quality_search(data)
+    return stage_compress(data)
+
+
+def measure(run, repeat: int) -> dict:
+    """先重复计时（不开 tracemalloc，避免追踪开销干扰），再单独跑一次统计峰值内存。"""
+    walls, cpus = [], []
+    result = None
+    for _ in range(max(1, repeat)):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run()
+        walls.append(time.perf_counter() - wall_start)
+        cpus.append(time.process_time() - cpu_start)
+
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "wallMs": round(min(walls) * 1000, 2),
+        "cpuMs": round(min(cpus) * 1000, 2),
+        "peakBytes": peak,
+        "result": result,
+    }
+
+
+def compare_baseline(stages: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, current in stages.items():
+        previous = (baseline.get("stages") or {}).get(name)
+        if not previous:
+            continue
+        for key, floor in (("wallMs", NOISE_FLOOR_MS), ("peakBytes", NOISE_FLOOR_BYTES)):
+            old, new = previous.get(key), current.get(key)
+            if not old or new is None:
+                continue
+            current.setdefault("baseline", {})[key] = old
+            if new > old * tolerance and new - old > floor:
+                regressions.append(f"{name} {key}: {old} -> {new}（x{new / old:.2f}）")
+    return regressions
+
+
+def main() -> None:
+    args = parse_args()
+    params = resolve_params(args)
+    workdir = Path(args.workdir) if args.workdir else DEFAULT_OUT_DIR / "work"
+    stages = args.stage or list(STAGES)
+
+    print(f"生成合成数据: preset={params['preset']} seed={params['seed']} -> {workdir}")
+    data = generate_data(params, workdir)
+
+    results: dict = {}
+    try:
+        for name in stages:
+            run, check = build_stage(name, data, params)
+            measured = measure(run, args.repeat)
+            verdict = check(measured.pop("result"))
+            results[name] = {**measured, **verdict}
+            mark = "OK" if verdict["ok"] else "FAIL"
+            print(
+                f"{name:<24} {mark:<4} wall={measured['wallMs']:>9.1f}ms cpu={measured['cpuMs']:>9.1f}ms "
+                f"peak={measured['peakBytes'] / (1 << 20):>8.1f}MB"
+            )
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "version": RESULT_VERSION,
+        "createdAt": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": params,
+        "stages": results,
+    }
+
+    regressions: list[str] = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if baseline.get("params") != params:
+            print("[warn] 基线的数据参数与本次不同，对比结果仅供参考")
+        regressions = compare_baseline(results, baseline, args.tolerance)
+        report["baseline"] = {"path": args.baseline, "tolerance": args.tolerance, "regressions": regressions}
+
+    output = Path(args.output) if args.output else DEFAULT_OUT_DIR / f"result-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"结果已写入: {output}")
+
+    failed = [name for name, item in results.items() if not item["ok"]]
+    for name in failed:
+        print(f"[error] 真值校验失败: {name}")
+    for line in regressions:
+        print(f"[error] 性能回归: {line}")
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
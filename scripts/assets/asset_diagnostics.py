@@ -0,0 +1,234 @@
+"""
+图集/卡图诊断工具（取代 check_edges.py / profile_scan.py / scan_atlas_to_file.py）
+- edges：指定高度比例的扫描行上，左右两端 N 像素的平均亮度（判断黑边）
+- profile：指定扫描行按块求平均亮度，输出字符剖面（_ . = #）
+- grid-occupancy：按 rows×cols 网格统计每格内缩区域的平均亮度，判断空格；未指定网格时自动推断（grid_inference）
+- 图片参数支持通配符；多张图片在进程池中并行处理；--json / --output 输出机器可读结果
+- 灰度平面走共享解码缓存（image_cache）
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError as exc:
+    raise SystemExit("缺少 NumPy 依赖，请先执行: python -m pip install numpy") from exc
+
+from grid_inference import LOW_CONFIDENCE, infer_grid
+from grid_occupancy import DEFAULT_INSET, DEFAULT_THRESHOLD, grid_occupancy, uniform_bounds
+from image_cache import load_plane
+
+COMMANDS = ("edges", "profile", "grid-occupancy")
+# profile 字符剖面：平均亮度 < 20 / < 100 / < 200 / 其余
+DEFAULT_PROFILE_LEVELS = (20, 100, 200)
+PROFILE_CHARS = "_.=#"
+
+
+def parse_grid(value: str) -> tuple[int, int]:
+    try:
+        rows, cols = (int(part) for part in value.lower().split("x"))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"网格格式应为 ROWSxCOLS，例如 7x8: {value}") from exc
+    if rows <= 0 or cols <= 0:
+        raise argparse.ArgumentTypeError(f"行列数必须为正数: {value}")
+    return rows, cols
+
+
+def parse_levels(value: str) -> tuple[int, ...]:
+    levels = tuple(int(part) for part in value.split(",") if part.strip())
+    if len(levels) != len(PROFILE_CHARS) - 1 or list(levels) != sorted(levels):
+        raise argparse.ArgumentTypeError(f"需要 {len(PROFILE_CHARS) - 1} 个递增的亮度分界: {value}")
+    return levels
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="图集/卡图诊断（边缘、扫描行剖面、网格占用）")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("images", nargs="+", help="图片路径或通配符（grid-occupancy 可写 path@ROWSxCOLS 单独指定网格）")
+    common.add_argument("--json", action="store_true", help="以 JSON 输出")
+    common.add_argument("--output", help="写入 JSON 文件（隐含 --json）")
+    common.add_argument("--jobs", type=int, default=0, help="并行进程数（<=0 表示 CPU 核数）")
+    common.add_argument("--no-cache", action="store_true", help="不读写共享解码缓存")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    edges = subparsers.add_parser("edges", parents=[common], help="扫描行左右两端平均亮度")
+    edges.add_argument("--y-ratio", type=float, action="append", help="扫描行高度比例（可重复，默认 0.5）")
+    edges.add_argument("--width", type=int, default=50, help="两端统计的像素数")
+
+    profile = subparsers.add_parser("profile", parents=[common], help="扫描行分块亮度剖面")
+    profile.add_argument("--y-ratio", type=float, action="append", help="扫描行高度比例（可重复，默认 0.5）")
+    profile.add_argument("--chunk", type=int, default=50, help="每块像素数")
+    profile.add_argument(
+        "--levels",
+        type=parse_levels,
+        default=DEFAULT_PROFILE_LEVELS,
+        help="字符分界（逗号分隔，默认 20,100,200 对应 _ . = #）",
+    )
+
+    grid = subparsers.add_parser("grid-occupancy", parents=[common], help="网格各格是否有内容")
+    grid.add_argument("--grid", type=parse_grid, help="默认网格 ROWSxCOLS（未在图片参数中指定时使用；都未指定则自动推断）")
+    grid.add_argument("--inset", type=int, default=DEFAULT_INSET, help="每格四周忽略的像素数（避开边框，格子过小时自动收缩）")
+    grid.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="平均亮度低于该值视为空格")
+    return parser
+
+
+def expand_images(specs: list[str]) -> list[tuple[str, str | None]]:
+    """展开通配符，返回 [(图片路径, 网格后缀)]；路径不存在时原样保留，由任务报告错误。"""
+    expanded: list[tuple[str, str | None]] = []
+    for spec in specs:
+        path_spec, grid = spec, None
+        if "@" in spec:
+            path_spec, grid = spec.rsplit("@", 1)
+        matches = sorted(glob.glob(path_spec, recursive=True)) if glob.has_magic(path_spec) else [path_spec]
+        if not matches:
+            print(f"[warn] 通配符未匹配到图片: {path_spec}")
+        expanded.extend((path, grid) for path in matches)
+    return expanded
+
+
+def line_ys(height: int, ratios: list[float] | None) -> list[tuple[float, int]]:
+    return [(ratio, min(height - 1, max(0, int(height * ratio)))) for ratio in (ratios or [0.5])]
+
+
+def diagnose_edges(plane: np.ndarray, args: argparse.Namespace) -> dict:
+    h, w = plane.shape
+    n = max(1, min(args.width, w))
+    scans = line_ys(h, args.y_ratio)
+    rows = plane[[y for _, y in scans]]
+    left = rows[:, :n].mean(axis=1)
+    right = rows[:, w - n:].mean(axis=1)
+    return {
+        "edges": [
+            {"yRatio": ratio, "y": y, "leftAvg": round(float(l), 2), "rightAvg": round(float(r), 2)}
+            for (ratio, y), l, r in zip(scans, left, right)
+        ],
+    }
+
+
+def diagnose_profile(plane: np.ndarray, args: argparse.Namespace) -> dict:
+    h, w = plane.shape
+    chunk = max(1, args.chunk)
+    starts = np.arange(0, w, chunk)
+    counts = np.minimum(starts + chunk, w) - starts
+    profiles = []
+    for ratio, y in line_ys(h, args.y_ratio):
+        averages = np.add.reduceat(plane[y].astype(np.int64), starts) / counts
+        chars = np.digitize(averages, args.levels, right=False)
+        profiles.append({
+            "yRatio": ratio,
+            "y": y,
+            "chunk": chunk,
+            "averages": [round(float(value), 2) for value in averages],
+            "profile": "".join(PROFILE_CHARS[index] for index in chars),
+        })
+    return {"profiles": profiles}
+
+
+def diagnose_grid(plane: np.ndarray, grid: tuple[int, int] | None, args: argparse.Namespace) -> dict:
+    h, w = plane.shape
+    inference = None
+    if grid is None:
+        inference = infer_grid(plane)
+        grid = (inference["rows"], inference["cols"])
+    rows, cols = grid
+    result = grid_occupancy(
+        plane, uniform_bounds(h, rows), uniform_bounds(w, cols), args.inset, args.threshold
+    )
+    result = {"cellW": w // cols, "cellH": h // rows, **result}
+    if inference is not None:
+        result["gridInference"] = inference
+    return result
+
+
+def diagnose(task: tuple[str, str, str | None, argparse.Namespace]) -> dict:
+    """进程池任务：单张图片的诊断结果；出错时返回 error 字段而不是抛出。"""
+    command, image, grid_spec, args = task
+    result: dict = {"image": image}
+    try:
+        plane = load_plane(image, "L", use_cache=not args.no_cache)
+        result["width"] = int(plane.shape[1])
+        result["height"] = int(plane.shape[0])
+        if command == "edges":
+            result.update(diagnose_edges(plane, args))
+        elif command == "profile":
+            result.update(diagnose_profile(plane, args))
+        else:
+            grid = parse_grid(grid_spec) if grid_spec else args.grid
+            result.update(diagnose_grid(plane, grid, args))
+    except (OSError, ValueError, argparse.ArgumentTypeError) as e:
+        result["error"] = str(e)
+    return result
+
+
+def format_text(command: str, result: dict) -> list[str]:
+    image = result["image"]
+    if "error" in result:
+        return [f"Error {image}: {result['error']}"]
+    w = result["width"]
+    if command == "edges":
+        return [
+            f"{image} y={item['y']}: LeftAvg={item['leftAvg']:.1f}, RightAvg={item['rightAvg']:.1f} (W={w})"
+            for item in result["edges"]
+        ]
+    if command == "profile":
+        lines = []
+        for item in result["profiles"]:
+            lines.append(f"Scanning profile for {image} at y={item['y']} (W={w})")
+            lines.append(f"Profile: |{item['profile']}|")
+        return lines
+    lines = [
+        f"Scanning {image} ({w}x{result['height']}) as {result['rows']}x{result['cols']}",
+        f"Cell size: {result['cellW']}x{result['cellH']}",
+    ]
+    inference = result.get("gridInference")
+    if inference is not None:
+        note = "（置信度偏低，建议用 --grid 指定）" if inference["confidence"] < LOW_CONFIDENCE else ""
+        lines.insert(1, f"Grid inferred: confidence={inference['confidence']:.2f}{note}")
+    cols = result["cols"]
+    for r, row in enumerate(result["occupied"]):
+        lines.append(" ".join(f"{r * cols + c:02}" if flag else "##" for c, flag in enumerate(row)))
+    return lines
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    images = expand_images(args.images)
+    if not images:
+        raise SystemExit("没有可处理的图片")
+
+    tasks = [(args.command, image, grid, args) for image, grid in images]
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if jobs == 1 or len(tasks) == 1:
+        results = [diagnose(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+            results = list(executor.map(diagnose, tasks))
+
+    if args.json or args.output:
+        output = json.dumps({"command": args.command, "results": results}, ensure_ascii=False, indent=2)
+        if args.output:
+            Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+            Path(args.output).write_text(output, encoding="utf-8")
+            print(f"结果已写入: {args.output}")
+        else:
+            print(output)
+    else:
+        for result in results:
+            for line in format_text(args.command, result):
+                print(line)
+
+    if any("error" in result for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+资源脚本共用的性能剖析
+- ASSET_PROFILE=1（或各脚本的 --profile）开启：按文件记录各阶段（哈希/解码/缩放/编码/剖面计算…）的墙钟时间、CPU 时间与字节数
+- ASSET_PROFILE_DIR=<目录>（或 --profile-dir）额外为每个文件保存 cProfile 数据（<文件>-<路径哈希>.prof），
+  结束时合并为 total.prof 并写出 profile-summary.json（可用 python -m pstats 查看）
+- 结束时打印最慢的 N 个文件（ASSET_PROFILE_TOP，默认 10）与各阶段合计
+- 未开启时 track / stage 为空操作；记录是普通 dict，可随进程池任务结果返回主进程汇总
+"""
+
+from __future__ import annotations
+
+import cProfile
+import hashlib
+import json
+import os
+import pstats
+import re
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, TextIO
+
+ENABLED = os.getenv("ASSET_PROFILE", "0") not in ("", "0")
+DUMP_DIR = os.getenv("ASSET_PROFILE_DIR", "").strip()
+TOP_N = int(os.getenv("ASSET_PROFILE_TOP", "10"))
+SUMMARY_NAME = "profile-summary.json"
+TOTAL_PSTATS_NAME = "total.prof"
+
+# 当前进程正在记录的文件（track 内有效）；stage 把耗时累加到这里
+_current: Optional[dict] = None
+
+
+def options(enabled: bool = False, dump_dir: str | None = None, top: int | None = None) -> dict:
+    """合并命令行与环境变量，返回可随任务传给工作进程的剖析选项。指定 dump_dir 即视为开启。"""
+    dump_dir = dump_dir or DUMP_DIR or None
+    return {
+        "enabled": bool(enabled or ENABLED or dump_dir),
+        "dumpDir": str(Path(dump_dir).resolve()) if dump_dir else None,
+        "top": TOP_N if top is None else top,
+    }
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", name).strip("_") or "file"
+
+
+def _dump_name(name: str) -> str:
+    # 不同路径可能得到相同的 slug（如 a/b.png 与 a_b.png），附上完整路径的短哈希避免互相覆盖
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    return f"{_slug(name)}-{digest}.prof"
+
+
+@contextmanager
+def track(name: str, settings: dict | None) -> Iterator[Optional[dict]]:
+    """记录单个文件的总耗时与各阶段；未开启时产出 None。记录在退出 with 后才完整。"""
+    global _current
+    if not settings or not settings.get("enabled"):
+        yield None
+        return
+
+    record: dict = {"file": name, "wallMs": 0.0, "cpuMs": 0.0, "stages": {}}
+    profiler = cProfile.Profile() if settings.get("dumpDir") else None
+    previous, _current = _current, record
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record["wallMs"] = round((time.perf_counter() - wall_start) * 1000, 3)
+        record["cpuMs"] = round((time.process_time() - cpu_start) * 1000, 3)
+        _current = previous
+        if profiler is not None:
+            dump_dir = Path(settings["dumpDir"])
+            dump_dir.mkdir(parents=True, exist_ok=True)
+            dump_path = dump_dir / _dump_name(name)
+            profiler.dump_stats(dump_path)
+            record["pstats"] = str(dump_path)
+
+
+@contextmanager
+def stage(name: str, nbytes: int = 0) -> Iterator[dict]:
+    """把 with 块的耗时累加到当前文件的 name 阶段；产出的 dict 可在块内追加 bytes（如编码后的输出大小）。"""
+    record = _current
+    if record is None:
+        yield {"bytes": 0}
+        return
+    entry = record["stages"].setdefault(name, {"wallMs": 0.0, "cpuMs": 0.0, "bytes": 0, "calls": 0})
+    counter = {"bytes": nbytes}
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield counter
+    finally:
+        entry["wallMs"] = round(entry["wallMs"] + (time.perf_counter() - wall_start) * 1000, 3)
+        entry["cpuMs"] = round(entry["cpuMs"] + (time.process_time() - cpu_start) * 1000, 3)
+        entry["bytes"] += int(counter["bytes"])
+        entry["calls"] += 1
+
+
+class ProfileReport:
+    """主进程汇总：收集各文件记录与整体阶段（如目录遍历），结束时打印最慢文件并写出汇总。"""
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self.records: list[dict] = []
+        self.overall: dict = {"stages": {}}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.settings.get("enabled"))
+
+    def add(self, record: Optional[dict]) -> None:
+        if record is not None:
+            self.records.append(record)
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[dict]:
+        """主进程中不属于单个文件的阶段（遍历目录、读写清单等）。"""
+        global _current
+        if not self.enabled:
+            yield {"bytes": 0}
+            return
+        previous, _current = _current, self.overall
+        try:
+            with stage(name) as counter:
+                yield counter
+        finally:
+            _current = previous
+
+    def stage_totals(self) -> dict:
+        totals: dict = {}
+        for record in self.records:
+            for name, entry in record["stages"].items():
+                total = totals.setdefault(name, {"wallMs": 0.0, "cpuMs": 0.0, "bytes": 0, "calls": 0})
+                for key in total:
+                    total[key] += entry[key]
+        return {name: {k: round(v, 3) if isinstance(v, float) else v for k, v in entry.items()} for name, entry in totals.items()}
+
+    def print_report(self, stream: TextIO | None = None) -> None:
+        if not self.enabled:
+            return
+        stream = stream or sys.stdout
+        top = max(0, int(self.settings.get("top") or 0))
+        print(f"\n[profile] 共 {len(self.records)} 个文件", file=stream)
+        for name, entry in self.overall["stages"].items():
+            print(f"[profile] 整体 {name}: {entry['wallMs']:.1f}ms（CPU {entry['cpuMs']:.1f}ms）", file=stream)
+        for name, entry in sorted(self.stage_totals().items(), key=lambda item: -item[1]["wallMs"]):
+            print(
+                f"[profile] 阶段 {name}: {entry['wallMs']:.1f}ms（CPU {entry['cpuMs']:.1f}ms，"
+                f"{entry['calls']} 次，{format_size(entry['bytes'])}）",
+                file=stream,
+            )
+        slowest = sorted(self.records, key=lambda item: -item["wallMs"])[:top]
+        if slowest:
+            print(f"[profile] 最慢的 {len(slowest)} 个文件:", file=stream)
+        for record in slowest:
+            parts = "，".join(
+                f"{name} {entry['wallMs']:.0f}ms"
+                for name, entry in sorted(record["stages"].items(), key=lambda item: -item[1]["wallMs"])
+            )
+            print(f"  {record['wallMs']:>9.1f}ms  {record['file']}" + (f"（{parts}）" if parts else ""), file=stream)
+
+    def finish(self, stream: TextIO | None = None) -> None:
+        """打印报告；指定了 dumpDir 时合并各文件的 cProfile 数据并写出汇总 JSON。"""
+        self.print_report(stream)
+        dump_dir = self.settings.get("dumpDir")
+        if not self.enabled or not dump_dir:
+            return
+        dump_dir = Path(dump_dir)
+        dump_dir.mkdir(parents=True, exist_ok=True)
+        # 同一文件被记录多次时只合并一次（后一次已覆盖同名 .prof）
+        dumps = list(dict.fromkeys(record["pstats"] for record in self.records if record.get("pstats")))
+        if dumps:
+            merged = pstats.Stats(dumps[0])
+            for path in dumps[1:]:
+                merged.add(path)
+            merged.dump_stats(dump_dir / TOTAL_PSTATS_NAME)
+        summary = {
+            "overall": self.overall["stages"],
+            "stages": self.stage_totals(),
+            "files": sorted(self.records, key=lambda item: -item["wallMs"]),
+        }
+        (dump_dir / SUMMARY_NAME).write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[profile] cProfile 数据与汇总已写入: {dump_dir}", file=stream or sys.stdout)
+
+
+def format_size(value: int) -> str:
+    size = float(value)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
@@ -1,42 +1,79 @@
 from __future__ import annotations
 
 import argparse
+import bisect
+import glob
+import hashlib
 import json
+import math
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Iterable, List, Tuple
 
 from PIL import Image
 
+import asset_profile
+from image_cache import CACHE_ROOT, file_sha256, load_image, load_plane, load_region
 
-def analyze_grid(image_path: str, rows: int, cols: int) -> None:
+try:
+    import numpy as np
+except ImportError:  # NumPy 可选：缺失时回退到纯 Python 参考实现
+    np = None
+
+BACKENDS = ('auto', 'numpy', 'python')
+# expected_rows/expected_cols 的阈值搜索方式：solver=精确区间求解，quantile=旧版 19 个固定分位数
+THRESHOLD_SEARCHES = ('solver', 'quantile')
+# NumPy 后端按块处理扫描线，限制单块临时数组的元素数（int64 约 32MB）
+NUMPY_CHUNK_ELEMENTS = 1 << 22
+# 扫描剖面磁盘缓存（按图片内容哈希 + 轴 + 扫描窗口区分，与解码缓存共用仓库根目录下的 temp/）；结构变化时递增版本号
+DEFAULT_CACHE_DIR = Path(os.getenv('ATLAS_SCAN_CACHE_DIR', str(CACHE_ROOT / 'atlas-scan-cache')))
+PROFILE_VERSION = 1
+# 金字塔模式（--pyramid）：允许的降采样倍数；边界精算最多迭代的轮数
+PYRAMID_FACTORS = (0, 2, 4, 8, 16)
+PYRAMID_MAX_PASSES = 4
+# 网格占用（--occupancy）默认参数，与 grid_occupancy.DEFAULT_INSET / DEFAULT_THRESHOLD 保持一致
+OCCUPANCY_INSET = 50
+OCCUPANCY_THRESHOLD = 10.0
+
+
+def analyze_grid(
+    image_path: str,
+    rows: int | None = None,
+    cols: int | None = None,
+    inset: int = OCCUPANCY_INSET,
+    threshold: float = OCCUPANCY_THRESHOLD,
+) -> None:
     try:
-        img = Image.open(image_path).convert('L')
-        w, h = img.size
+        from grid_occupancy import grid_occupancy, uniform_bounds
+
+        plane = load_plane(image_path, 'L')
+        h, w = plane.shape
         print(f"Image: {image_path} ({w}x{h})")
 
+        if rows is None or cols is None:
+            # 未给出行列数：按自相关/边界对齐推断
+            from grid_inference import describe, infer_grid
+
+            inferred = infer_grid(plane)
+            print(describe(inferred))
+            rows = rows or inferred['rows']
+            cols = cols or inferred['cols']
+
         cell_w = w // cols
         cell_h = h // rows
 
         print(f"Assuming Grid: {rows}x{cols} (Cell: {cell_w}x{cell_h})")
 
-        for r in range(rows):
+        # 每格内缩 inset 像素（避开边框），一次归约得到所有格子的平均亮度
+        result = grid_occupancy(plane, uniform_bounds(h, rows), uniform_bounds(w, cols), inset, threshold)
+        for r, flags in enumerate(result['occupied']):
             row_str = f"Row {r}: "
-            for c in range(cols):
+            for c, flag in enumerate(flags):
                 idx = r * cols + c
-                x = c * cell_w
-                y = r * cell_h
-                # Check center area (avoid borders)
-                box = (x + 50, y + 50, x + cell_w - 50, y + cell_h - 50)
-                cell = img.crop(box)
-
-                pixels = list(cell.getdata())
-                avg = sum(pixels) / len(pixels)
-
-                if avg < 10:
-                    mark = ".."  # Empty/Black
-                else:
-                    mark = f"{idx:02}"  # Content
-
+                mark = f"{idx:02}" if flag else ".."  # Content / Empty(Black)
                 row_str += f"[{mark}] "
             print(row_str)
 
@@ -87,36 +124,246 @@ def invert_segments(total: int, gaps: List[Tuple[int, int]]) -> List[Tuple[int,
     return segments
 
 
-def scan_axis_metric(
-    img: Image.Image,
-    axis: str,
-    metric: str,
-    threshold: float,
-    auto_threshold: float | None,
+def threshold_segments(
+    values: List[float],
     detect_mode: str,
-    scan_x: Tuple[int, int],
-    scan_y: Tuple[int, int],
+    threshold: float,
     gap_merge: int,
     gap_min_segment: int,
     min_segment: int,
-    expected_segments: int | None,
 ) -> List[Tuple[int, int]]:
-    pixels = img.load()
-    w, h = img.size
-    x_start, x_end = scan_x
-    y_start, y_end = scan_y
-    x_start = max(0, min(x_start, w))
-    y_start = max(0, min(y_start, h))
-    x_end = w if x_end <= 0 else max(0, min(x_end, w))
-    y_end = h if y_end <= 0 else max(0, min(y_end, h))
+    if detect_mode == 'content':
+        flags = [value > threshold for value in values]
+        return build_segments(flags, gap_merge, min_segment)
+    if detect_mode == 'gap-high':
+        gap_flags = [value > threshold for value in values]
+    else:
+        gap_flags = [value < threshold for value in values]
+    gaps = build_segments(gap_flags, gap_merge, gap_min_segment)
+    return [seg for seg in invert_segments(len(values), gaps) if seg[1] >= min_segment]
+
+
+def sweep_segment_counts(
+    values: List[float],
+    detect_mode: str,
+    gap_merge: int,
+    gap_min_segment: int,
+    min_segment: int,
+) -> List[Tuple[float, float, int]]:
+    """一次排序后按阈值扫过全部取值，返回每个阈值区间对应的分段数 [(low, high, count)]。
+
+    区间按阈值从小到大排列，相邻同计数区间已合并：
+    - content / gap-high：命中条件 value > t，区间为 [low, high)
+    - gap：命中条件 value < t，区间为 (low, high]
+    扫描线按命中顺序逐条激活，用并查集维护合并后的段（间距 <= gap_merge 视为同一段），
+    每次激活只做局部更新，整体 O(n log n)。
+    """
+    n = len(values)
+    descending = detect_mode != 'gap'
+    is_gap = detect_mode != 'content'
+    min_len = gap_min_segment if is_gap else min_segment
+    bridge = max(gap_merge, 0)
+
+    parent = list(range(n))
+    lo = list(range(n))
+    hi = list(range(n))
+    active = [False] * n
+    gap_starts: List[int] = []
+    gap_ends: dict = {}
+
+    def piece_ok(length: int) -> int:
+        return 1 if length > 0 and length >= min_segment else 0
+
+    count = piece_ok(n) if is_gap else 0
+
+    def find(i: int) -> int:
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def neighbours(pos: int) -> Tuple[int, int]:
+        prev_end = gap_ends[gap_starts[pos - 1]] if pos > 0 else -1
+        next_start = gap_starts[pos] if pos < len(gap_starts) else n
+        return prev_end, next_start
+
+    def add_component(a: int, b: int) -> None:
+        nonlocal count
+        if b - a + 1 < min_len:
+            return
+        if not is_gap:
+            count += 1
+            return
+        # gap 模式统计的是达标间隙之间（补集）的内容段
+        pos = bisect.bisect_left(gap_starts, a)
+        prev_end, next_start = neighbours(pos)
+        count += piece_ok(a - prev_end - 1) + piece_ok(next_start - b - 1) - piece_ok(next_start - prev_end - 1)
+        gap_starts.insert(pos, a)
+        gap_ends[a] = b
+
+    def remove_component(a: int, b: int) -> None:
+        nonlocal count
+        if b - a + 1 < min_len:
+            return
+        if not is_gap:
+            count -= 1
+            return
+        pos = bisect.bisect_left(gap_starts, a)
+        del gap_starts[pos]
+        del gap_ends[a]
+        prev_end, next_start = neighbours(pos)
+        count += piece_ok(next_start - prev_end - 1) - piece_ok(a - prev_end - 1) - piece_ok(next_start - b - 1)
+
+    def union(a: int, b: int) -> None:
+        ra = find(a)
+        rb = find(b)
+        if ra == rb:
+            return
+        remove_component(lo[ra], hi[ra])
+        remove_component(lo[rb], hi[rb])
+        parent[rb] = ra
+        lo[ra] = min(lo[ra], lo[rb])
+        hi[ra] = max(hi[ra], hi[rb])
+        add_component(lo[ra], hi[ra])
+
+    def activate(i: int) -> None:
+        active[i] = True
+        add_component(i, i)
+        for j in range(i - 1, max(-1, i - 2 - bridge), -1):
+            if active[j]:
+                union(j, i)
+                break
+        for j in range(i + 1, min(n, i + 2 + bridge)):
+            if active[j]:
+                union(i, j)
+                break
+
+    order = sorted(range(n), key=values.__getitem__, reverse=descending)
+    levels: List[Tuple[float, int]] = []
+    idx = 0
+    while idx < n:
+        level = values[order[idx]]
+        while idx < n and values[order[idx]] == level:
+            activate(order[idx])
+            idx += 1
+        levels.append((level, count))
+
+    initial = piece_ok(n) if is_gap else 0
+    ranges: List[Tuple[float, float, int]] = []
+    if descending:
+        # 激活到 u_k 为止的计数对应 t ∈ [u_{k+1}, u_k)
+        bounds = [math.inf] + [level for level, _ in levels]
+        counts = [initial] + [c for _, c in levels]
+        for k in range(len(counts) - 1, -1, -1):
+            low = bounds[k + 1] if k + 1 < len(bounds) else -math.inf
+            ranges.append((low, bounds[k], counts[k]))
+    else:
+        # 激活到 w_k 为止的计数对应 t ∈ (w_k, w_{k+1}]
+        bounds = [-math.inf] + [level for level, _ in levels]
+        counts = [initial] + [c for _, c in levels]
+        for k in range(len(counts)):
+            high = bounds[k + 1] if k + 1 < len(bounds) else math.inf
+            ranges.append((bounds[k], high, counts[k]))
+
+    merged: List[Tuple[float, float, int]] = []
+    for low, high, c in ranges:
+        if merged and merged[-1][2] == c:
+            merged[-1] = (merged[-1][0], high, c)
+        else:
+            merged.append((low, high, c))
+    return merged
 
-    metric = metric.lower()
-    if metric not in {'max', 'mean', 'variance', 'edge'}:
-        raise ValueError(f"Unsupported metric: {metric}")
-    detect_mode = detect_mode.lower()
-    if detect_mode not in {'content', 'gap', 'gap-high'}:
-        raise ValueError(f"Unsupported detect_mode: {detect_mode}")
 
+def solve_threshold(
+    values: List[float],
+    detect_mode: str,
+    gap_merge: int,
+    gap_min_segment: int,
+    min_segment: int,
+    expected_segments: int,
+    preferred: List[float],
+) -> dict:
+    """求出使分段数等于 expected_segments 的精确阈值区间。
+
+    preferred 中的阈值（显式阈值、自动阈值）若已落在最优区间内则原样保留；
+    否则取最宽（最稳定）区间的中点。stability 为区间在取值范围内的宽度。
+    """
+    ranges = sweep_segment_counts(values, detect_mode, gap_merge, gap_min_segment, min_segment)
+    low_inclusive = detect_mode != 'gap'
+    v_min = min(values)
+    v_max = max(values)
+
+    def contains(item: Tuple[float, float, int], t: float) -> bool:
+        low, high, _ = item
+        return low <= t < high if low_inclusive else low < t <= high
+
+    def width(item: Tuple[float, float, int]) -> float:
+        return max(0.0, min(item[1], v_max) - max(item[0], v_min))
+
+    def representative(item: Tuple[float, float, int]) -> float:
+        low, high, _ = item
+        if math.isinf(low) and math.isinf(high):
+            return 0.0
+        if math.isinf(high):
+            return low if low_inclusive else low + 1.0
+        if math.isinf(low):
+            return high - 1.0 if low_inclusive else high
+        return (low + high) / 2
+
+    best_diff = min(abs(item[2] - expected_segments) for item in ranges)
+    best = [item for item in ranges if abs(item[2] - expected_segments) == best_diff]
+    chosen = None
+    threshold = None
+    for t in preferred:
+        for item in best:
+            if contains(item, t):
+                chosen, threshold = item, t
+                break
+        if chosen is not None:
+            break
+    if chosen is None:
+        chosen = max(best, key=width)
+        threshold = representative(chosen)
+
+    low, high, count = chosen
+    return {
+        'threshold': threshold,
+        'segments': count,
+        'range': [None if math.isinf(low) else low, None if math.isinf(high) else high],
+        'stability': width(chosen),
+    }
+
+
+def resolve_backend(backend: str) -> str:
+    backend = (backend or 'auto').lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported backend: {backend}")
+    if backend == 'auto':
+        return 'numpy' if np is not None else 'python'
+    if backend == 'numpy' and np is None:
+        raise ValueError("numpy backend requested but NumPy is not installed")
+    return backend
+
+
+def image_to_plane(img: Image.Image):
+    """把 L 模式图片转换为 (h, w) 的 uint8 数组（仅 NumPy 后端使用）。"""
+    return np.asarray(img, dtype=np.uint8)
+
+
+def _axis_values_python(
+    img: Image.Image,
+    axis: str,
+    metric: str,
+    threshold: float,
+    x_start: int,
+    x_end: int,
+    y_start: int,
+    y_end: int,
+) -> List[float]:
+    """逐像素参考实现：NumPy 后端的结果必须与此完全一致。"""
+    pixels = img.load()
     values: List[float] = []
     if axis == 'row':
         for y in range(y_start, y_end):
@@ -188,54 +435,491 @@ def scan_axis_metric(
                     values.append((total_sq / count) - (mean * mean) if count else 0)
     else:
         raise ValueError(f"Unsupported axis: {axis}")
+    return values
+
+
+def clamp_window(size: Tuple[int, int], scan_x: Tuple[int, int], scan_y: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    w, h = size
+    x_start, x_end = scan_x
+    y_start, y_end = scan_y
+    x_start = max(0, min(x_start, w))
+    y_start = max(0, min(y_start, h))
+    x_end = w if x_end <= 0 else max(0, min(x_end, w))
+    y_end = h if y_end <= 0 else max(0, min(y_end, h))
+    return x_start, x_end, y_start, y_end
+
+
+@dataclass
+class AxisProfile:
+    """某个扫描窗口在一个轴上的全部指标，一次遍历得到，可复用于任意指标/阈值。
+
+    - sums / sums_sq：每条扫描线的像素和与平方和（mean / variance）
+    - edge_sums：与上一条扫描线的绝对差之和（edge）
+    - max_ladder：第 k+1 列为“第一个大于 k 的像素值”（k=-1..254），最后一列为真实最大值；
+      用于复现参考实现中 max 指标在超过阈值时提前退出的语义
+    """
 
-    def compute_threshold(quantile: float) -> float:
-        if detect_mode in {'gap', 'gap-high'}:
-            ordered = sorted(values)
-            idx = int(round((len(ordered) - 1) * quantile))
-            idx = max(0, min(idx, len(ordered) - 1))
-            return ordered[idx]
-        min_val = min(values)
-        max_val = max(values)
-        return min_val + (max_val - min_val) * quantile
-
-    def compute_segments(threshold_value: float) -> List[Tuple[int, int]]:
-        if detect_mode == 'content':
-            flags = [value > threshold_value for value in values]
-            return build_segments(flags, gap_merge, min_segment)
-        if detect_mode == 'gap-high':
-            gap_flags = [value > threshold_value for value in values]
+    axis: str
+    window: Tuple[int, int, int, int]
+    count: int
+    sums: 'np.ndarray'
+    sums_sq: 'np.ndarray'
+    edge_sums: 'np.ndarray'
+    max_ladder: 'np.ndarray'
+    _memo: dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_plane(cls, plane, axis: str, window: Tuple[int, int, int, int]) -> 'AxisProfile':
+        x_start, x_end, y_start, y_end = window
+        if axis == 'row':
+            lines = plane
+            line_start, line_end, span_start, span_end = y_start, y_end, x_start, x_end
+        elif axis == 'col':
+            lines = plane.T
+            line_start, line_end, span_start, span_end = x_start, x_end, y_start, y_end
         else:
-            gap_flags = [value < threshold_value for value in values]
-        gaps = build_segments(gap_flags, gap_merge, gap_min_segment)
-        return [seg for seg in invert_segments(len(values), gaps) if seg[1] >= min_segment]
-
-    if values:
-        if expected_segments is not None:
-            candidates = [i / 20 for i in range(1, 20)]
-            if auto_threshold is not None:
-                candidates = [auto_threshold] + [q for q in candidates if q != auto_threshold]
-            best_threshold = threshold
-            best_segments = compute_segments(best_threshold)
-            best_diff = abs(len(best_segments) - expected_segments)
-            for q in candidates:
-                current_threshold = compute_threshold(q)
-                current_segments = compute_segments(current_threshold)
-                current_diff = abs(len(current_segments) - expected_segments)
-                if current_diff < best_diff:
-                    best_diff = current_diff
-                    best_threshold = current_threshold
-                    best_segments = current_segments
-                    if best_diff == 0:
-                        break
-            threshold = best_threshold
-            segments = best_segments
+            raise ValueError(f"Unsupported axis: {axis}")
+
+        total_lines = max(0, line_end - line_start)
+        count = max(0, span_end - span_start)
+        sums = np.zeros(total_lines, dtype=np.int64)
+        sums_sq = np.zeros(total_lines, dtype=np.int64)
+        edge_sums = np.zeros(total_lines, dtype=np.int64)
+        max_ladder = np.zeros((total_lines, 257), dtype=np.uint8)
+        profile = cls(axis, window, count, sums, sums_sq, edge_sums, max_ladder)
+        if total_lines == 0 or count == 0:
+            return profile
+
+        levels = np.arange(256, dtype=np.int16)
+        chunk = max(1, NUMPY_CHUNK_ELEMENTS // count)
+        for c0 in range(line_start, line_end, chunk):
+            c1 = min(c0 + chunk, line_end)
+            out = slice(c0 - line_start, c1 - line_start)
+            n = c1 - c0
+
+            # 第 0 条扫描线没有上一条可比较，与参考实现一样记为 0
+            prev = max(c0 - 1, 0)
+            ext = lines[prev:c1, span_start:span_end].astype(np.int16)
+            diffs = np.abs(np.diff(ext, axis=0)).sum(axis=1, dtype=np.int64)
+            if c0 == 0:
+                edge_sums[out][1:] = diffs
+            else:
+                edge_sums[out] = diffs
+
+            block = ext[c0 - prev:]
+            wide = block.astype(np.int64)
+            sums[out] = wide.sum(axis=1)
+            sums_sq[out] = np.einsum('ij,ij->i', wide, wide)
+
+            # 前缀最大值出现过的取值集合即“第一个大于 k 的像素值”的候选
+            prefix_max = np.maximum.accumulate(block, axis=1)
+            present = np.zeros((n, 256), dtype=bool)
+            present[np.arange(n), prefix_max[:, 0]] = True
+            rec_rows, rec_cols = np.nonzero(prefix_max[:, 1:] != prefix_max[:, :-1])
+            present[rec_rows, prefix_max[rec_rows, rec_cols + 1]] = True
+            candidates = np.where(present, levels, 256)
+            ladder = np.minimum.accumulate(candidates[:, ::-1], axis=1)[:, ::-1]
+            line_max = prefix_max[:, -1]
+            max_ladder[out, :256] = np.where(ladder > 255, line_max[:, None], ladder)
+            max_ladder[out, 256] = line_max
+        return profile
+
+    def values(self, metric: str, threshold: float) -> List[float]:
+        key = (metric, self._ladder_index(threshold) if metric == 'max' else None)
+        cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+        count = self.count
+        if len(self.sums) == 0:
+            result: List[float] = []
+        elif count == 0:
+            result = [0.0] * len(self.sums)
+        elif metric == 'max':
+            result = self.max_ladder[:, key[1]].astype(np.float64).tolist()
+        elif metric == 'edge':
+            result = (self.edge_sums / count).tolist()
         else:
-            if auto_threshold is not None:
-                threshold = compute_threshold(auto_threshold)
-            segments = compute_segments(threshold)
-    else:
-        segments = []
+            mean = self.sums / count
+            if metric == 'mean':
+                result = mean.tolist()
+            else:
+                result = ((self.sums_sq / count) - (mean * mean)).tolist()
+        self._memo[key] = result
+        return result
+
+    @staticmethod
+    def _ladder_index(threshold: float) -> int:
+        # 像素为整数：value > threshold 等价于 value > floor(threshold)
+        if threshold >= 255:
+            return 256
+        if threshold < 0:
+            return 0
+        return math.floor(threshold) + 1
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                window=np.array(self.window, dtype=np.int64),
+                count=np.array(self.count, dtype=np.int64),
+                sums=self.sums,
+                sums_sq=self.sums_sq,
+                edge_sums=self.edge_sums,
+                max_ladder=self.max_ladder,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, axis: str) -> 'AxisProfile':
+        with np.load(path) as data:
+            return cls(
+                axis,
+                tuple(int(v) for v in data['window']),
+                int(data['count']),
+                data['sums'],
+                data['sums_sq'],
+                data['edge_sums'],
+                data['max_ladder'],
+            )
+
+
+class PyramidProfile:
+    """金字塔模式的剖面：与 AxisProfile.values 接口一致，但只在边界附近按全分辨率计算。
+
+    - 每隔 factor 条取一条扫描线、扫描线内每隔 factor 个像素取一个，得到全部扫描线的近似值（线性插值）
+    - edge 指标用采样线与其上一条扫描线配对计算，保持与全分辨率相同的量纲
+    - refine 对给定边界附近的扫描线按全分辨率重新计算（与 AxisProfile 结果完全一致）
+    间隙/内容段宽于 factor 时，分段结果与全分辨率扫描一致（边界误差不超过 1 像素）。
+    """
+
+    def __init__(self, plane, axis: str, window: Tuple[int, int, int, int], factor: int):
+        x_start, x_end, y_start, y_end = window
+        if axis == 'row':
+            lines = plane
+            line_start, line_end, span_start, span_end = y_start, y_end, x_start, x_end
+        elif axis == 'col':
+            lines = plane.T
+            line_start, line_end, span_start, span_end = x_start, x_end, y_start, y_end
+        else:
+            raise ValueError(f"Unsupported axis: {axis}")
+        self.plane = plane
+        self.axis = axis
+        self.window = window
+        self.factor = factor
+        self.line_start = line_start
+        self.total = max(0, line_end - line_start)
+        self.exact = np.zeros(self.total, dtype=bool)
+        self._exact_profiles: List[Tuple[int, AxisProfile]] = []
+
+        # 采样线（含最后一条）及其上一条扫描线交替排列，降采样后按行轴统一计算
+        samples = np.arange(line_start, line_end, factor)
+        if self.total and samples[-1] != line_end - 1:
+            samples = np.append(samples, line_end - 1)
+        self.positions = samples - line_start
+        pairs = np.empty(samples.size * 2, dtype=np.intp)
+        pairs[0::2] = np.maximum(samples - 1, 0)
+        pairs[1::2] = samples
+        reduced = np.ascontiguousarray(lines[pairs, span_start:span_end:factor])
+        self.coarse = AxisProfile.from_plane(reduced, 'row', (0, reduced.shape[1], 0, reduced.shape[0]))
+        # 第 0 条扫描线与自身配对：edge 为 0，与参考实现一致
+
+    def values(self, metric: str, threshold: float) -> List[float]:
+        if self.total == 0:
+            return []
+        coarse = np.asarray(self.coarse.values(metric, threshold), dtype=np.float64)[1::2]
+        result = np.interp(np.arange(self.total), self.positions, coarse)
+        for start, profile in self._exact_profiles:
+            result[start:start + len(profile.sums)] = profile.values(metric, threshold)
+        return result.tolist()
+
+    def refine(self, boundaries: Iterable[int], radius: int) -> bool:
+        """按全分辨率计算每个边界 ±radius 内尚未精算的扫描线；没有新增时返回 False。"""
+        need = np.zeros(self.total + 1, dtype=bool)
+        for boundary in boundaries:
+            need[max(0, boundary - radius):min(self.total, boundary + radius)] = True
+        need[:-1] &= ~self.exact
+        need[-1] = False
+        if not need.any():
+            return False
+        changes = np.flatnonzero(np.diff(np.concatenate([[False], need])))
+        x_start, x_end, y_start, y_end = self.window
+        for start, end in zip(changes[0::2], changes[1::2]):
+            first, last = self.line_start + int(start), self.line_start + int(end)
+            if self.axis == 'row':
+                sub_window = (x_start, x_end, first, last)
+            else:
+                sub_window = (first, last, y_start, y_end)
+            self._exact_profiles.append((int(start), AxisProfile.from_plane(self.plane, self.axis, sub_window)))
+            self.exact[start:end] = True
+        return True
+
+
+def threshold_transitions(values: List[float], detect_mode: str, threshold: float) -> List[int]:
+    """命中条件（content/gap-high 为 value > t，gap 为 value < t）发生变化的扫描线下标。"""
+    flags = np.asarray(values) < threshold if detect_mode == 'gap' else np.asarray(values) > threshold
+    return (np.flatnonzero(flags[1:] != flags[:-1]) + 1).tolist()
+
+
+def scan_region(
+    size: Tuple[int, int], windows: List[Tuple[int, int, int, int]]
+) -> Tuple[int, int, int, int] | None:
+    """扫描窗口的并集 (x0, y0, x1, y1)；左/上多取 1 像素供 edge 指标比较上一条扫描线。覆盖整图时返回 None。"""
+    windows = [window for window in windows if window[1] > window[0] and window[3] > window[2]]
+    if not windows:
+        return None
+    x0 = max(0, min(window[0] for window in windows) - 1)
+    x1 = max(window[1] for window in windows)
+    y0 = max(0, min(window[2] for window in windows) - 1)
+    y1 = max(window[3] for window in windows)
+    if (x0, y0, x1, y1) == (0, 0, size[0], size[1]):
+        return None
+    return x0, y0, x1, y1
+
+
+class ProfileStore:
+    """同一张图片的扫描剖面仓库：行/列扫描与所有候选阈值共用，按图片内容哈希落盘。
+
+    指定 region 时剖面只从该区域的平面计算（load_region 只解码/转换该区域），
+    窗口坐标仍为整图坐标；已加载整图平面时直接复用整图。
+    """
+
+    def __init__(
+        self,
+        image_path: str,
+        size: Tuple[int, int],
+        load_plane,
+        cache_dir: Path | None,
+        region: Tuple[int, int, int, int] | None = None,
+        load_region=None,
+    ):
+        self.image_path = image_path
+        self.size = size
+        self._load_plane = load_plane
+        self._plane = None
+        self._profiles: dict = {}
+        self.cache_dir = cache_dir
+        self._image_hash: str | None = None
+        self.region = region if load_region is not None else None
+        self._load_region = load_region
+        self._region_plane = None
+
+    @property
+    def plane(self):
+        if self._plane is None:
+            with asset_profile.stage('decode'):
+                self._plane = self._load_plane()
+        return self._plane
+
+    def _scan_plane(self, window: Tuple[int, int, int, int]):
+        """返回 (平面, x 偏移, y 偏移)：窗口（含 edge 需要的上一条扫描线）落在 region 内时用区域平面。"""
+        if self._plane is not None or self.region is None:
+            return self.plane, 0, 0
+        x0, y0, x1, y1 = self.region
+        x_start, x_end, y_start, y_end = window
+        inside = (
+            x0 <= max(0, x_start - 1) and x_end <= x1
+            and y0 <= max(0, y_start - 1) and y_end <= y1
+        )
+        if not inside:
+            return self.plane, 0, 0
+        if self._region_plane is None:
+            with asset_profile.stage('decode'):
+                self._region_plane = self._load_region(self.region)
+        return self._region_plane, x0, y0
+
+    @property
+    def image_hash(self) -> str:
+        if self._image_hash is None:
+            self._image_hash = file_sha256(self.image_path)
+        return self._image_hash
+
+    def _cache_path(self, axis: str, window: Tuple[int, int, int, int]) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        x_start, x_end, y_start, y_end = window
+        name = f"{self.image_hash}-{axis}-{x_start}-{x_end}-{y_start}-{y_end}-v{PROFILE_VERSION}.npz"
+        return self.cache_dir / name
+
+    def get(self, axis: str, window: Tuple[int, int, int, int]) -> AxisProfile:
+        key = (axis, window)
+        profile = self._profiles.get(key)
+        if profile is not None:
+            return profile
+
+        cache_path = self._cache_path(axis, window)
+        if cache_path is not None and cache_path.exists():
+            try:
+                with asset_profile.stage('profile-cache'):
+                    profile = AxisProfile.load(cache_path, axis)
+            except (OSError, ValueError, KeyError):
+                profile = None
+        if profile is None:
+            plane, offset_x, offset_y = self._scan_plane(window)
+            x_start, x_end, y_start, y_end = window
+            local = (x_start - offset_x, x_end - offset_x, y_start - offset_y, y_end - offset_y)
+            with asset_profile.stage('profile'):
+                profile = AxisProfile.from_plane(plane, axis, local)
+            profile.window = window
+            if cache_path is not None:
+                try:
+                    profile.save(cache_path)
+                except OSError as e:
+                    print(f"[warn] 写入扫描缓存失败: {e}")
+        self._profiles[key] = profile
+        return profile
+
+    def pyramid(self, axis: str, window: Tuple[int, int, int, int], factor: int) -> PyramidProfile:
+        """金字塔剖面不落盘：降采样扫描本身已很便宜，精算部分依赖当次阈值。"""
+        plane, offset_x, offset_y = self._scan_plane(window)
+        x_start, x_end, y_start, y_end = window
+        local = (x_start - offset_x, x_end - offset_x, y_start - offset_y, y_end - offset_y)
+        with asset_profile.stage('profile'):
+            return PyramidProfile(plane, axis, local, factor)
+
+
+def scan_axis_metric(
+    img: Image.Image,
+    axis: str,
+    metric: str,
+    threshold: float,
+    auto_threshold: float | None,
+    detect_mode: str,
+    scan_x: Tuple[int, int],
+    scan_y: Tuple[int, int],
+    gap_merge: int,
+    gap_min_segment: int,
+    min_segment: int,
+    expected_segments: int | None,
+    backend: str = 'auto',
+    profiles: ProfileStore | None = None,
+    threshold_search: str = 'solver',
+    report: dict | None = None,
+    pyramid: int = 0,
+) -> List[Tuple[int, int]]:
+    window = clamp_window(img.size, scan_x, scan_y)
+    x_start, x_end, y_start, y_end = window
+
+    metric = metric.lower()
+    if metric not in {'max', 'mean', 'variance', 'edge'}:
+        raise ValueError(f"Unsupported metric: {metric}")
+    detect_mode = detect_mode.lower()
+    if detect_mode not in {'content', 'gap', 'gap-high'}:
+        raise ValueError(f"Unsupported detect_mode: {detect_mode}")
+    if axis not in {'row', 'col'}:
+        raise ValueError(f"Unsupported axis: {axis}")
+
+    if threshold_search not in THRESHOLD_SEARCHES:
+        raise ValueError(f"Unsupported threshold_search: {threshold_search}")
+
+    if pyramid not in PYRAMID_FACTORS:
+        raise ValueError(f"Unsupported pyramid factor: {pyramid}")
+
+    profile = None
+    if resolve_backend(backend) == 'numpy':
+        if pyramid:
+            if profiles is None:
+                profile = PyramidProfile(image_to_plane(img), axis, window, pyramid)
+            else:
+                profile = profiles.pyramid(axis, window, pyramid)
+        elif profiles is None:
+            profile = AxisProfile.from_plane(image_to_plane(img), axis, window)
+        else:
+            profile = profiles.get(axis, window)
+
+    def line_values(value_threshold: float) -> List[float]:
+        if profile is not None:
+            return profile.values(metric, value_threshold)
+        return _axis_values_python(img, axis, metric, value_threshold, x_start, x_end, y_start, y_end)
+
+    def segment(threshold: float) -> Tuple[List[Tuple[int, int]], float]:
+        """按当前剖面求分段，返回 (分段, 实际使用的阈值)。"""
+        values = line_values(threshold)
+
+        ordered: List[float] = []
+        segment_memo: dict = {}
+
+        def compute_threshold(quantile: float) -> float:
+            if detect_mode in {'gap', 'gap-high'}:
+                if not ordered:
+                    ordered.extend(sorted(values))
+                idx = int(round((len(ordered) - 1) * quantile))
+                idx = max(0, min(idx, len(ordered) - 1))
+                return ordered[idx]
+            min_val = min(values)
+            max_val = max(values)
+            return min_val + (max_val - min_val) * quantile
+
+        def compute_segments(threshold_value: float) -> List[Tuple[int, int]]:
+            # 不同分位数常落在同一个阈值上，直接复用已算出的分段
+            if threshold_value not in segment_memo:
+                segment_memo[threshold_value] = derive_segments(threshold_value)
+            return segment_memo[threshold_value]
+
+        def derive_segments(threshold_value: float) -> List[Tuple[int, int]]:
+            return threshold_segments(values, detect_mode, threshold_value, gap_merge, gap_min_segment, min_segment)
+
+        if values:
+            if expected_segments is not None and threshold_search == 'solver':
+                # max 指标的命中与否只取决于真实最大值，求解时使用不提前退出的取值
+                solve_values = line_values(math.inf) if metric == 'max' else values
+                preferred = [threshold]
+                if auto_threshold is not None:
+                    preferred.append(compute_threshold(auto_threshold))
+                solution = solve_threshold(
+                    solve_values,
+                    detect_mode,
+                    gap_merge,
+                    gap_min_segment,
+                    min_segment,
+                    expected_segments,
+                    preferred,
+                )
+                threshold = solution['threshold']
+                segments = threshold_segments(
+                    solve_values, detect_mode, threshold, gap_merge, gap_min_segment, min_segment
+                )
+                if report is not None:
+                    report.update(solution)
+            elif expected_segments is not None:
+                candidates = [i / 20 for i in range(1, 20)]
+                if auto_threshold is not None:
+                    candidates = [auto_threshold] + [q for q in candidates if q != auto_threshold]
+                best_threshold = threshold
+                best_segments = compute_segments(best_threshold)
+                best_diff = abs(len(best_segments) - expected_segments)
+                for q in candidates:
+                    current_threshold = compute_threshold(q)
+                    current_segments = compute_segments(current_threshold)
+                    current_diff = abs(len(current_segments) - expected_segments)
+                    if current_diff < best_diff:
+                        best_diff = current_diff
+                        best_threshold = current_threshold
+                        best_segments = current_segments
+                        if best_diff == 0:
+                            break
+                threshold = best_threshold
+                segments = best_segments
+            else:
+                if auto_threshold is not None:
+                    threshold = compute_threshold(auto_threshold)
+                segments = compute_segments(threshold)
+        else:
+            segments = []
+        return segments, threshold
+
+    segments, used_threshold = segment(threshold)
+    if isinstance(profile, PyramidProfile):
+        # 粗扫描得到近似边界后，只在命中条件变化处附近按全分辨率精算，直到不再出现新的边界
+        radius = 2 * profile.factor + 1
+        for _ in range(PYRAMID_MAX_PASSES):
+            transitions = threshold_transitions(line_values(used_threshold), detect_mode, used_threshold)
+            with asset_profile.stage('profile'):
+                refined = profile.refine(transitions, radius)
+            if not refined:
+                break
+            segments, used_threshold = segment(threshold)
 
     offset = y_start if axis == 'row' else x_start
     return [(start + offset, length) for start, length in segments]
@@ -263,6 +947,34 @@ def build_uniform_segments(total: int, count: int) -> List[Tuple[int, int]]:
     return segments
 
 
+def planned_windows(
+    size: Tuple[int, int],
+    scan_x: Tuple[int, int],
+    scan_y: Tuple[int, int],
+    row_scan_x: Tuple[int, int] | None,
+    row_scan_y: Tuple[int, int] | None,
+    col_scan_x: Tuple[int, int] | None,
+    col_scan_y: Tuple[int, int] | None,
+    col_scan_from_row: int | None,
+    uniform_rows: int | None,
+    uniform_cols: int | None,
+) -> List[Tuple[int, int, int, int]]:
+    """扫描前可确定的行/列扫描窗口（整图坐标）。col_scan_from_row 的列窗口落在行扫描范围内。"""
+    w, h = size
+    windows: List[Tuple[int, int, int, int]] = []
+    row_window = clamp_window(size, row_scan_x or scan_x, row_scan_y or scan_y)
+    if uniform_rows is None:
+        windows.append(row_window)
+    if uniform_cols is None:
+        col_window = clamp_window(size, col_scan_x or scan_x, col_scan_y or scan_y)
+        if col_scan_from_row is not None:
+            # 列扫描的 y 范围取自某个行段：均分行时可能是任意位置
+            y_range = (row_window[2], row_window[3]) if uniform_rows is None else (0, h)
+            col_window = (col_window[0], col_window[1], *y_range)
+        windows.append(col_window)
+    return windows
+
+
 def build_config(
     image_path: str,
     metric: str,
@@ -295,8 +1007,49 @@ def build_config(
     col_scan_from_row: int | None,
     expected_rows: int | None,
     expected_cols: int | None,
+    backend: str = 'auto',
+    cache_dir: Path | None = None,
+    threshold_search: str = 'solver',
+    occupancy: bool = False,
+    occupancy_inset: int = OCCUPANCY_INSET,
+    occupancy_threshold: float = OCCUPANCY_THRESHOLD,
+    infer_grid: bool = False,
+    pyramid: int = 0,
 ) -> dict:
-    img = Image.open(image_path).convert('L')
+    backend = resolve_backend(backend)
+    profiles = None
+    if backend == 'numpy':
+        # 只读取文件头拿尺寸；剖面缓存未命中时才取灰度平面（走共享解码缓存，整张图只转换一次）
+        img = Image.open(image_path)
+        region = None
+        if not occupancy and not infer_grid:
+            # 只扫描部分窗口时只解码窗口并集；占用检测/网格推断需要整图
+            region = scan_region(img.size, planned_windows(
+                img.size,
+                scan_x,
+                scan_y,
+                row_scan_x,
+                row_scan_y,
+                col_scan_x,
+                col_scan_y,
+                col_scan_from_row,
+                uniform_rows,
+                uniform_cols,
+            ))
+        profiles = ProfileStore(
+            image_path,
+            img.size,
+            lambda: load_plane(image_path, 'L', use_cache=cache_dir is not None),
+            cache_dir,
+            region,
+            lambda box: load_region(image_path, box, img.size, 'L', use_cache=cache_dir is not None),
+        )
+    else:
+        with asset_profile.stage('decode'):
+            img = load_image(image_path, 'L', use_cache=cache_dir is not None)
+        if pyramid:
+            print('[warn] --pyramid 仅支持 NumPy 后端，已按全分辨率扫描')
+            pyramid = 0
     w, h = img.size
 
     row_metric = resolve_metric(row_metric, metric)
@@ -319,6 +1072,25 @@ def build_config(
     row_detect_mode = (row_detect_mode or 'content').lower()
     col_detect_mode = (col_detect_mode or 'content').lower()
 
+    grid_inference = None
+    if infer_grid and (expected_rows is None or expected_cols is None):
+        from grid_inference import LOW_CONFIDENCE, describe
+        from grid_inference import infer_grid as infer_grid_shape
+
+        if np is None:
+            raise SystemExit("缺少 NumPy 依赖，请先执行: python -m pip install numpy")
+        plane = profiles.plane if profiles is not None else image_to_plane(img)
+        with asset_profile.stage('infer-grid'):
+            grid_inference = infer_grid_shape(plane)
+        print(f"[info] {describe(grid_inference)}")
+        # 推断结果只补全未指定的预期行/列数，按轴各自判断；低置信度或只推断出 1 格时不采用，保留扫描结果
+        if expected_rows is None and grid_inference['rows'] > 1 and grid_inference['rowConfidence'] >= LOW_CONFIDENCE:
+            expected_rows = grid_inference['rows']
+        if expected_cols is None and grid_inference['cols'] > 1 and grid_inference['colConfidence'] >= LOW_CONFIDENCE:
+            expected_cols = grid_inference['cols']
+
+    row_solve: dict = {}
+    col_solve: dict = {}
     if uniform_rows is not None:
         row_segments = build_uniform_segments(h, uniform_rows)
     else:
@@ -336,6 +1108,11 @@ def build_config(
             row_gap_min_segment,
             row_min_segment,
             row_expected,
+            backend=backend,
+            profiles=profiles,
+            threshold_search=threshold_search,
+            report=row_solve,
+            pyramid=pyramid,
         )
 
     if col_scan_from_row is not None and row_segments:
@@ -363,6 +1140,11 @@ def build_config(
             col_gap_min_segment,
             col_min_segment,
             col_expected,
+            backend=backend,
+            profiles=profiles,
+            threshold_search=threshold_search,
+            report=col_solve,
+            pyramid=pyramid,
         )
 
     rows = len(row_segments)
@@ -387,7 +1169,25 @@ def build_config(
                 row_segments[i] = (start, new_height)
                 print(f"[info] 行{i}高度{h_val}偏小（中位数{median_height}），已补齐到{new_height}")
 
-    return {
+    occupancy_result = None
+    if occupancy:
+        from grid_occupancy import grid_occupancy
+
+        plane = profiles.plane if profiles is not None else image_to_plane(img)
+        with asset_profile.stage('occupancy'):
+            occupancy_result = grid_occupancy(
+                plane,
+                [(start, start + length) for start, length in row_segments],
+                [(start, start + length) for start, length in col_segments],
+                occupancy_inset,
+                occupancy_threshold,
+            )
+        # 配置里只保留位图与空格列表，平均亮度仅用于调参
+        occupancy_result.pop('means')
+        occupancy_result.pop('rows')
+        occupancy_result.pop('cols')
+
+    config = {
         'imageW': w,
         'imageH': h,
         'rows': rows,
@@ -435,17 +1235,22 @@ def build_config(
             'colScanYStart': col_scan_y[0],
             'colScanYEnd': col_scan_y[1],
             'colScanFromRow': col_scan_from_row,
+            'thresholdSearch': threshold_search,
+            'rowThresholdSolve': row_solve or None,
+            'colThresholdSolve': col_solve or None,
+            'pyramid': pyramid,
         },
     }
+    if occupancy_result is not None:
+        config['occupancy'] = occupancy_result
+    if grid_inference is not None:
+        config['gridInference'] = grid_inference
+    return config
 
 
-def main() -> None:
-    if len(sys.argv) == 4 and not sys.argv[1].startswith('-'):
-        analyze_grid(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))
-        return
-
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description='扫描图集网格并输出 row/col 配置')
-    parser.add_argument('--image', required=True, help='图片路径')
+    parser.add_argument('--image', help='图片路径（批量模式下由清单/通配符提供）')
     parser.add_argument('--metric', default='max', help='扫描指标: max | mean | variance')
     parser.add_argument('--threshold', type=float, default=20, help='阈值 (亮度/均值/方差)')
     parser.add_argument('--auto-threshold', type=float, help='自动阈值比例 (0-1)')
@@ -482,10 +1287,30 @@ def main() -> None:
     parser.add_argument('--col-scan-from-row', type=int, help='列扫描使用指定行段 (-1=最长行)')
     parser.add_argument('--expected-rows', type=int, help='预期行数（仅提示）')
     parser.add_argument('--expected-cols', type=int, help='预期列数（仅提示）')
+    parser.add_argument('--infer-grid', action='store_true', help='按自相关/边界对齐推断行列数，补全未指定的 --expected-rows/--expected-cols，并输出 gridInference')
+    parser.add_argument('--threshold-search', default='solver', choices=THRESHOLD_SEARCHES, help='给定预期行/列数时的阈值搜索: solver=精确区间求解 | quantile=旧版固定分位数')
+    parser.add_argument('--pyramid', type=int, default=0, choices=PYRAMID_FACTORS, help='金字塔模式降采样倍数（0=关闭）：先在 1/N 分辨率上找边界，再只在边界附近按全分辨率精算（仅 NumPy 后端；间隙需宽于 N 像素）')
+    parser.add_argument('--backend', default='auto', choices=BACKENDS, help='计算后端: auto | numpy | python（python 为逐像素参考实现）')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR), help='扫描剖面缓存目录（按图片内容哈希复用）')
+    parser.add_argument('--no-cache', action='store_true', help='不读写扫描剖面磁盘缓存')
+    parser.add_argument('--occupancy', action='store_true', help='输出网格占用位图（occupancy.occupied / emptyCells），用于跳过空白格')
+    parser.add_argument('--occupancy-inset', type=int, default=OCCUPANCY_INSET, help='占用检测时每格四周忽略的像素')
+    parser.add_argument('--occupancy-threshold', type=float, default=OCCUPANCY_THRESHOLD, help='平均亮度低于该值视为空格')
     parser.add_argument('--output', help='写入 JSON 文件')
     parser.add_argument('--pretty', action='store_true', help='格式化输出 JSON')
-    args = parser.parse_args()
+    parser.add_argument('--batch', help='批量模式：清单 JSON（defaults + images[{image, args, output}]）')
+    parser.add_argument('--batch-glob', action='append', help='批量模式：图片通配符（可多次指定，共用命令行扫描参数）')
+    parser.add_argument('--batch-out-dir', help='批量模式：配置输出目录（默认与图片同目录）')
+    parser.add_argument('--batch-summary', help='批量模式：汇总 JSON 路径（同时用于增量跳过）')
+    parser.add_argument('--jobs', type=int, default=0, help='批量模式并行进程数（<=0 表示 CPU 核数）')
+    parser.add_argument('--force', action='store_true', help='批量模式：忽略增量记录，全部重新扫描')
+    parser.add_argument('--profile', action='store_true', help='性能剖析：记录每张图片各阶段（解码/剖面/占用…）的耗时，结束时输出最慢图片（也可设 ASSET_PROFILE=1）')
+    parser.add_argument('--profile-dir', help='性能剖析：为每张图片保存 cProfile 数据并合并为 total.prof（隐含 --profile）')
+    parser.add_argument('--profile-top', type=int, help='性能剖析：报告中列出的最慢图片数（默认 ASSET_PROFILE_TOP 或 10）')
+    return parser
+
 
+def build_config_from_args(args: argparse.Namespace) -> dict:
     row_scan_x = None
     row_scan_y = None
     col_scan_x = None
@@ -511,7 +1336,7 @@ def main() -> None:
             args.col_scan_y_end or -1,
         )
 
-    config = build_config(
+    return build_config(
         args.image,
         args.metric,
         args.threshold,
@@ -543,14 +1368,231 @@ def main() -> None:
         args.col_scan_from_row,
         args.expected_rows,
         args.expected_cols,
+        args.backend,
+        None if args.no_cache else Path(args.cache_dir),
+        args.threshold_search,
+        args.occupancy,
+        args.occupancy_inset,
+        args.occupancy_threshold,
+        args.infer_grid,
+        args.pyramid,
     )
 
-    indent = 2 if args.pretty else None
-    output = json.dumps(config, ensure_ascii=False, indent=indent)
-    print(output)
-    if args.output:
-        with open(args.output, 'w', encoding='utf-8') as f:
-            f.write(output)
+
+# 只影响输出/调度、不影响扫描结果的参数，不参与增量判断
+BATCH_NEUTRAL_OPTIONS = {
+    'image', 'output', 'pretty', 'batch', 'batch_glob', 'batch_out_dir', 'batch_summary',
+    'jobs', 'force', 'backend', 'cache_dir', 'no_cache', 'profile', 'profile_dir', 'profile_top',
+}
+
+
+def options_hash(args: argparse.Namespace) -> str:
+    options = {k: v for k, v in sorted(vars(args).items()) if k not in BATCH_NEUTRAL_OPTIONS}
+    payload = json.dumps(options, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def default_batch_output(image_path: str, out_dir: str | None) -> str:
+    image = Path(image_path)
+    name = f"{image.stem}.atlas.json"
+    return str(Path(out_dir) / name if out_dir else image.with_name(name))
+
+
+def collect_batch_jobs(args: argparse.Namespace, argv: List[str]) -> List[dict]:
+    """把清单/通配符展开为任务列表；每个任务都是一组完整的命令行参数。"""
+    jobs: List[dict] = []
+    if args.batch:
+        manifest_path = Path(args.batch)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest, list):
+            manifest = {'images': manifest}
+        defaults = [str(v) for v in manifest.get('defaults') or []]
+        for entry in manifest.get('images') or []:
+            if isinstance(entry, str):
+                entry = {'image': entry}
+            image = entry.get('image')
+            if not image:
+                raise ValueError(f"清单条目缺少 image: {entry}")
+            image_path = str(image)
+            output = entry.get('output') or default_batch_output(image_path, args.batch_out_dir)
+            jobs.append({
+                'image': image_path,
+                'argv': defaults + [str(v) for v in entry.get('args') or []],
+                'output': output,
+            })
+
+    if args.batch_glob:
+        # 通配符模式：所有图片共用当前命令行上的扫描参数
+        shared_argv = strip_batch_argv(argv)
+        for pattern in args.batch_glob:
+            for image_path in sorted(glob.glob(pattern, recursive=True)):
+                jobs.append({
+                    'image': image_path,
+                    'argv': shared_argv,
+                    'output': default_batch_output(image_path, args.batch_out_dir),
+                })
+    return jobs
+
+
+def strip_batch_argv(argv: List[str]) -> List[str]:
+    valued = {
+        '--batch', '--batch-glob', '--batch-out-dir', '--batch-summary', '--jobs', '--image', '--output',
+        '--profile-dir', '--profile-top',
+    }
+    flags = {'--force', '--profile'}
+    result: List[str] = []
+    skip_next = False
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+            continue
+        name = arg.split('=', 1)[0]
+        if name in valued:
+            skip_next = '=' not in arg
+            continue
+        if name in flags:
+            continue
+        result.append(arg)
+    return result
+
+
+def run_batch_job(job: dict) -> dict:
+    """进程池工作函数：扫描单张图片并写出配置，返回汇总记录。"""
+    parser = build_parser()
+    args = parser.parse_args(job['argv'] + ['--image', job['image'], '--output', job['output']])
+    record = {
+        'image': job['image'],
+        'output': job['output'],
+        'imageHash': job['imageHash'],
+        'optionsHash': job['optionsHash'],
+    }
+    with asset_profile.track(job['image'], job.get('profile')) as profile:
+        try:
+            config = build_config_from_args(args)
+        except Exception as e:
+            config = None
+            record.update({'status': 'error', 'error': str(e)})
+
+        if config is not None:
+            output_path = Path(job['output'])
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            indent = 2 if args.pretty else None
+            with asset_profile.stage('write'):
+                output_path.write_text(json.dumps(config, ensure_ascii=False, indent=indent), encoding='utf-8')
+            record.update({'status': 'scanned', 'rows': config['rows'], 'cols': config['cols']})
+    if profile is not None:
+        record['profile'] = profile
+    return record
+
+
+def run_batch(args: argparse.Namespace, argv: List[str]) -> None:
+    jobs = collect_batch_jobs(args, argv)
+    if not jobs:
+        raise SystemExit("批量模式未找到任何图片")
+
+    summary_path = Path(args.batch_summary or Path(args.batch_out_dir or '.') / 'atlas-scan-summary.json')
+    previous: dict = {}
+    if summary_path.exists() and not args.force:
+        try:
+            with open(summary_path, 'r', encoding='utf-8') as f:
+                previous = {item['image']: item for item in json.load(f).get('results', [])}
+        except (OSError, ValueError, KeyError, TypeError):
+            previous = {}
+
+    parser = build_parser()
+    report = asset_profile.ProfileReport(asset_profile.options(args.profile, args.profile_dir, args.profile_top))
+    pending: List[dict] = []
+    results: List[dict] = []
+    for job in jobs:
+        if not Path(job['image']).is_file():
+            results.append({'image': job['image'], 'output': job['output'], 'status': 'error', 'error': '图片不存在'})
+            continue
+        job_args = parser.parse_args(job['argv'] + ['--image', job['image']])
+        job['optionsHash'] = options_hash(job_args)
+        with report.timed('hash'):
+            job['imageHash'] = file_sha256(job['image'])
+        job['profile'] = report.settings if report.enabled else None
+        prev = previous.get(job['image'])
+        if (
+            prev
+            and prev.get('status') in {'scanned', 'skipped'}
+            and prev.get('imageHash') == job['imageHash']
+            and prev.get('optionsHash') == job['optionsHash']
+            and prev.get('output') == job['output']
+            and Path(job['output']).exists()
+        ):
+            results.append(dict(prev, status='skipped'))
+        else:
+            pending.append(job)
+
+    workers = args.jobs if args.jobs and args.jobs > 0 else (os.cpu_count() or 1)
+    workers = max(1, min(workers, len(pending) or 1))
+    skipped = sum(1 for item in results if item['status'] == 'skipped')
+    print(f"[batch] 共 {len(jobs)} 张，跳过 {skipped} 张（内容与参数未变化），待扫描 {len(pending)} 张，进程数 {workers}")
+    for item in results:
+        if item['status'] == 'error':
+            print(f"[batch] 失败: {item['image']}: {item['error']}")
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_batch_job, job): job for job in pending}
+            for future in as_completed(futures):
+                record = future.result()
+                report.add(record.pop('profile', None))
+                results.append(record)
+                if record['status'] == 'error':
+                    print(f"[batch] 失败: {record['image']}: {record['error']}")
+                else:
+                    print(f"[batch] 完成: {record['image']} -> {record['output']} ({record['rows']}x{record['cols']})")
+
+    results.sort(key=lambda item: item['image'])
+    summary = {
+        'total': len(results),
+        'scanned': sum(1 for item in results if item['status'] == 'scanned'),
+        'skipped': sum(1 for item in results if item['status'] == 'skipped'),
+        'failed': sum(1 for item in results if item['status'] == 'error'),
+        'results': results,
+    }
+    summary_path.parent.mkdir(parents=True, exist_ok=True)
+    summary_path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"[batch] 汇总已写入: {summary_path}")
+    report.finish()
+    if summary['failed']:
+        raise SystemExit(1)
+
+
+def main() -> None:
+    if len(sys.argv) in (2, 4, 5, 6) and not sys.argv[1].startswith('-'):
+        # 旧版用法：atlas_grid_scan.py <image> [<rows> <cols> [inset] [threshold]]；省略行列数时自动推断
+        if len(sys.argv) == 2:
+            analyze_grid(sys.argv[1])
+            return
+        inset = int(sys.argv[4]) if len(sys.argv) > 4 else OCCUPANCY_INSET
+        threshold = float(sys.argv[5]) if len(sys.argv) > 5 else OCCUPANCY_THRESHOLD
+        analyze_grid(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), inset, threshold)
+        return
+
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.batch or args.batch_glob:
+        run_batch(args, sys.argv[1:])
+        return
+    if not args.image:
+        parser.error('缺少 --image（或使用 --batch / --batch-glob 批量模式）')
+
+    report = asset_profile.ProfileReport(asset_profile.options(args.profile, args.profile_dir, args.profile_top))
+    with asset_profile.track(args.image, report.settings) as profile:
+        config = build_config_from_args(args)
+
+        indent = 2 if args.pretty else None
+        output = json.dumps(config, ensure_ascii=False, indent=indent)
+        print(output)
+        if args.output:
+            with asset_profile.stage('write'), open(args.output, 'w', encoding='utf-8') as f:
+                f.write(output)
+    report.add(profile)
+    # 报告写到 stderr，不混入 stdout 上的 JSON
+    report.finish(sys.stderr)
 
 
 if __name__ == '__main__':
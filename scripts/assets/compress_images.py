@@ -1,33 +1,79 @@
+import fnmatch
+import hashlib
+import io
+import json
 import os
+import re
 import sys
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 try:
-    from PIL import Image, ImageOps
+    from PIL import Image, ImageOps, features
 except ImportError as exc:
     raise SystemExit("缺少 Pillow 依赖，请先执行: python -m pip install Pillow") from exc
 
+import asset_profile
+
 DEFAULT_ROOT = Path.cwd() / "public" / "assets"
 SKIP_DIR = "compressed"
 VALID_EXTS = {".png", ".jpg", ".jpeg"}
 MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "2048"))
 WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "82"))
+WEBP_METHOD = 6
 CLEAN_OUTPUT = os.getenv("IMAGE_CLEAN", "0") == "1"
-
-WEBP_ENABLED = True
-
-stats = {
-    "file_count": 0,
-    "skipped_count": 0,
-    "total_bytes": 0,
-    "output_bytes": 0,
-    "variant_count": 0,
-    "variant_bytes": 0,
-    "variant_skipped": 0,
-    "resized_count": 0,
+JOBS = int(os.getenv("IMAGE_JOBS", "0"))
+# 变体矩阵：额外尺寸（长边像素，逗号分隔）与额外格式；主输出 <name>.webp 始终保留
+VARIANT_SIZES = sorted({int(v) for v in os.getenv("IMAGE_VARIANT_SIZES", "").split(",") if v.strip()})
+VARIANT_FORMATS = [v.strip().lower() for v in os.getenv("IMAGE_VARIANT_FORMATS", "webp").split(",") if v.strip()]
+AVIF_QUALITY = int(os.getenv("IMAGE_AVIF_QUALITY", "60"))
+# 匹配这些相对路径通配符的源图（如 UI 精灵）输出无损 WebP
+LOSSLESS_PATTERNS = [v.strip() for v in os.getenv("IMAGE_LOSSLESS_PATTERNS", "").split(",") if v.strip()]
+VARIANTS_MANIFEST_NAME = "variants.json"
+# 自适应质量：按图二分搜索满足感知指标目标的最低 WebP 质量（如 "ssim:0.985" / "psnr:40"，为空则关闭）
+QUALITY_TARGET = os.getenv("IMAGE_QUALITY_TARGET", "").strip().lower()
+QUALITY_MIN = int(os.getenv("IMAGE_QUALITY_MIN", "40"))
+QUALITY_MAX = int(os.getenv("IMAGE_QUALITY_MAX", "95"))
+SSIM_WINDOW = 8
+# 评分口径版本：口径变化（如改为只比较 RGB）时递增，使旧的搜索结果失效
+QUALITY_SCORE_VERSION = 2
+# 增量清单：记录源文件内容哈希 + 编码参数，CI 检出后 mtime 不可信时仍能跳过未变化的文件
+MANIFEST_NAME = ".compress-manifest.json"
+MANIFEST_VERSION = 2
+
+WEBP_ENABLED = features.check("webp")
+
+
+def _avif_supported() -> bool:
+    try:
+        if features.check("avif"):
+            return True
+    except ValueError:
+        # 旧版 Pillow 不认识 avif 特性名；可能通过 pillow-avif-plugin 注册了编码器
+        pass
+    Image.init()
+    return "AVIF" in Image.SAVE
+
+
+AVIF_ENABLED = _avif_supported()
+FORMAT_INFO = {
+    "webp": ("WEBP", ".webp"),
+    "avif": ("AVIF", ".avif"),
 }
 
+STAT_KEYS = (
+    "file_count",
+    "skipped_count",
+    "cached_count",
+    "total_bytes",
+    "output_bytes",
+    "variant_count",
+    "variant_bytes",
+    "variant_skipped",
+    "resized_count",
+)
+
 
 def format_bytes(value: int) -> str:
     if value < 1024:
@@ -39,20 +85,60 @@ def format_bytes(value: int) -> str:
     return f"{mb:.2f} MB"
 
 
-def parse_args(argv: list[str]) -> tuple[Path, bool]:
+def parse_args(argv: list[str]) -> tuple[Path, bool, int, dict]:
     root = None
     clean = CLEAN_OUTPUT
-    for arg in argv:
+    jobs = JOBS
+    profile = False
+    profile_dir = None
+    profile_top = None
+    args = iter(argv)
+
+    def option_value(arg: str, name: str) -> str | None:
+        """--name=值 或 --name 值 两种写法都接受；不是该选项时返回 None。"""
+        if arg.startswith(f"{name}="):
+            return arg.split("=", 1)[1]
+        if arg != name:
+            return None
+        value = next(args, None)
+        if value is None:
+            raise SystemExit(f"{name} 需要一个值")
+        return value
+
+    def int_value(value: str, name: str) -> int:
+        try:
+            return int(value)
+        except ValueError:
+            raise SystemExit(f"{name} 需要整数，当前为: {value}") from None
+
+    for arg in args:
         if arg == "--clean":
             clean = True
             continue
+        value = option_value(arg, "--jobs")
+        if value is not None:
+            jobs = int_value(value, "--jobs")
+            continue
+        if arg == "--profile":
+            profile = True
+            continue
+        value = option_value(arg, "--profile-dir")
+        if value is not None:
+            profile_dir = value
+            continue
+        value = option_value(arg, "--profile-top")
+        if value is not None:
+            profile_top = int_value(value, "--profile-top")
+            continue
         if arg.startswith("--"):
             continue
         if root is None:
             root = Path(arg).resolve()
     if root is None:
         root = DEFAULT_ROOT
-    return root, clean
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    return root, clean, jobs, asset_profile.options(profile, profile_dir, profile_top)
 
 
 def clear_compressed_dirs(root: Path) -> int:
@@ -67,6 +153,158 @@ def clear_compressed_dirs(root: Path) -> int:
     return removed
 
 
+def is_lossless_path(relative: str) -> bool:
+    return any(fnmatch.fnmatch(relative, pattern) for pattern in LOSSLESS_PATTERNS)
+
+
+def variant_formats() -> list[str]:
+    formats = ["webp"]
+    for name in VARIANT_FORMATS:
+        if name not in FORMAT_INFO or name in formats:
+            continue
+        if name == "avif" and not AVIF_ENABLED:
+            continue
+        formats.append(name)
+    return formats
+
+
+def encode_settings(lossless: bool) -> dict:
+    settings = {
+        "version": MANIFEST_VERSION,
+        "maxEdge": MAX_EDGE,
+        "webpQuality": WEBP_QUALITY,
+        "webpMethod": WEBP_METHOD,
+        "webpLossless": lossless,
+        "avifQuality": AVIF_QUALITY,
+        "sizes": VARIANT_SIZES,
+        "formats": variant_formats(),
+        "qualityTarget": QUALITY_TARGET or None,
+        "qualityMin": QUALITY_MIN,
+        "qualityMax": QUALITY_MAX,
+    }
+    if QUALITY_TARGET:
+        # 只在开启自适应质量时记录，未开启时清单不受评分口径变化影响
+        settings["qualityScore"] = QUALITY_SCORE_VERSION
+    return settings
+
+
+def parse_quality_target(target: str) -> tuple[str, float]:
+    metric, _, value = target.partition(":")
+    if metric not in {"ssim", "psnr"} or not value:
+        raise SystemExit(f"IMAGE_QUALITY_TARGET 格式应为 ssim:<0-1> 或 psnr:<dB>，当前为: {target}")
+    return metric, float(value)
+
+
+def _comparable_planes(img: Image.Image, with_alpha: bool):
+    """转为 float 的预乘 RGB，避免全透明像素的颜色差异影响评分；with_alpha 时追加 alpha 通道。"""
+    import numpy as np
+
+    rgba = np.asarray(img.convert("RGBA"), dtype=np.float64)
+    alpha = rgba[..., 3:4] / 255.0
+    if not with_alpha:
+        return rgba[..., :3] * alpha
+    return np.concatenate([rgba[..., :3] * alpha, rgba[..., 3:4]], axis=2)
+
+
+def _has_varying_alpha(img: Image.Image) -> bool:
+    """alpha 不是常数时才参与评分；不透明图若计入恒等的 alpha 通道，SSIM/PSNR 会被虚高。"""
+    if "A" not in img.getbands() and "transparency" not in img.info:
+        return False
+    low, high = img.convert("RGBA").getchannel("A").getextrema()
+    return low != high
+
+
+def _box_mean(plane, k: int):
+    import numpy as np
+
+    c = np.pad(plane.cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+    return (c[k:, k:] - c[:-k, k:] - c[k:, :-k] + c[:-k, :-k]) / (k * k)
+
+
+def perceptual_score(metric: str, reference, candidate) -> float:
+    import numpy as np
+
+    if metric == "psnr":
+        mse = float(np.mean((reference - candidate) ** 2))
+        return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+    # SSIM：k x k 均值窗口，逐通道（预乘 RGB，alpha 有变化时再加 alpha）计算后取平均
+    k = max(1, min(SSIM_WINDOW, reference.shape[0], reference.shape[1]))
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    scores = []
+    for ch in range(reference.shape[2]):
+        x = reference[..., ch]
+        y = candidate[..., ch]
+        mu_x = _box_mean(x, k)
+        mu_y = _box_mean(y, k)
+        var_x = _box_mean(x * x, k) - mu_x * mu_x
+        var_y = _box_mean(y * y, k) - mu_y * mu_y
+        cov = _box_mean(x * y, k) - mu_x * mu_y
+        ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / (
+            (mu_x * mu_x + mu_y * mu_y + c1) * (var_x + var_y + c2)
+        )
+        scores.append(float(ssim_map.mean()))
+    return sum(scores) / len(scores)
+
+
+def search_webp_quality(img: Image.Image, target: str, low: int, high: int) -> tuple[int, float]:
+    """二分搜索满足目标的最低质量（假设评分随质量单调不降）；都不满足时返回 high。"""
+    metric, goal = parse_quality_target(target)
+    save_img = img.convert("RGBA") if img.mode == "P" else img
+    with_alpha = _has_varying_alpha(save_img)
+    reference = _comparable_planes(save_img, with_alpha)
+
+    def score_at(quality: int) -> float:
+        buffer = io.BytesIO()
+        save_img.save(buffer, format="WEBP", quality=quality, method=WEBP_METHOD)
+        buffer.seek(0)
+        with Image.open(buffer) as decoded:
+            return perceptual_score(metric, reference, _comparable_planes(decoded, with_alpha))
+
+    best_quality = high
+    best_score = score_at(high)
+    if best_score < goal:
+        return high, best_score
+    while low < best_quality:
+        mid = (low + best_quality) // 2
+        score = score_at(mid)
+        if score >= goal:
+            best_quality, best_score = mid, score
+        else:
+            low = mid + 1
+    return best_quality, best_score
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(root: Path) -> dict:
+    path = root / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files") or {}
+
+
+def save_manifest(root: Path, files: dict) -> None:
+    path = root / MANIFEST_NAME
+    data = {"version": MANIFEST_VERSION, "files": dict(sorted(files.items()))}
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
 def resize_image(img: Image.Image) -> tuple[Image.Image, bool]:
     if MAX_EDGE <= 0:
         return img, False
@@ -83,114 +321,356 @@ def save_variant(
     dest: Path,
     format_name: str,
     quality: int,
-    original_size: int,
-    source_mtime: float,
+    lossless: bool = False,
 ) -> int | None:
-    global WEBP_ENABLED
-
     if format_name == "WEBP" and not WEBP_ENABLED:
         return None
 
-    if dest.exists():
-        try:
-            dest_stat = dest.stat()
-            if dest_stat.st_size > 0 and dest_stat.st_mtime >= source_mtime:
-                output_size = dest_stat.st_size
-                if output_size >= original_size:
-                    stats["variant_skipped"] += 1
-                return output_size
-        except OSError:
-            pass
-
     try:
         save_img = img
         if img.mode == "P":
             save_img = img.convert("RGBA")
         save_kwargs = {"format": format_name, "quality": quality}
         if format_name == "WEBP":
-            save_kwargs["method"] = 6
+            save_kwargs["method"] = WEBP_METHOD
+            if lossless:
+                save_kwargs["lossless"] = True
         save_img.save(dest, **save_kwargs)
     except Exception:
         if dest.exists():
             dest.unlink()
-        if format_name == "WEBP":
-            WEBP_ENABLED = False
-            print("WEBP 不可用，已跳过后续 WEBP 输出。")
         return None
 
-    output_size = dest.stat().st_size
-    if output_size >= original_size:
-        stats["variant_skipped"] += 1
+    return dest.stat().st_size
+
+
+def quality_search_key(settings: dict) -> list:
+    # 搜索结果只取决于这些条件；其余参数（如尺寸变体、AVIF）变化时可复用
+    return [
+        settings["qualityTarget"],
+        settings["qualityMin"],
+        settings["qualityMax"],
+        settings["maxEdge"],
+        settings["webpMethod"],
+        QUALITY_SCORE_VERSION,
+    ]
+
+
+def is_fresh(entry: dict | None, src_hash: str, settings: dict, output_dir: Path) -> bool:
+    if not entry or entry.get("sourceHash") != src_hash or entry.get("settings") != settings:
+        return False
+    for output in (entry.get("outputs") or {}).values():
+        dest = output_dir / output["name"]
+        try:
+            if dest.stat().st_size != output["bytes"]:
+                return False
+        except OSError:
+            return False
+    return bool(entry.get("outputs"))
+
 
-    stats["variant_count"] += 1
-    stats["variant_bytes"] += output_size
-    return output_size
+def handle_file(task: dict) -> dict:
+    """工作进程入口：处理单个源文件，返回本文件的统计与清单条目（不修改任何全局状态）。
+    开启剖析时结果附带 profile 记录（各阶段耗时与字节数），由主进程汇总。"""
+    with asset_profile.track(task["relative"], task.get("profile")) as record:
+        result = process_file(task)
+    if record is not None:
+        result["profile"] = record
+    return result
 
 
-def handle_file(src: Path, root: Path) -> None:
-    ext = src.suffix.lower()
-    if ext not in VALID_EXTS:
-        return
+def process_file(task: dict) -> dict:
+    src = Path(task["src"])
+    relative = task["relative"]
+    settings = task["settings"]
+    result = {key: 0 for key in STAT_KEYS}
+    result.update({"relative": relative, "status": "processed", "entry": None, "message": ""})
 
     output_dir = src.parent / SKIP_DIR
     output_dir.mkdir(parents=True, exist_ok=True)
     src_stat = src.stat()
     original_size = src_stat.st_size
-    source_mtime = src_stat.st_mtime
-    stats["total_bytes"] += original_size
-
+    result["total_bytes"] = original_size
+
+    entry = task.get("entry")
+    src_hash = None
+    if entry and entry.get("sourceSize") == original_size and entry.get("sourceMtimeNs") == src_stat.st_mtime_ns:
+        # 本地 mtime/大小均未变化时沿用记录的哈希，避免每次重读大文件
+        src_hash = entry.get("sourceHash")
+    if src_hash is None:
+        with asset_profile.stage("hash", original_size):
+            src_hash = file_sha256(src)
+
+    if is_fresh(entry, src_hash, settings, output_dir):
+        output_size = entry["outputs"]["webp"]["bytes"]
+        if output_size >= original_size:
+            result["variant_skipped"] = 1
+        result.update({
+            "status": "cached",
+            "cached_count": 1,
+            "file_count": 1,
+            "output_bytes": output_size,
+            "entry": dict(entry, sourceSize=original_size, sourceMtimeNs=src_stat.st_mtime_ns),
+        })
+        return result
+
+    lossless = settings["webpLossless"]
+    outputs: dict = {}
+    webp_quality = WEBP_QUALITY
+    quality_search = None
     with Image.open(src) as img:
-        img = ImageOps.exif_transpose(img)
-        working, resized = resize_image(img)
+        with asset_profile.stage("decode", original_size):
+            img.load()
+            img = ImageOps.exif_transpose(img)
+        source_w, source_h = img.size
+        with asset_profile.stage("resize"):
+            working, resized = resize_image(img)
         if resized:
-            stats["resized_count"] += 1
-
-        variant_base = output_dir / src.stem
-        webp_size = save_variant(
-            working,
-            variant_base.with_suffix(".webp"),
-            "WEBP",
-            WEBP_QUALITY,
-            original_size,
-            source_mtime,
-        )
-
-        output_size = webp_size
-        if output_size is None:
-            stats["skipped_count"] += 1
-            relative = src.relative_to(root)
-            print(f"已跳过: {relative}（无法生成 WebP）")
-            return
-
-    stats["file_count"] += 1
-    stats["output_bytes"] += output_size
-
-    relative = src.relative_to(root)
-    resize_note = ""
+            result["resized_count"] = 1
+
+        target = settings["qualityTarget"]
+        if target and not lossless and WEBP_ENABLED:
+            searched = (entry or {}).get("qualitySearch") or {}
+            if (
+                entry
+                and entry.get("sourceHash") == src_hash
+                and searched.get("key") == quality_search_key(settings)
+            ):
+                # 源图与搜索条件未变（例如只新增了尺寸变体），直接沿用上次搜索结果
+                quality_search = searched
+            else:
+                with asset_profile.stage("quality-search"):
+                    quality, score = search_webp_quality(
+                        working, target, settings["qualityMin"], settings["qualityMax"]
+                    )
+                quality_search = {"key": quality_search_key(settings), "quality": quality, "score": score}
+            webp_quality = quality_search["quality"]
+
+        # 一次解码：主输出 + 更小尺寸的变体都从 working 派生
+        renditions = [("", working)]
+        for size in settings["sizes"]:
+            if size >= max(working.size):
+                continue
+            with asset_profile.stage("resize"):
+                scaled = working.copy()
+                scaled.thumbnail((size, size), Image.LANCZOS)
+            renditions.append((f"@{size}", scaled))
+
+        for suffix, rendition in renditions:
+            for name in settings["formats"]:
+                format_name, ext = FORMAT_INFO[name]
+                quality = AVIF_QUALITY if name == "avif" else webp_quality
+                dest = output_dir / f"{src.stem}{suffix}{ext}"
+                with asset_profile.stage(f"encode-{name}") as encoded:
+                    size_bytes = save_variant(
+                        rendition,
+                        dest,
+                        format_name,
+                        quality,
+                        lossless=lossless and name == "webp",
+                    )
+                    encoded["bytes"] = size_bytes or 0
+                if size_bytes is None:
+                    if name == "webp" and not suffix:
+                        result.update({"status": "skipped", "skipped_count": 1, "message": "无法生成 WebP"})
+                        return result
+                    continue
+                outputs[f"{name}{suffix}"] = {
+                    "name": dest.name,
+                    "bytes": size_bytes,
+                    "format": name,
+                    "width": rendition.size[0],
+                    "height": rendition.size[1],
+                    "lossless": lossless and name == "webp",
+                }
+                result["variant_count"] += 1
+                result["variant_bytes"] += size_bytes
+
+    output_size = outputs["webp"]["bytes"]
+    if output_size >= original_size:
+        result["variant_skipped"] = 1
+    result.update({
+        "file_count": 1,
+        "output_bytes": output_size,
+        "entry": {
+            "sourceHash": src_hash,
+            "sourceSize": original_size,
+            "sourceMtimeNs": src_stat.st_mtime_ns,
+            "settings": settings,
+            "sourceWidth": source_w,
+            "sourceHeight": source_h,
+            "width": working.size[0],
+            "height": working.size[1],
+            "outputs": outputs,
+        },
+    })
+    if quality_search is not None:
+        result["entry"]["qualitySearch"] = quality_search
+    notes = []
     if resized:
-        resize_note = f" (已缩放至 {working.size[0]}x{working.size[1]})"
-    print(f"已处理: {relative} {format_bytes(original_size)} -> webp {format_bytes(output_size)}{resize_note}")
+        notes.append(f"已缩放至 {working.size[0]}x{working.size[1]}")
+    if quality_search is not None:
+        notes.append(f"质量 {webp_quality}")
+    if len(outputs) > 1:
+        notes.append(f"变体 {len(outputs)} 个")
+    if notes:
+        result["message"] = f" ({'，'.join(notes)})"
+    return result
+
+
+def write_variant_manifests(root: Path, files: dict) -> int:
+    """按目录写出 compressed/variants.json，供前端按尺寸/格式挑选最小的可用资源。"""
+    by_dir: dict = {}
+    for relative, entry in files.items():
+        rel_path = Path(relative)
+        variants = sorted(
+            entry["outputs"].values(),
+            key=lambda item: (item["width"], item["bytes"]),
+        )
+        by_dir.setdefault(rel_path.parent, {})[rel_path.stem] = {
+            "source": rel_path.name,
+            "sourceWidth": entry.get("sourceWidth"),
+            "sourceHeight": entry.get("sourceHeight"),
+            "variants": [
+                {
+                    "file": item["name"],
+                    "format": item["format"],
+                    "width": item["width"],
+                    "height": item["height"],
+                    "bytes": item["bytes"],
+                    "lossless": item["lossless"],
+                }
+                for item in variants
+            ],
+        }
+
+    for rel_dir, images in by_dir.items():
+        path = root / rel_dir / SKIP_DIR / VARIANTS_MANIFEST_NAME
+        data = {"version": 1, "images": dict(sorted(images.items()))}
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    return len(by_dir)
+
+
+def remove_stale_variants(root: Path, previous: dict, files: dict) -> int:
+    """删除不在当前变体矩阵中的旧输出（IMAGE_VARIANT_SIZES / IMAGE_VARIANT_FORMATS 缩小后残留的文件），
+    避免 upload-to-r2.js 继续上传。只处理本次仍有清单条目的源图：候选为上次清单记录的输出，
+    以及同名的 <name>.<格式> / <name>@<尺寸>.<格式> 文件（覆盖清单丢失或版本变化的情况）。"""
+    keep: dict = {}
+    for relative, entry in files.items():
+        names = keep.setdefault(Path(relative).parent, set())
+        names.update(output["name"] for output in entry["outputs"].values())
+
+    exts = "|".join(re.escape(ext) for _, ext in FORMAT_INFO.values())
+    removed = 0
+    for relative in files:
+        rel_path = Path(relative)
+        output_dir = root / rel_path.parent / SKIP_DIR
+        candidates = {output["name"] for output in ((previous.get(relative) or {}).get("outputs") or {}).values()}
+        pattern = re.compile(rf"{re.escape(rel_path.stem)}(@\d+)?({exts})")
+        if output_dir.is_dir():
+            candidates.update(path.name for path in output_dir.iterdir() if pattern.fullmatch(path.name))
+        for name in candidates - keep[rel_path.parent]:
+            try:
+                (output_dir / name).unlink()
+            except FileNotFoundError:
+                continue
+            removed += 1
+    return removed
 
 
-def walk_dir(root: Path) -> None:
+def collect_files(root: Path) -> list[Path]:
+    files: list[Path] = []
     for current, dirnames, filenames in os.walk(root):
         dirnames[:] = [name for name in dirnames if name != SKIP_DIR]
         for filename in filenames:
-            handle_file(Path(current) / filename, root)
+            path = Path(current) / filename
+            if path.suffix.lower() in VALID_EXTS:
+                files.append(path)
+    return files
+
+
+def report_result(result: dict) -> None:
+    relative = result["relative"]
+    if result["status"] == "skipped":
+        print(f"已跳过: {relative}（{result['message']}）")
+    elif result["status"] == "processed":
+        print(
+            f"已处理: {relative} {format_bytes(result['total_bytes'])} -> "
+            f"webp {format_bytes(result['output_bytes'])}{result['message']}"
+        )
+
+
+def walk_dir(root: Path, jobs: int, profile: dict | None = None) -> dict:
+    """并行处理 root 下所有源图，合并各文件结果并更新增量清单，返回汇总统计。
+    开启剖析时结束后打印最慢文件与各阶段合计。"""
+    report = asset_profile.ProfileReport(profile or asset_profile.options())
+    with report.timed("walk"):
+        manifest = load_manifest(root)
+        tasks = []
+        for src in collect_files(root):
+            relative = src.relative_to(root).as_posix()
+            tasks.append({
+                "src": str(src),
+                "relative": relative,
+                "settings": encode_settings(is_lossless_path(relative)),
+                "entry": manifest.get(relative),
+                "profile": report.settings if report.enabled else None,
+            })
+
+    stats = {key: 0 for key in STAT_KEYS}
+    next_manifest: dict = {}
+
+    def merge(result: dict) -> None:
+        report_result(result)
+        report.add(result.pop("profile", None))
+        for key in STAT_KEYS:
+            stats[key] += result[key]
+        if result["entry"] is not None:
+            next_manifest[result["relative"]] = result["entry"]
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for result in executor.map(handle_file, tasks, chunksize=4):
+                merge(result)
+    else:
+        for task in tasks:
+            merge(handle_file(task))
+
+    with report.timed("manifest"):
+        save_manifest(root, next_manifest)
+        write_variant_manifests(root, next_manifest)
+        stats["stale_removed"] = remove_stale_variants(root, manifest, next_manifest)
+    report.finish()
+    return stats
 
 
 def main() -> None:
-    root, clean = parse_args(sys.argv[1:])
+    root, clean, jobs, profile = parse_args(sys.argv[1:])
     if not root.exists():
         raise SystemExit(f"路径不存在: {root}")
 
     if clean:
         removed = clear_compressed_dirs(root)
+        manifest_path = root / MANIFEST_NAME
+        if manifest_path.exists():
+            manifest_path.unlink()
         if removed > 0:
             print(f"已清空 {removed} 个 {SKIP_DIR} 目录。")
 
-    print(f"开始压缩与转码: {root}")
-    walk_dir(root)
+    if not WEBP_ENABLED:
+        print("WEBP 不可用，已跳过 WEBP 输出。")
+    if QUALITY_TARGET:
+        parse_quality_target(QUALITY_TARGET)
+        try:
+            import numpy  # noqa: F401
+        except ImportError as exc:
+            raise SystemExit("自适应质量需要 NumPy，请先执行: python -m pip install numpy") from exc
+        print(f"自适应质量: 目标 {QUALITY_TARGET}，搜索区间 {QUALITY_MIN}-{QUALITY_MAX}")
+    if "avif" in VARIANT_FORMATS and not AVIF_ENABLED:
+        print("当前 Pillow 不支持 AVIF 编码，已跳过 AVIF 变体。")
+
+    print(f"开始压缩与转码: {root}（并行进程 {jobs}）")
+    stats = walk_dir(root, jobs, profile)
 
     saved = stats["total_bytes"] - stats["output_bytes"]
     summary = (
@@ -202,10 +682,19 @@ def main() -> None:
         if stats["skipped_count"] > 0
         else ""
     )
+    cached_info = ""
+    if stats["cached_count"] > 0:
+        cached_info = f"（{stats['cached_count']} 张内容与参数未变化，沿用已有输出）"
     resized_info = ""
     if stats["resized_count"] > 0:
         resized_info = f"（{stats['resized_count']} 张已缩放）"
-    print(f"{summary}{skipped}{resized_info}")
+    variant_info = ""
+    if stats["variant_count"] > 0 and (VARIANT_SIZES or len(variant_formats()) > 1):
+        variant_info = f"（本次生成 {stats['variant_count']} 个变体，共 {format_bytes(stats['variant_bytes'])}）"
+    stale_info = ""
+    if stats["stale_removed"] > 0:
+        stale_info = f"（已删除 {stats['stale_removed']} 个不再生成的旧变体）"
+    print(f"{summary}{skipped}{cached_info}{resized_info}{variant_info}{stale_info}")
 
 
 if __name__ == "__main__":
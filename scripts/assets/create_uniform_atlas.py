@@ -2,10 +2,18 @@
 """
 创建均匀网格图集
 将多张图片按照指定的行列数排列成一个均匀网格图集
+- 未指定 --rows/--cols 时按图片数量与单元格宽高比选择最接近正方形的布局
+- 默认在内存中拼出整张图集后保存
+- --stream：单元格在进程池中解码/缩放，按行带（一行单元格）写出 PNG，峰值内存约为一个行带；
+  每条扫描线按 None/Sub/Up/Paeth 中绝对值和最小者滤波（与 libpng 的启发式一致，需要 NumPy）
 """
 
 import argparse
+import math
 import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 try:
@@ -17,16 +25,22 @@ except ImportError as exc:
 def parse_args():
     parser = argparse.ArgumentParser(description="创建均匀网格图集")
     parser.add_argument("input_dir", help="输入图片目录")
-    parser.add_argument("--rows", type=int, required=True, help="行数")
-    parser.add_argument("--cols", type=int, required=True, help="列数")
+    parser.add_argument("--rows", type=int, help="行数（可选，省略时按图片数量自动选择）")
+    parser.add_argument("--cols", type=int, help="列数（可选，省略时按图片数量自动选择）")
     parser.add_argument("--output", required=True, help="输出图集路径")
     parser.add_argument("--cell-width", type=int, help="单元格宽度（可选，默认使用第一张图片的宽度）")
     parser.add_argument("--cell-height", type=int, help="单元格高度（可选，默认使用第一张图片的高度）")
     parser.add_argument("--padding", type=int, default=0, help="单元格间距（默认0）")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="流式拼接：按行带写出 PNG（逐行自适应滤波），内存占用约为一行单元格（仅支持 PNG 输出，需要 NumPy）",
+    )
+    parser.add_argument("--jobs", type=int, default=0, help="流式模式的解码进程数（默认 CPU 核数）")
     return parser.parse_args()
 
 
-def collect_images(input_dir: Path, max_count: int):
+def collect_images(input_dir: Path, max_count: int | None):
     """收集图片文件，按数字排序"""
     valid_exts = {".png", ".jpg", ".jpeg", ".webp"}
     files = [
@@ -56,6 +70,9 @@ def collect_images(input_dir: Path, max_count: int):
     numbered.sort(key=lambda item: item[0])
     files = [f for _, f in numbered]
     
+    if max_count is None:
+        return files
+
     # 只取前 max_count 张
     files = files[:max_count]
     
@@ -65,18 +82,43 @@ def collect_images(input_dir: Path, max_count: int):
     return files
 
 
-def create_atlas(files, rows, cols, cell_width, cell_height, padding, output_path):
-    """创建图集"""
-    if not files:
-        raise SystemExit("没有找到图片文件")
-    
-    # 如果没有指定单元格尺寸，使用第一张图片的尺寸
+def resolve_cell_size(files, cell_width, cell_height):
+    """未指定单元格尺寸时使用第一张图片的尺寸（只读文件头）"""
     if cell_width is None or cell_height is None:
         with Image.open(files[0]) as img:
             if cell_width is None:
                 cell_width = img.width
             if cell_height is None:
                 cell_height = img.height
+    return cell_width, cell_height
+
+
+def choose_layout(count, cell_width, cell_height, padding, rows=None, cols=None):
+    """补全行列数：只给一个时按图片数量推算另一个；都未给时选择图集宽高最接近 1:1 的布局（空格少者优先）"""
+    count = max(1, count)
+    if rows and cols:
+        return rows, cols
+    if rows:
+        return rows, math.ceil(count / rows)
+    if cols:
+        return math.ceil(count / cols), cols
+
+    def score(candidate_cols):
+        candidate_rows = math.ceil(count / candidate_cols)
+        width = candidate_cols * cell_width + (candidate_cols - 1) * padding
+        height = candidate_rows * cell_height + (candidate_rows - 1) * padding
+        return abs(math.log(width / height)), candidate_rows * candidate_cols - count
+
+    best_cols = min(range(1, count + 1), key=score)
+    return math.ceil(count / best_cols), best_cols
+
+
+def create_atlas(files, rows, cols, cell_width, cell_height, padding, output_path):
+    """创建图集"""
+    if not files:
+        raise SystemExit("没有找到图片文件")
+    
+    cell_width, cell_height = resolve_cell_size(files, cell_width, cell_height)
     
     # 计算图集尺寸
     atlas_width = cols * cell_width + (cols - 1) * padding
@@ -128,6 +170,184 @@ def create_atlas(files, rows, cols, cell_width, cell_height, padding, output_pat
     print(f"图集尺寸: {atlas_width}x{atlas_height}")
 
 
+def png_chunk(tag: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + tag
+        + data
+        + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    )
+
+
+def filter_scanlines(rows, previous):
+    """对 (行数, stride) 的 uint8 扫描线逐行选择 PNG 滤波（0 None / 1 Sub / 2 Up / 4 Paeth），
+    返回带滤波类型字节的数据。previous 为上一条扫描线（首行为全 0）。"""
+    import numpy as np
+
+    bpp = 4
+    up = np.vstack([previous[None, :], rows[:-1]])
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+    upper_left = np.zeros_like(rows)
+    upper_left[:, bpp:] = up[:, :-bpp]
+
+    a, b, c = (plane.astype(np.int16) for plane in (left, up, upper_left))
+    pa = np.abs(b - c)
+    pb = np.abs(a - c)
+    pc = np.abs(a + b - 2 * c)
+    paeth = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, upper_left))
+
+    candidates = np.stack([rows, rows - left, rows - up, rows - paeth])  # uint8 按模 256 相减
+    # 启发式：把滤波结果视为有符号字节，取绝对值和最小的滤波
+    cost = np.stack([np.abs(candidate.view(np.int8), dtype=np.int16).sum(axis=1) for candidate in candidates])
+    choice = cost.argmin(axis=0)
+    filter_types = np.array([0, 1, 2, 4], dtype=np.uint8)
+    out = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+    out[:, 0] = filter_types[choice]
+    out[:, 1:] = candidates[choice, np.arange(rows.shape[0])]
+    return out.tobytes()
+
+
+class StreamingPngWriter:
+    """逐行写出 8 位 RGBA PNG：扫描线经自适应滤波、zlib 增量压缩后分块写入 IDAT，不保留整张图像"""
+
+    IDAT_SIZE = 1 << 20
+    # 每次滤波的扫描线字节数上限：滤波的临时数组约为其 20 倍，避免宽图集抵消流式写出的内存收益
+    FILTER_BYTES = 1 << 18
+
+    def __init__(self, path: Path, width: int, height: int, compress_level: int = 6):
+        try:
+            import numpy as np
+        except ImportError as exc:
+            raise SystemExit("流式模式需要 NumPy，请先执行: python -m pip install numpy") from exc
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.previous = np.zeros(width * 4, dtype=np.uint8)
+        self.compressor = zlib.compressobj(compress_level)
+        self.pending = bytearray()
+        self.file = open(path, "wb")
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        # 位深 8，颜色类型 6（RGBA），默认压缩/滤波，无隔行
+        self.file.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def _emit(self, data: bytes, force: bool = False) -> None:
+        self.pending.extend(data)
+        while len(self.pending) >= self.IDAT_SIZE or (force and self.pending):
+            chunk = bytes(self.pending[: self.IDAT_SIZE])
+            del self.pending[: self.IDAT_SIZE]
+            self.file.write(png_chunk(b"IDAT", chunk))
+
+    def write_rows(self, data: bytes) -> None:
+        """写入若干条完整扫描线（每行 width * 4 字节，不含滤波字节）"""
+        stride = self.width * 4
+        if len(data) % stride:
+            raise ValueError("扫描线数据长度不是整行")
+        count = len(data) // stride
+        if self.rows_written + count > self.height:
+            raise ValueError("写入行数超过图像高度")
+        import numpy as np
+
+        rows = np.frombuffer(data, dtype=np.uint8).reshape(count, stride)
+        step = max(1, self.FILTER_BYTES // stride)
+        for start in range(0, count, step):
+            chunk = rows[start:start + step]
+            self._emit(self.compressor.compress(filter_scanlines(chunk, self.previous)))
+            self.previous = chunk[-1]
+        self.rows_written += count
+
+    def close(self) -> None:
+        if self.rows_written != self.height:
+            self.file.close()
+            raise ValueError(f"PNG 行数不完整: {self.rows_written}/{self.height}")
+        self._emit(self.compressor.flush(), force=True)
+        self.file.write(png_chunk(b"IEND", b""))
+        self.file.close()
+
+
+def load_cell(task):
+    """进程池任务：解码并缩放单元格，返回 (文件名, 原始尺寸, RGBA 字节)"""
+    path, cell_width, cell_height = task
+    with Image.open(path) as img:
+        original_size = img.size
+        if img.mode != "RGBA":
+            img = img.convert("RGBA")
+        if img.size != (cell_width, cell_height):
+            img = img.resize((cell_width, cell_height), Image.Resampling.LANCZOS)
+        return Path(path).name, original_size, img.tobytes()
+
+
+def create_atlas_streaming(files, rows, cols, cell_width, cell_height, padding, output_path, jobs):
+    """流式创建图集：同时只持有当前行带与预取的下一行带的单元格"""
+    if not files:
+        raise SystemExit("没有找到图片文件")
+
+    cell_width, cell_height = resolve_cell_size(files, cell_width, cell_height)
+    atlas_width = cols * cell_width + (cols - 1) * padding
+    atlas_height = rows * cell_height + (rows - 1) * padding
+
+    print(f"创建图集（流式）: {atlas_width}x{atlas_height} ({rows}行 x {cols}列)")
+    print(f"单元格尺寸: {cell_width}x{cell_height}")
+    print(f"间距: {padding}px")
+
+    files = files[: rows * cols]
+    band_files = [files[row * cols:(row + 1) * cols] for row in range(rows)]
+    cell_stride = cell_width * 4
+    gap = bytes(padding * 4)
+    empty_cell = bytes(cell_stride * cell_height)
+    padding_rows = bytes(atlas_width * 4 * padding)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=jobs or None) as executor, \
+            StreamingPngWriter(output_path, atlas_width, atlas_height) as writer:
+
+        def submit(row):
+            return [
+                executor.submit(load_cell, (str(path), cell_width, cell_height))
+                for path in band_files[row]
+            ]
+
+        pending = submit(0) if rows else []
+        for row in range(rows):
+            futures = pending
+            # 预取下一行带，让解码与当前行带的压缩写出重叠
+            pending = submit(row + 1) if row + 1 < rows else []
+            cells = []
+            for col, future in enumerate(futures):
+                name, original_size, data = future.result()
+                if original_size != (cell_width, cell_height):
+                    print(
+                        f"调整 {name} 尺寸: {original_size[0]}x{original_size[1]} -> "
+                        f"{cell_width}x{cell_height}"
+                    )
+                print(
+                    f"放置 {name} 到位置 ({row}, {col}) -> "
+                    f"({col * (cell_width + padding)}, {row * (cell_height + padding)})"
+                )
+                cells.append(data)
+            cells.extend([empty_cell] * (cols - len(cells)))
+
+            band = b"".join(
+                gap.join(cell[offset:offset + cell_stride] for cell in cells)
+                for offset in range(0, cell_stride * cell_height, cell_stride)
+            )
+            writer.write_rows(band)
+            if padding and row + 1 < rows:
+                writer.write_rows(padding_rows)
+
+    print(f"\n图集已保存: {output_path}")
+    print(f"图集尺寸: {atlas_width}x{atlas_height}")
+
+
 def main():
     args = parse_args()
     
@@ -137,9 +357,34 @@ def main():
     
     output_path = Path(args.output).resolve()
     
-    max_count = args.rows * args.cols
+    max_count = args.rows * args.cols if args.rows and args.cols else None
     files = collect_images(input_dir, max_count)
+
+    if max_count is None:
+        if not files:
+            raise SystemExit("没有找到图片文件")
+        cell_width, cell_height = resolve_cell_size(files, args.cell_width, args.cell_height)
+        args.rows, args.cols = choose_layout(
+            len(files), cell_width, cell_height, args.padding, args.rows, args.cols
+        )
+        print(f"自动布局: {len(files)} 张图片 -> {args.rows}x{args.cols}")
+        files = files[:args.rows * args.cols]
     
+    if args.stream:
+        if output_path.suffix.lower() == ".png":
+            create_atlas_streaming(
+                files,
+                args.rows,
+                args.cols,
+                args.cell_width,
+                args.cell_height,
+                args.padding,
+                output_path,
+                args.jobs,
+            )
+            return
+        print(f"警告：--stream 仅支持 PNG 输出（{output_path.suffix} 编码需要完整图像），已回退为内存模式")
+
     create_atlas(
         files,
         args.rows,
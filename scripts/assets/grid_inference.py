@@ -0,0 +1,235 @@
+"""
+网格行列数推断
+- 背景色取“最平坦”的行/列（极差最小，即格间空隙/分隔线）的中值，不看图像四边：卡牌贴边排列时四边是卡面而不是背景
+- 每个轴取剖面：每列/每行像素与背景色的最大偏差；格间空隙、分隔线处偏差最小
+- 剖面转为“空隙度”（1 - 剖面 / 内容水平，与背景一致处为 1），去趋势后用 FFT 自相关找主周期（格距）
+- 对候选格数 k 取等分边界 round(i * length / k)（允许偏 1 像素），边界处空隙度的均值即对齐得分；
+  自相关有可信峰时只在主周期为格距整数倍的候选中选，再取相对全轴均值 z 分数最高者
+  （真实格数的所有边界都落在空隙上，约数的候选边界更少、z 分数更低；与周期无关的格数被自相关排除）
+- 适用于等分网格的卡图/精灵图；没有可信周期时返回 1 格且置信度低于 LOW_CONFIDENCE，调用方不应采用
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError as exc:
+    raise SystemExit("缺少 NumPy 依赖，请先执行: python -m pip install numpy") from exc
+
+# 候选格数上限与最小格距（像素）
+DEFAULT_MAX_COUNT = 20
+DEFAULT_MIN_PITCH = 16
+# 接受候选的下限：z 分数与边界平均空隙度
+MIN_Z_SCORE = 1.0
+MIN_ALIGNMENT = 0.9
+# z 分数达到该值视为完全可信
+FULL_Z_SCORE = 3.0
+# 低于该置信度时调用方应提示人工确认
+LOW_CONFIDENCE = 0.35
+# 单格（没有可信周期）结果的置信度上限，始终低于 LOW_CONFIDENCE
+SINGLE_CELL_CONFIDENCE = 0.3
+# 自相关峰：峰值下限；不低于最高峰该比例的最短格距即主周期（避免选到倍数格距）
+MIN_PERIODICITY = 0.2
+HARMONIC_RATIO = 0.8
+# 候选格距（的整数倍）与主周期的允许偏差（相对值，至少 2 像素）
+PERIOD_TOLERANCE = 0.05
+# 空隙度的内容水平取剖面的该分位；等分边界允许偏离空隙的像素数；自相关前去趋势的滑动窗口半径
+CONTENT_QUANTILE = 0.9
+EDGE_RADIUS = 1
+DETREND_RADIUS = 8
+# 背景估计：极差不超过 最小值 + 该比例 ×（中位数 - 最小值）的行/列视为平坦
+FLAT_TOLERANCE = 0.1
+
+
+def background_level(
+    row_low: np.ndarray, row_high: np.ndarray, col_low: np.ndarray, col_high: np.ndarray
+) -> float:
+    """背景色估计：极差（max - min）最小的那些行/列的中值。
+
+    格间空隙、分隔线所在的行/列整条都是背景，极差接近 0；卡面行/列穿过内容，极差大。
+    没有空隙的图（卡牌无缝拼接）也能得到一个值，只是此时没有可信周期，推断会返回低置信度。
+    """
+    low = np.concatenate([row_low, col_low]).astype(np.float64)
+    high = np.concatenate([row_high, col_high]).astype(np.float64)
+    spread = high - low
+    floor = float(spread.min())
+    flattest = spread <= floor + FLAT_TOLERANCE * (float(np.median(spread)) - floor)
+    return float(np.median((low[flattest] + high[flattest]) / 2))
+
+
+def axis_profiles(plane: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(行剖面, 列剖面)：每行/每列像素与背景色的最大偏差。用 max/min 归约，不复制整张平面。"""
+    row_low, row_high = plane.min(axis=1), plane.max(axis=1)
+    col_low, col_high = plane.min(axis=0), plane.max(axis=0)
+    background = background_level(row_low, row_high, col_low, col_high)
+
+    def deviation(low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        return np.maximum(high.astype(np.float64) - background, background - low.astype(np.float64))
+
+    return deviation(row_low, row_high), deviation(col_low, col_high)
+
+
+def gap_evidence(profile: np.ndarray) -> np.ndarray:
+    """空隙度：1 - 剖面 / 内容水平（剖面的 CONTENT_QUANTILE 分位，为 0 时取最大值），截断到 [0, 1]。
+
+    与背景一致的行/列为 1，穿过内容的行/列接近 0；没有空隙的轴上不会凭排名凑出“最像空隙”的位置。
+    """
+    values = np.asarray(profile, dtype=np.float64)
+    if values.size == 0:
+        return values
+    level = float(np.quantile(values, CONTENT_QUANTILE)) or float(values.max())
+    if level <= 0:
+        return np.zeros(values.size)
+    return np.clip(1.0 - values / level, 0.0, 1.0)
+
+
+def near_max(values: np.ndarray, radius: int) -> np.ndarray:
+    """每个位置 ±radius 范围内的最大值（等分边界取整后可能差一两个像素落不进窄空隙）。"""
+    result = values.copy()
+    for shift in range(1, radius + 1):
+        np.maximum(result[shift:], values[:-shift], out=result[shift:])
+        np.maximum(result[:-shift], values[shift:], out=result[:-shift])
+    return result
+
+
+def autocorrelation(profile: np.ndarray, detrend: int = DETREND_RADIUS) -> np.ndarray:
+    """归一化自相关（FFT 计算，ac[0] = 1）；常数剖面返回全 0。
+
+    先减去 ±detrend 的滑动均值，只保留空隙这类窄峰（整行卡面的明暗差异不参与）；
+    不按重叠长度校正，长格距的峰随重叠变少而衰减，倍数格距不会因样本少、噪声大而压过基本格距。
+    """
+    values = np.asarray(profile, dtype=np.float64)
+    n = values.size
+    if detrend > 0 and n > 0:
+        window = 2 * detrend + 1
+        padded = np.concatenate([[0.0], np.cumsum(np.pad(values, detrend, mode="edge"))])
+        values = values - (padded[window:] - padded[:-window]) / window
+    values = values - values.mean() if n else values
+    if n < 2 or not values.any():
+        return np.zeros(n)
+    size = 1 << (2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(values, size)
+    ac = np.fft.irfft(spectrum * np.conj(spectrum), size)[:n]
+    return ac / ac[0]
+
+
+def dominant_period(ac: np.ndarray, min_pitch: int, max_pitch: float) -> Optional[int]:
+    """自相关主周期：[min_pitch, max_pitch] 内的局部峰中，不低于最高峰 HARMONIC_RATIO 的最短格距；无可信峰返回 None。"""
+    lo = max(1, int(min_pitch))
+    hi = min(ac.size - 2, int(max_pitch) + 1)
+    if hi < lo:
+        return None
+    lags = np.arange(lo, hi + 1)
+    peaks = lags[(ac[lags] >= ac[lags - 1]) & (ac[lags] >= ac[lags + 1]) & (ac[lags] >= MIN_PERIODICITY)]
+    if peaks.size == 0:
+        return None
+    strongest = float(ac[peaks].max())
+    return int(peaks[ac[peaks] >= HARMONIC_RATIO * strongest][0])
+
+
+def matches_period(pitch: float, period: Optional[int]) -> bool:
+    """格距与自相关主周期相符：主周期是格距的整数倍（格数少、空隙宽窄不一时自相关的峰可能落在 2 倍格距上）。"""
+    if period is None:
+        return False
+    multiple = max(1, round(period / pitch))
+    return abs(period - multiple * pitch) <= max(2.0, PERIOD_TOLERANCE * period)
+
+
+def infer_axis(
+    profile: np.ndarray,
+    max_count: int = DEFAULT_MAX_COUNT,
+    min_pitch: int = DEFAULT_MIN_PITCH,
+) -> dict:
+    """推断单个轴的格数。返回 {count, pitch, alignment, zScore, periodicity, confidence}。"""
+    length = int(np.asarray(profile).size)
+    evidence = gap_evidence(profile)
+    nearby = near_max(evidence, EDGE_RADIUS)
+    ac = autocorrelation(evidence)
+    mean = float(evidence.mean())
+    spread = float(evidence.std()) + 1e-9
+    period = dominant_period(ac, min_pitch, length / 2)
+
+    candidates: list[dict] = []
+    strongest_z = 0.0
+    for count in range(2, max_count + 1):
+        pitch = length / count
+        if pitch < min_pitch:
+            break
+        edges = np.round(np.arange(1, count) * pitch).astype(np.intp)
+        alignment = float(nearby[edges].mean())
+        z_score = (alignment - mean) / (spread / np.sqrt(count - 1))
+        strongest_z = max(strongest_z, z_score)
+        if z_score < MIN_Z_SCORE or alignment < MIN_ALIGNMENT:
+            continue
+        candidates.append({
+            "count": count,
+            "pitch": round(pitch, 2),
+            "alignment": round(alignment, 4),
+            "zScore": round(z_score, 3),
+            "periodicity": round(float(ac[int(round(pitch))]), 4),
+            "matchesPeriod": matches_period(pitch, period),
+        })
+
+    # 自相关找到主周期时只在格距与之相符的候选里选（z 分数再在 p、p/2… 之间取边界最多且都对齐的）；否则退回 z 分数
+    matched = [item for item in candidates if item["matchesPeriod"]]
+    best = max(matched or candidates, key=lambda item: item["zScore"], default=None)
+
+    if best is None:
+        # 单格：最优候选越弱越可信，但始终低于 LOW_CONFIDENCE，调用方不会拿它覆盖扫描结果
+        confidence = SINGLE_CELL_CONFIDENCE * (1.0 - min(1.0, strongest_z / FULL_Z_SCORE))
+        return {
+            "count": 1,
+            "pitch": float(length),
+            "alignment": 1.0,
+            "zScore": round(strongest_z, 3),
+            "periodicity": 0.0,
+            "confidence": round(confidence, 4),
+        }
+
+    # 置信度：边界对齐程度 × z 分数；格距与自相关主周期一致时加分，自相关没有给出同样的周期时打折
+    on_period = best.pop("matchesPeriod")
+    confidence = best["alignment"] * min(1.0, best["zScore"] / FULL_Z_SCORE)
+    confidence *= (1.0 + 0.25 * max(0.0, best["periodicity"])) if on_period else 0.75
+    return {**best, "confidence": round(min(1.0, confidence), 4)}
+
+
+def infer_grid(
+    plane: np.ndarray,
+    max_rows: int = DEFAULT_MAX_COUNT,
+    max_cols: int = DEFAULT_MAX_COUNT,
+    min_pitch: int = DEFAULT_MIN_PITCH,
+    row_profile: Optional[np.ndarray] = None,
+    col_profile: Optional[np.ndarray] = None,
+) -> dict:
+    """推断 rows×cols。plane 为 (h, w) 的灰度/alpha/内容掩码平面；也可直接传入现成的行/列剖面。"""
+    if row_profile is None or col_profile is None:
+        rows_default, cols_default = axis_profiles(plane)
+        row_profile = rows_default if row_profile is None else row_profile
+        col_profile = cols_default if col_profile is None else col_profile
+    rows = infer_axis(row_profile, max_rows, min_pitch)
+    cols = infer_axis(col_profile, max_cols, min_pitch)
+    width = int(np.asarray(col_profile).size)
+    height = int(np.asarray(row_profile).size)
+    return {
+        "rows": rows["count"],
+        "cols": cols["count"],
+        "cellW": width // cols["count"],
+        "cellH": height // rows["count"],
+        "pitchX": cols["pitch"],
+        "pitchY": rows["pitch"],
+        "confidence": round(min(rows["confidence"], cols["confidence"]), 4),
+        "rowConfidence": rows["confidence"],
+        "colConfidence": cols["confidence"],
+    }
+
+
+def describe(result: dict) -> str:
+    text = (
+        f"推断网格: {result['rows']}x{result['cols']}（单格 {result['cellW']}x{result['cellH']}px，"
+        f"置信度 {result['confidence']:.2f}）"
+    )
+    if result["confidence"] < LOW_CONFIDENCE:
+        text += "，置信度偏低，请人工确认行列数"
+    return text
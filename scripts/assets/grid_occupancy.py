@@ -0,0 +1,119 @@
+"""
+网格占用检测引擎
+- 给定灰度平面与行/列区间，一次数组归约得到每格（内缩后）的平均亮度
+- 先沿行方向按区间求和（np.add.reduceat），再沿列方向求和；整张图只遍历一次，不为单格构造像素列表
+- 平均亮度低于阈值的格子视为空格，输出 0/1 占用位图，供图集配置跳过空白格
+"""
+
+from __future__ import annotations
+
+from typing import List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as exc:
+    raise SystemExit("缺少 NumPy 依赖，请先执行: python -m pip install numpy") from exc
+
+Bounds = List[Tuple[int, int]]
+
+# 与旧版 analyze_grid 一致：四周各忽略 50px，平均亮度 < 10 视为空格
+DEFAULT_INSET = 50
+DEFAULT_THRESHOLD = 10.0
+
+
+def uniform_bounds(length: int, count: int) -> Bounds:
+    """等分网格的 [start, end) 区间，与旧版 cell = length // count 的取法一致。"""
+    cell = length // count
+    return [(index * cell, (index + 1) * cell) for index in range(count)]
+
+
+def starts_to_bounds(starts: Sequence[int], sizes: Sequence[int]) -> Bounds:
+    """图集配置的 rowStarts/rowHeights（或 colStarts/colWidths）转为区间。"""
+    return [(int(start), int(start) + int(size)) for start, size in zip(starts, sizes)]
+
+
+def inset_bounds(bounds: Bounds, inset: int) -> Bounds:
+    """每个区间两端各内缩 inset 像素；区间太窄时收缩到至少保留中间 1 像素。"""
+    result: Bounds = []
+    for start, end in bounds:
+        size = end - start
+        pad = max(0, min(inset, (size - 1) // 2))
+        result.append((start + pad, end - pad))
+    return result
+
+
+def clip_bounds(bounds: Bounds, length: int) -> Tuple[np.ndarray, np.ndarray]:
+    starts = np.clip([start for start, _ in bounds], 0, length)
+    ends = np.clip([end for _, end in bounds], 0, length)
+    return starts, np.maximum(ends, starts)
+
+
+def interval_sums(values: np.ndarray, bounds: Bounds, axis: int) -> np.ndarray:
+    """沿 axis 对每个 [start, end) 区间求和（int64），越界部分截掉，空区间为 0。"""
+    if not bounds:
+        # 没有区间（如空白图扫不出行/列）：该轴长度为 0
+        shape = list(values.shape)
+        shape[axis] = 0
+        return np.zeros(shape, dtype=np.int64)
+    length = values.shape[axis]
+    starts, ends = clip_bounds(bounds, length)
+    valid = ends > starts
+
+    # reduceat 的索引必须 < length：交替写入 start/end，取偶数位结果即为各区间之和
+    indices = np.empty(len(bounds) * 2, dtype=np.intp)
+    indices[0::2] = np.minimum(starts, length - 1)
+    indices[1::2] = np.minimum(ends, length - 1)
+    # 最后一个区间延伸到末尾时去掉它的 end 索引：reduceat 的最后一段本就求和到数组末尾
+    last_to_end = bool(valid[-1] and ends[-1] == length)
+    if last_to_end:
+        indices = indices[:-1]
+    sums = np.add.reduceat(values, indices, axis=axis, dtype=np.int64)
+    sums = np.take(sums, np.arange(0, len(indices), 2), axis=axis)
+
+    # 其它 end == length 的区间（乱序/重叠的区间才会出现）单独补算
+    tail = (ends == length) & valid
+    if last_to_end:
+        tail[-1] = False
+    if tail.any():
+        for index in np.flatnonzero(tail):
+            segment = np.take(values, np.arange(starts[index], length), axis=axis)
+            replacement = segment.sum(axis=axis, dtype=np.int64)
+            if axis == 0:
+                sums[index] = replacement
+            else:
+                sums[:, index] = replacement
+
+    shape = [1] * values.ndim
+    shape[axis] = len(bounds)
+    return np.where(valid.reshape(shape), sums, 0)
+
+
+def cell_means(plane: np.ndarray, row_bounds: Bounds, col_bounds: Bounds) -> np.ndarray:
+    """(rows, cols) 的每格平均亮度（区间超出图像的部分截掉）；宽或高为 0 的格子为 0。"""
+    row_sums = interval_sums(plane, row_bounds, axis=0)  # (rows, w)
+    sums = interval_sums(row_sums, col_bounds, axis=1)  # (rows, cols)
+    row_starts, row_ends = clip_bounds(row_bounds, plane.shape[0])
+    col_starts, col_ends = clip_bounds(col_bounds, plane.shape[1])
+    areas = np.outer(row_ends - row_starts, col_ends - col_starts)
+    return np.divide(sums, areas, out=np.zeros(areas.shape), where=areas > 0)
+
+
+def grid_occupancy(
+    plane: np.ndarray,
+    row_bounds: Bounds,
+    col_bounds: Bounds,
+    inset: int = DEFAULT_INSET,
+    threshold: float = DEFAULT_THRESHOLD,
+) -> dict:
+    """返回占用结果：means（平均亮度）、occupied（0/1 位图，行优先）、emptyCells（空格的行优先下标）。"""
+    means = cell_means(plane, inset_bounds(row_bounds, inset), inset_bounds(col_bounds, inset))
+    occupied = means >= threshold
+    return {
+        "rows": len(row_bounds),
+        "cols": len(col_bounds),
+        "inset": inset,
+        "threshold": threshold,
+        "means": np.round(means, 2).tolist(),
+        "occupied": occupied.astype(int).tolist(),
+        "emptyCells": [int(index) for index in np.flatnonzero(~occupied)],
+    }
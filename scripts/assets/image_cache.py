@@ -0,0 +1,145 @@
+"""
+资源脚本共用的图片解码缓存
+- 解码并转换模式（L / RGB / RGBA）后的像素平面以 .npy 落盘，键为文件内容哈希 + 模式
+- 再次读取同一张图时以内存映射方式打开 .npy，跳过 PNG/WebP 解码与模式转换
+- 缓存目录默认仓库根目录下的 temp/decode-cache（与运行时的当前目录无关；ASSET_DECODE_CACHE_DIR 可改，ASSET_DECODE_CACHE=0 关闭）
+- load_region 只取矩形区域：缓存命中时切片内存映射；未命中时只对该区域做模式转换（JPEG 用 draft 直接解码亮度通道），不写缓存
+- 未安装 NumPy 时 load_image 直接解码返回，不使用缓存
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError as exc:
+    raise SystemExit("缺少 Pillow 依赖，请先执行: python -m pip install Pillow") from exc
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 可选：缺失时 load_image 退化为直接解码
+    np = None
+
+# 资源脚本共用的缓存根目录：固定为仓库根目录下的 temp/（已被 .gitignore 忽略），不随当前目录变化
+CACHE_ROOT = Path(__file__).resolve().parents[2] / "temp"
+DEFAULT_CACHE_DIR = Path(os.getenv("ASSET_DECODE_CACHE_DIR", str(CACHE_ROOT / "decode-cache")))
+CACHE_ENABLED = os.getenv("ASSET_DECODE_CACHE", "1") != "0"
+SUPPORTED_MODES = ("L", "RGB", "RGBA")
+# 缓存文件格式变化时递增
+CACHE_VERSION = 1
+
+# 同一进程内按 (路径, 大小, mtime) 记住哈希，避免重复读文件
+_hash_memo: dict[tuple[str, int, int], str] = {}
+
+
+def file_sha256(path: str | Path) -> str:
+    resolved = Path(path).resolve()
+    stat = resolved.stat()
+    key = (str(resolved), stat.st_size, stat.st_mtime_ns)
+    cached = _hash_memo.get(key)
+    if cached is not None:
+        return cached
+    digest = hashlib.sha256()
+    with open(resolved, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    _hash_memo[key] = digest.hexdigest()
+    return _hash_memo[key]
+
+
+def cache_file(path: str | Path, mode: str, cache_dir: Path | None = None) -> Path:
+    cache_dir = Path(cache_dir) if cache_dir is not None else DEFAULT_CACHE_DIR
+    return cache_dir / f"{file_sha256(path)}-{mode}-v{CACHE_VERSION}.npy"
+
+
+def decode_plane(path: str | Path, mode: str):
+    with Image.open(path) as img:
+        if mode == "L" and img.format == "JPEG":
+            img.draft("L", img.size)
+        converted = img if img.mode == mode else img.convert(mode)
+        return np.asarray(converted, dtype=np.uint8)
+
+
+def load_plane(path: str | Path, mode: str = "L", use_cache: bool = True, cache_dir: Path | None = None):
+    """返回 (h, w) 或 (h, w, c) 的 uint8 数组；命中缓存时为只读内存映射。
+
+    cache_dir 为空时使用 DEFAULT_CACHE_DIR；use_cache=False 或 ASSET_DECODE_CACHE=0 时不读写缓存。
+    """
+    if np is None:
+        raise SystemExit("缺少 NumPy 依赖，请先执行: python -m pip install numpy")
+    if mode not in SUPPORTED_MODES:
+        raise ValueError(f"Unsupported mode: {mode}")
+    if not (use_cache and CACHE_ENABLED):
+        return decode_plane(path, mode)
+
+    cache_path = cache_file(path, mode, cache_dir)
+    if cache_path.exists():
+        try:
+            return np.load(cache_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"[warn] 解码缓存损坏，重新解码: {cache_path} ({e})")
+
+    plane = decode_plane(path, mode)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再替换，避免并行进程读到半截文件
+        tmp_path = cache_path.with_name(f"{cache_path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, plane)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"[warn] 写入解码缓存失败: {e}")
+    return plane
+
+
+def decode_region(path: str | Path, box: tuple[int, int, int, int], mode: str):
+    """只转换 box=(x0, y0, x1, y1) 区域。JPEG 用 draft 让解码器直接输出亮度通道，省去整图 RGB 解码与转换。"""
+    with Image.open(path) as img:
+        if mode == "L" and img.format == "JPEG":
+            img.draft("L", img.size)
+        region = img.crop(box)
+        converted = region if region.mode == mode else region.convert(mode)
+        return np.asarray(converted, dtype=np.uint8)
+
+
+def load_region(
+    path: str | Path,
+    box: tuple[int, int, int, int],
+    size: tuple[int, int],
+    mode: str = "L",
+    use_cache: bool = True,
+    cache_dir: Path | None = None,
+):
+    """返回 box=(x0, y0, x1, y1) 区域的 (h, w[, c]) 数组；size 为整图 (w, h)。
+
+    box 覆盖整张图时等价于 load_plane（会写缓存）；否则已有整图缓存时切片内存映射，
+    没有缓存时只解码/转换该区域，不为一次局部扫描落盘整图。
+    """
+    if np is None:
+        raise SystemExit("缺少 NumPy 依赖，请先执行: python -m pip install numpy")
+    if mode not in SUPPORTED_MODES:
+        raise ValueError(f"Unsupported mode: {mode}")
+    x0, y0, x1, y1 = box
+    if (x0, y0, x1, y1) == (0, 0, size[0], size[1]):
+        return load_plane(path, mode, use_cache, cache_dir)
+    if use_cache and CACHE_ENABLED:
+        cache_path = cache_file(path, mode, cache_dir)
+        if cache_path.exists():
+            try:
+                return np.load(cache_path, mmap_mode="r")[y0:y1, x0:x1]
+            except (OSError, ValueError) as e:
+                print(f"[warn] 解码缓存损坏，改为区域解码: {cache_path} ({e})")
+    return decode_region(path, box, mode)
+
+
+def load_image(
+    path: str | Path, mode: str = "L", use_cache: bool = True, cache_dir: Path | None = None
+) -> Image.Image:
+    """与 Image.open(path).convert(mode) 等价的 PIL 图像，解码结果走 load_plane 缓存。"""
+    if np is None:
+        with Image.open(path) as img:
+            return img.convert(mode)
+    # fromarray 按数组形状推断模式：2 维为 L，3 维按通道数为 RGB / RGBA
+    return Image.fromarray(np.ascontiguousarray(load_plane(path, mode, use_cache, cache_dir)))
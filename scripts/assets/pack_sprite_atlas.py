@@ -1,7 +1,11 @@
 import argparse
+import fnmatch
+import hashlib
 import json
+import math
 import os
 from pathlib import Path
+from typing import Callable, Optional
 
 try:
     from PIL import Image
@@ -11,16 +15,57 @@ except ImportError as exc:
 VALID_EXTS = {".png", ".jpg", ".jpeg"}
 DEFAULT_MAX_WIDTH = int(os.getenv("ATLAS_MAX_WIDTH", "2048"))
 DEFAULT_PADDING = int(os.getenv("ATLAS_PADDING", "2"))
+PACKERS = ("maxrects", "skyline", "guillotine", "shelf")
+DEFAULT_PACKER = os.getenv("ATLAS_PACKER", "maxrects")
+# 单页纹理边长上限（0 表示不限制）；移动端 GPU 通常要求不超过 2048/4096
+DEFAULT_MAX_SIZE = int(os.getenv("ATLAS_MAX_SIZE", "0"))
+# 非 2 的幂模式下，除 max-width 外额外尝试的宽度（以 sqrt(总面积) 为基准的倍数）
+WIDTH_CANDIDATE_FACTORS = (1.0, 1.1, 1.25, 1.5, 2.0)
+
+# (x, y, rotated)：打包器返回的放置结果，坐标已包含 padding 空间
+Placement = tuple[int, int, bool]
+PackFn = Callable[[list[tuple[int, int]], int, int, bool], Optional[list[Placement]]]
 
 
 def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="图集打包脚本（按行排列）")
+    parser = argparse.ArgumentParser(description="图集打包脚本（MaxRects/Skyline/Guillotine/按行排列）")
     parser.add_argument("input_dir", help="输入图标目录，例如 public/assets/.../status-icons")
     parser.add_argument("--max-width", type=int, default=DEFAULT_MAX_WIDTH, help="图集最大宽度")
     parser.add_argument("--padding", type=int, default=DEFAULT_PADDING, help="图块间距")
     parser.add_argument("--name", type=str, default=None, help="输出文件名（不含扩展名）")
     parser.add_argument("--align-max", action="store_true", help="将图标对齐到最大宽高（透明填充）")
     parser.add_argument("--no-json", action="store_true", help="不输出 JSON 帧数据")
+    parser.add_argument(
+        "--packer",
+        choices=PACKERS,
+        default=DEFAULT_PACKER,
+        help="打包算法：maxrects（最短边优先，默认）/ skyline / guillotine / shelf（旧版按行排列）",
+    )
+    parser.add_argument("--pot", action="store_true", help="图集宽高取 2 的幂")
+    parser.add_argument(
+        "--trim",
+        action="store_true",
+        help="裁掉完全透明的边距，偏移写入 spriteSourceSize/sourceSize（需前端按偏移还原）",
+    )
+    parser.add_argument("--no-dedup", action="store_true", help="不合并像素完全相同的帧")
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        default=DEFAULT_MAX_SIZE,
+        help="单页图集宽高上限，超出时拆分为多页（0 表示不限制）",
+    )
+    parser.add_argument(
+        "--group",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="分组提示（帧 id 通配符，可重复），同组帧尽量放在同一页，例如 --group 'monk-*'",
+    )
+    parser.add_argument(
+        "--allow-rotation",
+        action="store_true",
+        help="允许将图块顺时针旋转 90° 以提高利用率（需前端支持 rotated 帧）",
+    )
     return parser.parse_args()
 
 
@@ -42,21 +87,222 @@ def collect_images(input_dir: Path) -> list[dict]:
             "image": converted,
             "w": converted.width,
             "h": converted.height,
+            "source_w": converted.width,
+            "source_h": converted.height,
+            "trim_x": 0,
+            "trim_y": 0,
         })
 
     entries.sort(key=lambda item: (item["h"], item["w"]), reverse=True)
     return entries
 
 
-def pack_images(entries: list[dict], max_width: int, padding: int) -> tuple[dict, int, int]:
-    if not entries:
-        raise SystemExit("没有可打包的图像")
+def trim_images(entries: list[dict]) -> int:
+    """按 alpha 通道裁掉透明边距，返回节省的像素数。完全透明的图保留 1x1。"""
+    saved = 0
+    for item in entries:
+        bbox = item["image"].getchannel("A").getbbox() or (0, 0, 1, 1)
+        if bbox == (0, 0, item["w"], item["h"]):
+            continue
+        item["image"] = item["image"].crop(bbox)
+        saved += item["w"] * item["h"] - item["image"].width * item["image"].height
+        item["trim_x"], item["trim_y"] = bbox[0], bbox[1]
+        item["w"], item["h"] = item["image"].width, item["image"].height
+    entries.sort(key=lambda item: (item["h"], item["w"]), reverse=True)
+    return saved
 
-    widest = max(item["cell_w"] for item in entries)
-    if widest > max_width:
-        max_width = widest
-        print(f"提示：最大单图宽度为 {widest}px，已自动提升 max-width。")
 
+def dedupe_entries(entries: list[dict]) -> tuple[list[dict], dict[str, str]]:
+    """像素完全相同的帧只保留第一个参与打包，返回 (唯一帧, 重复帧 id -> 保留帧 id)。"""
+    unique: list[dict] = []
+    aliases: dict[str, str] = {}
+    seen: dict[str, str] = {}
+    for item in entries:
+        image = item["image"]
+        digest = hashlib.sha1(f"{image.width}x{image.height}:".encode() + image.tobytes()).hexdigest()
+        if digest in seen:
+            aliases[item["id"]] = seen[digest]
+            continue
+        seen[digest] = item["id"]
+        unique.append(item)
+    return unique, aliases
+
+
+def next_pot(value: int) -> int:
+    return 1 << max(0, value - 1).bit_length()
+
+
+def floor_pot(value: int) -> int:
+    return 1 << (max(1, value).bit_length() - 1)
+
+
+def orientations(w: int, h: int, allow_rotation: bool):
+    yield w, h, False
+    if allow_rotation and w != h:
+        yield h, w, True
+
+
+def split_free_rects(free: list[tuple], x: int, y: int, w: int, h: int) -> list[tuple]:
+    """MaxRects：把与新放置矩形相交的空闲矩形拆成最多 4 块，再剔除被包含的空闲矩形。"""
+    result: list[tuple] = []
+    for fx, fy, fw, fh in free:
+        if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+            result.append((fx, fy, fw, fh))
+            continue
+        if x > fx:
+            result.append((fx, fy, x - fx, fh))
+        if x + w < fx + fw:
+            result.append((x + w, fy, fx + fw - x - w, fh))
+        if y > fy:
+            result.append((fx, fy, fw, y - fy))
+        if y + h < fy + fh:
+            result.append((fx, y + h, fw, fy + fh - y - h))
+
+    pruned: list[tuple] = []
+    for i, (ax, ay, aw, ah) in enumerate(result):
+        contained = False
+        for j, (bx, by, bw, bh) in enumerate(result):
+            if i == j:
+                continue
+            if bx <= ax and by <= ay and ax + aw <= bx + bw and ay + ah <= by + bh:
+                # 完全相同的矩形只保留第一个
+                if (ax, ay, aw, ah) != (bx, by, bw, bh) or j < i:
+                    contained = True
+                    break
+        if not contained:
+            pruned.append((ax, ay, aw, ah))
+    return pruned
+
+
+def pack_maxrects(
+    sizes: list[tuple[int, int]], bin_w: int, bin_h: int, allow_rotation: bool
+) -> Optional[list[Placement]]:
+    """MaxRects Best-Short-Side-Fit：选择放入后短边剩余最小的空闲矩形。"""
+    free = [(0, 0, bin_w, bin_h)]
+    placements: list[Placement] = []
+    for w, h in sizes:
+        best = None
+        for fx, fy, fw, fh in free:
+            for rw, rh, rotated in orientations(w, h, allow_rotation):
+                if rw > fw or rh > fh:
+                    continue
+                leftover_w = fw - rw
+                leftover_h = fh - rh
+                score = (min(leftover_w, leftover_h), max(leftover_w, leftover_h), fy, fx)
+                if best is None or score < best[0]:
+                    best = (score, fx, fy, rw, rh, rotated)
+        if best is None:
+            return None
+        _, x, y, rw, rh, rotated = best
+        placements.append((x, y, rotated))
+        free = split_free_rects(free, x, y, rw, rh)
+    return placements
+
+
+def skyline_fit(skyline: list[list[int]], index: int, w: int, bin_w: int) -> Optional[int]:
+    """返回宽度 w 的矩形从第 index 段天际线起放置时的落脚高度。"""
+    x = skyline[index][0]
+    if x + w > bin_w:
+        return None
+    y = 0
+    remaining = w
+    j = index
+    while remaining > 0:
+        y = max(y, skyline[j][1])
+        remaining -= skyline[j][2]
+        j += 1
+    return y
+
+
+def pack_skyline(
+    sizes: list[tuple[int, int]], bin_w: int, bin_h: int, allow_rotation: bool
+) -> Optional[list[Placement]]:
+    """Skyline Bottom-Left：维护每段 [x, y, width] 的天际线，优先选择顶边最低的位置。"""
+    skyline = [[0, 0, bin_w]]
+    placements: list[Placement] = []
+    for w, h in sizes:
+        best = None
+        for index in range(len(skyline)):
+            for rw, rh, rotated in orientations(w, h, allow_rotation):
+                y = skyline_fit(skyline, index, rw, bin_w)
+                if y is None or y + rh > bin_h:
+                    continue
+                score = (y + rh, skyline[index][0])
+                if best is None or score < best[0]:
+                    best = (score, index, y, rw, rh, rotated)
+        if best is None:
+            return None
+        _, index, y, rw, rh, rotated = best
+        x = skyline[index][0]
+        placements.append((x, y, rotated))
+
+        skyline.insert(index, [x, y + rh, rw])
+        j = index + 1
+        while j < len(skyline):
+            prev_end = skyline[j - 1][0] + skyline[j - 1][2]
+            node = skyline[j]
+            if node[0] >= prev_end:
+                break
+            shrink = prev_end - node[0]
+            if node[2] <= shrink:
+                del skyline[j]
+                continue
+            node[0] += shrink
+            node[2] -= shrink
+            break
+        j = 0
+        while j < len(skyline) - 1:
+            if skyline[j][1] == skyline[j + 1][1]:
+                skyline[j][2] += skyline[j + 1][2]
+                del skyline[j + 1]
+            else:
+                j += 1
+    return placements
+
+
+def pack_guillotine(
+    sizes: list[tuple[int, int]], bin_w: int, bin_h: int, allow_rotation: bool
+) -> Optional[list[Placement]]:
+    """Guillotine：面积最贴合的空闲矩形，按较短剩余边方向切分。"""
+    free = [(0, 0, bin_w, bin_h)]
+    placements: list[Placement] = []
+    for w, h in sizes:
+        best = None
+        for index, (fx, fy, fw, fh) in enumerate(free):
+            for rw, rh, rotated in orientations(w, h, allow_rotation):
+                if rw > fw or rh > fh:
+                    continue
+                score = (fw * fh - rw * rh, min(fw - rw, fh - rh), fy, fx)
+                if best is None or score < best[0]:
+                    best = (score, index, rw, rh, rotated)
+        if best is None:
+            return None
+        _, index, rw, rh, rotated = best
+        fx, fy, fw, fh = free.pop(index)
+        placements.append((fx, fy, rotated))
+
+        leftover_w = fw - rw
+        leftover_h = fh - rh
+        if leftover_w <= leftover_h:
+            right = (fx + rw, fy, leftover_w, rh)
+            bottom = (fx, fy + rh, fw, leftover_h)
+        else:
+            right = (fx + rw, fy, leftover_w, fh)
+            bottom = (fx, fy + rh, rw, leftover_h)
+        for rect in (right, bottom):
+            if rect[2] > 0 and rect[3] > 0:
+                free.append(rect)
+    return placements
+
+
+PACK_FUNCTIONS: dict[str, PackFn] = {
+    "maxrects": pack_maxrects,
+    "skyline": pack_skyline,
+    "guillotine": pack_guillotine,
+}
+
+
+def pack_shelf(entries: list[dict], max_width: int, padding: int) -> tuple[dict, int, int]:
     x = 0
     y = 0
     row_height = 0
@@ -71,7 +317,7 @@ def pack_images(entries: list[dict], max_width: int, padding: int) -> tuple[dict
             x = 0
             row_height = 0
 
-        positions[item["id"]] = {"x": x, "y": y, "w": w, "h": h}
+        positions[item["id"]] = {"x": x, "y": y, "w": w, "h": h, "rotated": False}
         x += w + padding
         row_height = max(row_height, h)
         atlas_width = max(atlas_width, x - padding)
@@ -80,10 +326,263 @@ def pack_images(entries: list[dict], max_width: int, padding: int) -> tuple[dict
     return positions, atlas_width, atlas_height
 
 
+def candidate_widths(min_width: int, max_width: int, total_area: int, pot: bool) -> list[int]:
+    if pot:
+        widths = []
+        width = next_pot(min_width)
+        while width <= max(max_width, next_pot(min_width)):
+            widths.append(width)
+            width *= 2
+        return widths
+    base = math.sqrt(total_area)
+    widths = {max_width}
+    for factor in WIDTH_CANDIDATE_FACTORS:
+        widths.add(min(max_width, max(min_width, int(math.ceil(base * factor)))))
+    return sorted(widths)
+
+
+def pack_fixed_width(
+    pack_fn: PackFn,
+    sizes: list[tuple[int, int]],
+    width: int,
+    padding: int,
+    min_height: int,
+    max_height: int,
+    pot: bool,
+    allow_rotation: bool,
+) -> Optional[tuple[list[Placement], int]]:
+    """固定宽度下寻找能放下全部图块的最小高度（2 的幂模式逐级翻倍，否则二分）。"""
+
+    def attempt(height: int) -> Optional[list[Placement]]:
+        # 尺寸已带 padding，画布同样多留一个 padding，保证最右/最下一块不被多余间距挤出
+        return pack_fn(sizes, width + padding, height + padding, allow_rotation)
+
+    if pot:
+        height = next_pot(min_height)
+        while height <= next_pot(max_height):
+            placements = attempt(height)
+            if placements is not None:
+                return placements, height
+            height *= 2
+        return None
+
+    best = attempt(max_height)
+    if best is None:
+        return None
+    best_height = max_height
+    low, high = min_height, max_height - 1
+    while low <= high:
+        mid = (low + high) // 2
+        placements = attempt(mid)
+        if placements is None:
+            low = mid + 1
+        else:
+            best, best_height = placements, mid
+            high = mid - 1
+    return best, best_height
+
+
+def pack_images(
+    entries: list[dict],
+    max_width: int,
+    padding: int,
+    packer: str = "shelf",
+    pot: bool = False,
+    allow_rotation: bool = False,
+    max_height: Optional[int] = None,
+) -> tuple[dict, int, int]:
+    """打包为一张图集；max_height 为高度硬上限（多页模式下的单页尺寸限制）。"""
+    if not entries:
+        raise SystemExit("没有可打包的图像")
+
+    if packer == "shelf":
+        allow_rotation = False
+    if allow_rotation:
+        widest = max(min(item["cell_w"], item["cell_h"]) for item in entries)
+    else:
+        widest = max(item["cell_w"] for item in entries)
+    if widest > max_width:
+        max_width = widest
+        print(f"提示：最大单图宽度为 {widest}px，已自动提升 max-width。")
+
+    if packer == "shelf":
+        positions, width, height = pack_shelf(entries, max_width, padding)
+        if pot:
+            width, height = next_pot(width), next_pot(height)
+        if max_height is not None and height > max_height:
+            raise SystemExit(f"打包失败：图集高度 {height} 超过上限 {max_height}")
+        return positions, width, height
+
+    pack_fn = PACK_FUNCTIONS[packer]
+    ordered = sorted(
+        entries,
+        key=lambda item: (max(item["cell_w"], item["cell_h"]), item["cell_w"] * item["cell_h"]),
+        reverse=True,
+    )
+    sizes = [(item["cell_w"] + padding, item["cell_h"] + padding) for item in ordered]
+    total_area = sum(w * h for w, h in sizes)
+    tallest = max(min(item["cell_w"], item["cell_h"]) if allow_rotation else item["cell_h"] for item in ordered)
+
+    best = None
+    for width in candidate_widths(widest, max_width, total_area, pot):
+        min_height = max(tallest, int(math.ceil(total_area / (width + padding))) - padding)
+        # 所有图块竖向堆叠一定放得下，作为高度上界；允许旋转时比画布宽的图块只能转成竖放，按转后的高度计
+        stacked = sum(w if allow_rotation and w > width + padding else h for w, h in sizes)
+        height_bound = max(min_height, stacked - padding)
+        if max_height is not None:
+            if min_height > max_height:
+                continue
+            height_bound = min(height_bound, max_height)
+        packed = pack_fixed_width(
+            pack_fn, sizes, width, padding, min_height, height_bound, pot, allow_rotation
+        )
+        if packed is None:
+            continue
+        placements, _ = packed
+        used_w = used_h = 0
+        for (x, y, rotated), (w, h) in zip(placements, sizes):
+            if rotated:
+                w, h = h, w
+            used_w = max(used_w, x + w - padding)
+            used_h = max(used_h, y + h - padding)
+        if pot:
+            used_w, used_h = next_pot(used_w), next_pot(used_h)
+        score = (used_w * used_h, max(used_w, used_h))
+        if best is None or score < best[0]:
+            best = (score, placements, used_w, used_h)
+
+    if best is None:
+        limit = f"{max_width}x{max_height}" if max_height is not None else f"max-width={max_width}"
+        raise SystemExit(f"打包失败：无法在 {limit} 内放下全部图块")
+
+    _, placements, width, height = best
+    positions: dict[str, dict] = {}
+    for item, (x, y, rotated) in zip(ordered, placements):
+        positions[item["id"]] = {
+            "x": x,
+            "y": y,
+            "w": item["cell_w"],
+            "h": item["cell_h"],
+            "rotated": rotated,
+        }
+    # 保持与输入一致的帧顺序，便于比对 JSON
+    positions = {item["id"]: positions[item["id"]] for item in entries}
+    return positions, width, height
+
+
+def fits_page(
+    entries: list[dict], page_w: int, page_h: int, padding: int, packer: str, allow_rotation: bool
+) -> bool:
+    """判断一组图块能否放进 page_w x page_h 的单页（只做一次固定画布打包，不求最小尺寸）。"""
+    area = sum((item["cell_w"] + padding) * (item["cell_h"] + padding) for item in entries)
+    if area > (page_w + padding) * (page_h + padding):
+        return False
+    if packer == "shelf":
+        if any(item["cell_w"] > page_w for item in entries):
+            return False
+        # 按行排列依赖顺序，与 collect_images 的排序保持一致
+        ordered = sorted(entries, key=lambda item: (item["h"], item["w"]), reverse=True)
+        _, _, height = pack_shelf(ordered, page_w, padding)
+        return height <= page_h
+    ordered = sorted(
+        entries,
+        key=lambda item: (max(item["cell_w"], item["cell_h"]), item["cell_w"] * item["cell_h"]),
+        reverse=True,
+    )
+    sizes = [(item["cell_w"] + padding, item["cell_h"] + padding) for item in ordered]
+    placements = PACK_FUNCTIONS[packer](sizes, page_w + padding, page_h + padding, allow_rotation)
+    return placements is not None
+
+
+def group_entries(entries: list[dict], patterns: list[str]) -> list[list[dict]]:
+    """按 --group 通配符分组：命中同一模式的帧为一组（按模式顺序取第一个命中），其余各自成组。"""
+    grouped: dict[str, list[dict]] = {pattern: [] for pattern in patterns}
+    groups: list[list[dict]] = []
+    for item in entries:
+        pattern = next((p for p in patterns if fnmatch.fnmatchcase(item["id"], p)), None)
+        if pattern is None:
+            groups.append([item])
+        else:
+            grouped[pattern].append(item)
+    groups.extend(group for group in grouped.values() if group)
+    return groups
+
+
+def assign_pages(
+    entries: list[dict],
+    groups: list[list[dict]],
+    page_w: int,
+    page_h: int,
+    padding: int,
+    packer: str,
+    allow_rotation: bool,
+) -> list[list[dict]]:
+    """按组做首次适应：组按面积从大到小依次尝试放入当前页，放不下的留给下一页。
+
+    单个组超过一页时拆成单帧继续分配，并给出提示。
+    """
+    def group_area(group: list[dict]) -> int:
+        return sum(item["cell_w"] * item["cell_h"] for item in group)
+
+    order = {item["id"]: index for index, item in enumerate(entries)}
+    pending = sorted(groups, key=group_area, reverse=True)
+    pages: list[list[dict]] = []
+    while pending:
+        first = pending[0]
+        if not fits_page(first, page_w, page_h, padding, packer, allow_rotation):
+            if len(first) == 1:
+                item = first[0]
+                raise SystemExit(
+                    f"图块 {item['id']}（{item['cell_w']}x{item['cell_h']}）超过单页上限 {page_w}x{page_h}"
+                )
+            print(f"提示：分组（{len(first)} 帧，首帧 {first[0]['id']}）超过单页上限，已拆分到多页。")
+            pending = sorted(pending[1:] + [[item] for item in first], key=group_area, reverse=True)
+            continue
+
+        page = list(first)
+        rest: list[list[dict]] = []
+        for group in pending[1:]:
+            if fits_page(page + group, page_w, page_h, padding, packer, allow_rotation):
+                page.extend(group)
+            else:
+                rest.append(group)
+        page.sort(key=lambda item: order[item["id"]])
+        pages.append(page)
+        pending = rest
+    return pages
+
+
+def packing_efficiency(entries: list[dict], width: int, height: int) -> float:
+    used = sum(item["cell_w"] * item["cell_h"] for item in entries)
+    return used / (width * height) if width and height else 0.0
+
+
+def frame_record(item: dict, frame: dict) -> dict:
+    """TexturePacker 风格的帧数据：frame 为图集区域，spriteSourceSize/sourceSize 记录裁切偏移，page 为所在页。"""
+    return {
+        "page": frame["page"],
+        "frame": {key: frame[key] for key in ("x", "y", "w", "h")},
+        "rotated": frame["rotated"],
+        "trimmed": (frame["w"], frame["h"]) != (item["source_w"], item["source_h"]),
+        "spriteSourceSize": {"x": item["trim_x"], "y": item["trim_y"], "w": frame["w"], "h": frame["h"]},
+        "sourceSize": {"w": item["source_w"], "h": item["source_h"]},
+    }
+
+
 def build_atlas(entries: list[dict], positions: dict[str, dict], width: int, height: int) -> Image.Image:
     atlas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
     for item in entries:
         frame = positions[item["id"]]
+        if frame["rotated"]:
+            # 顺时针旋转 90°：单元格内 (ox, oy) 处的原图落到旋转后单元格的 (cell_h - oy - h, ox)
+            atlas.paste(
+                item["image"].transpose(Image.Transpose.ROTATE_270),
+                (
+                    frame["x"] + item["cell_h"] - item["offset_y"] - item["h"],
+                    frame["y"] + item["offset_x"],
+                ),
+            )
+            continue
         atlas.paste(
             item["image"],
             (frame["x"] + item["offset_x"], frame["y"] + item["offset_y"])
@@ -97,44 +596,120 @@ def main() -> None:
     if not input_dir.exists() or not input_dir.is_dir():
         raise SystemExit(f"目录不存在: {input_dir}")
 
-    entries = collect_images(input_dir)
+    if args.trim and args.align_max:
+        raise SystemExit("--trim 与 --align-max 不能同时使用")
+
+    all_entries = collect_images(input_dir)
+    if args.trim:
+        saved = trim_images(all_entries)
+        print(f"已裁切透明边距，节省 {saved} 像素")
+    if args.no_dedup:
+        entries, aliases = all_entries, {}
+    else:
+        entries, aliases = dedupe_entries(all_entries)
+        for alias, canonical in aliases.items():
+            print(f"重复帧: {alias} -> {canonical}")
+
     max_w = max(item["w"] for item in entries)
     max_h = max(item["h"] for item in entries)
-    for item in entries:
+    for item in all_entries:
         if args.align_max:
             item["cell_w"] = max_w
             item["cell_h"] = max_h
             item["offset_x"] = (max_w - item["w"]) // 2
             item["offset_y"] = (max_h - item["h"]) // 2
+            item["source_w"] = max_w
+            item["source_h"] = max_h
         else:
             item["cell_w"] = item["w"]
             item["cell_h"] = item["h"]
             item["offset_x"] = 0
             item["offset_y"] = 0
 
-    positions, width, height = pack_images(entries, args.max_width, args.padding)
+    allow_rotation = args.allow_rotation and args.packer != "shelf"
+    max_width = args.max_width
+    max_height = None
+    if args.max_size > 0:
+        # 与 pack_images 一致：最宽图块超过 max-width 时自动放宽，但不超过单页上限
+        widest = max(item["cell_w"] for item in entries)
+        max_width = min(max(max_width, widest), args.max_size)
+        max_height = args.max_size
+        if args.pot:
+            max_width, max_height = floor_pot(max_width), floor_pot(max_height)
+            if max_height != args.max_size:
+                print(f"提示：--pot 模式下单页上限按 {max_height}px 计算。")
+        pages = assign_pages(
+            entries,
+            group_entries(entries, args.group),
+            max_width,
+            max_height,
+            args.padding,
+            args.packer,
+            allow_rotation,
+        )
+    else:
+        if args.group:
+            print("提示：未设置 --max-size，分组提示不生效。")
+        pages = [entries]
 
     output_dir = input_dir.parent
     output_name = args.name or f"{input_dir.name}-atlas"
-    output_image = output_dir / f"{output_name}.png"
     output_json = output_dir / f"{output_name}.json"
 
-    atlas = build_atlas(entries, positions, width, height)
-    atlas.save(output_image)
+    positions: dict[str, dict] = {}
+    page_meta: list[dict] = []
+    used_area = total_area = 0
+    for page_index, page_entries in enumerate(pages):
+        page_positions, width, height = pack_images(
+            page_entries,
+            max_width,
+            args.padding,
+            packer=args.packer,
+            pot=args.pot,
+            allow_rotation=allow_rotation,
+            max_height=max_height,
+        )
+        for frame in page_positions.values():
+            frame["page"] = page_index
+        positions.update(page_positions)
+
+        # 单页时保持原文件名，多页时追加页码
+        suffix = f"-{page_index}" if len(pages) > 1 else ""
+        output_image = output_dir / f"{output_name}{suffix}.png"
+        atlas = build_atlas(page_entries, page_positions, width, height)
+        atlas.save(output_image)
+        page_meta.append({"image": output_image.name, "size": {"w": width, "h": height}})
+
+        efficiency = packing_efficiency(page_entries, width, height)
+        used_area += sum(item["cell_w"] * item["cell_h"] for item in page_entries)
+        total_area += width * height
+        print(f"图集已生成: {output_image}")
+        print(
+            f"尺寸: {width}x{height}，帧数: {len(page_entries)}，"
+            f"算法: {args.packer}，打包效率: {efficiency:.1%}"
+        )
 
-    print(f"图集已生成: {output_image}")
+    efficiency = used_area / total_area if total_area else 0.0
+    if len(pages) > 1:
+        print(f"共 {len(pages)} 页，整体打包效率: {efficiency:.1%}")
     if args.no_json:
         print("已跳过 JSON 输出（--no-json）")
         return
 
+    # 重复帧共享保留帧的图集区域，但裁切偏移按各自原图记录
     frames = {
-        item_id: {"frame": frame}
-        for item_id, frame in positions.items()
+        item["id"]: frame_record(item, positions[aliases.get(item["id"], item["id"])])
+        for item in all_entries
     }
     data = {
         "meta": {
-            "image": output_image.name,
-            "size": {"w": width, "h": height},
+            # image/size 指向第一页，兼容只读取单页的旧前端
+            "image": page_meta[0]["image"],
+            "size": page_meta[0]["size"],
+            "pages": page_meta,
+            "packer": args.packer,
+            "efficiency": round(efficiency, 4),
+            "duplicates": len(aliases),
         },
         "frames": frames,
     }
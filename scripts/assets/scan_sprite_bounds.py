@@ -2,17 +2,29 @@
 精灵图内容边界扫描工具
 - 用于识别图集每一帧真实内容区域（裁切掉黑边/透明边）
 - 输出每帧的内容矩形与建议配置
+- 整张图只计算一次内容掩码，所有帧的边界在一次数组归约中得到
+- RGBA 像素平面走共享解码缓存（image_cache），重复扫描同一张图时跳过解码
+- 未指定 --rows/--cols 时由内容掩码推断网格（grid_inference）
 """
 
 from __future__ import annotations
 
 import argparse
-from dataclasses import dataclass
-from typing import List, Tuple
+import json
+import sys
+from dataclasses import asdict, dataclass
+from typing import List, Tuple, Union
 try:
     from PIL import Image
 except ImportError as exc:
     raise SystemExit("缺少 Pillow 依赖，请先执行: python -m pip install Pillow") from exc
+try:
+    import numpy as np
+except ImportError as exc:
+    raise SystemExit("缺少 NumPy 依赖，请先执行: python -m pip install numpy") from exc
+
+from grid_inference import LOW_CONFIDENCE, describe, infer_grid
+from image_cache import load_plane
 
 
 @dataclass
@@ -32,6 +44,23 @@ def is_content(pixel: Tuple[int, int, int, int], threshold: int, alpha_threshold
     return max(r, g, b) > threshold
 
 
+def as_rgba_array(img: Union[Image.Image, np.ndarray]) -> np.ndarray:
+    if isinstance(img, np.ndarray):
+        return img
+    return np.asarray(img if img.mode == "RGBA" else img.convert("RGBA"))
+
+
+def content_mask(img: Union[Image.Image, np.ndarray], threshold: int, alpha_threshold: int) -> np.ndarray:
+    """与 is_content 语义一致的整图掩码：alpha > alpha_threshold 且 max(r, g, b) > threshold。
+
+    img 可以是 PIL 图像或 (h, w, 4) 的 RGBA 数组（如 image_cache.load_plane 的结果）。
+    """
+    rgba = as_rgba_array(img)
+    mask = rgba[..., 3] > alpha_threshold
+    mask &= rgba[..., :3].max(axis=2) > threshold
+    return mask
+
+
 def scan_bounds(
     img: Image.Image,
     x0: int,
@@ -41,53 +70,122 @@ def scan_bounds(
     threshold: int,
     alpha_threshold: int,
 ) -> Tuple[int, int, int, int]:
-    pixels = img.load()
-    left = None
-    right = None
-    top = None
-    bottom = None
-
-    for y in range(y0, y0 + h):
-        for x in range(x0, x0 + w):
-            if is_content(pixels[x, y], threshold, alpha_threshold):
-                top = y if top is None else min(top, y)
-                bottom = y if bottom is None else max(bottom, y)
-                left = x if left is None else min(left, x)
-                right = x if right is None else max(right, x)
-
-    if left is None or right is None or top is None or bottom is None:
+    region = img.crop((x0, y0, x0 + w, y0 + h))
+    mask = content_mask(region, threshold, alpha_threshold)
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
         return x0, y0, 0, 0
+    left = x0 + int(cols[0])
+    top = y0 + int(rows[0])
+    return left, top, int(cols[-1] - cols[0]) + 1, int(rows[-1] - rows[0]) + 1
+
+
+def scan_all_bounds(
+    img: Union[Image.Image, np.ndarray],
+    cols: int,
+    rows: int,
+    threshold: int,
+    alpha_threshold: int,
+) -> List[FrameBounds]:
+    """一次扫描整张图，返回按行优先排列的每帧内容矩形（与逐帧 scan_bounds 结果一致）。"""
+    rgba = as_rgba_array(img)
+    image_h, image_w = rgba.shape[:2]
+    frame_w = image_w // cols
+    frame_h = image_h // rows
+    if frame_w == 0 or frame_h == 0:
+        # 行/列数多于像素数：帧尺寸为 0，与逐帧 scan_bounds 一样每帧都是空矩形
+        return [
+            FrameBounds(col, row, col * frame_w, row * frame_h, 0, 0)
+            for row in range(rows)
+            for col in range(cols)
+        ]
+    mask = content_mask(rgba, threshold, alpha_threshold)
+    # 视图形状 (rows, frame_h, cols, frame_w)：每帧的行/列是否有内容各做一次归约
+    grid = mask[: rows * frame_h, : cols * frame_w].reshape(rows, frame_h, cols, frame_w)
+    line_hits = grid.any(axis=3).transpose(0, 2, 1)  # (rows, cols, frame_h)
+    column_hits = grid.any(axis=1)  # (rows, cols, frame_w)
+
+    has_content = line_hits.any(axis=2)
+    top = line_hits.argmax(axis=2)
+    bottom = frame_h - 1 - line_hits[..., ::-1].argmax(axis=2)
+    left = column_hits.argmax(axis=2)
+    right = frame_w - 1 - column_hits[..., ::-1].argmax(axis=2)
 
-    return left, top, right - left + 1, bottom - top + 1
+    bounds_list: List[FrameBounds] = []
+    for row in range(rows):
+        for col in range(cols):
+            x0 = col * frame_w
+            y0 = row * frame_h
+            if not has_content[row, col]:
+                bounds_list.append(FrameBounds(col, row, x0, y0, 0, 0))
+                continue
+            bounds_list.append(FrameBounds(
+                col,
+                row,
+                x0 + int(left[row, col]),
+                y0 + int(top[row, col]),
+                int(right[row, col] - left[row, col]) + 1,
+                int(bottom[row, col] - top[row, col]) + 1,
+            ))
+    return bounds_list
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="扫描精灵图每帧的内容边界")
     parser.add_argument("--image", required=True, help="图片路径")
-    parser.add_argument("--cols", type=int, required=True, help="列数")
-    parser.add_argument("--rows", type=int, required=True, help="行数")
+    parser.add_argument("--cols", type=int, help="列数（省略时由内容掩码推断）")
+    parser.add_argument("--rows", type=int, help="行数（省略时由内容掩码推断）")
     parser.add_argument("--threshold", type=int, default=5, help="亮度阈值 (0-255)")
     parser.add_argument("--alpha-threshold", type=int, default=0, help="透明阈值 (0-255)")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出（便于脚本/CI 消费）")
+    parser.add_argument("--output", help="写入 JSON 文件（隐含 --json）")
+    parser.add_argument("--no-cache", action="store_true", help="不读写共享解码缓存")
     args = parser.parse_args()
 
-    img = Image.open(args.image).convert("RGBA")
-    image_w, image_h = img.size
+    rgba = load_plane(args.image, "RGBA", use_cache=not args.no_cache)
+    image_h, image_w = rgba.shape[:2]
+
+    inference = None
+    if args.rows is None or args.cols is None:
+        mask = content_mask(rgba, args.threshold, args.alpha_threshold)
+        inference = infer_grid(mask.view(np.uint8))
+        args.rows = args.rows or inference["rows"]
+        args.cols = args.cols or inference["cols"]
+        if not args.json and not args.output:
+            print(describe(inference))
+        elif inference["confidence"] < LOW_CONFIDENCE:
+            print(f"[warn] {describe(inference)}", file=sys.stderr)
     frame_w = image_w // args.cols
     frame_h = image_h // args.rows
 
+    bounds_list = scan_all_bounds(rgba, args.cols, args.rows, args.threshold, args.alpha_threshold)
+
+    if args.json or args.output:
+        data = {
+            "image": args.image,
+            "imageW": image_w,
+            "imageH": image_h,
+            "cols": args.cols,
+            "rows": args.rows,
+            "frameW": frame_w,
+            "frameH": frame_h,
+            "threshold": args.threshold,
+            "alphaThreshold": args.alpha_threshold,
+            "frames": [asdict(bounds) for bounds in bounds_list],
+        }
+        if inference is not None:
+            data["gridInference"] = inference
+        output = json.dumps(data, ensure_ascii=False, indent=2)
+        print(output)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(output)
+        return
+
     print(f"image_size={image_w}x{image_h}")
     print(f"frame_size={frame_w}x{frame_h}")
 
-    bounds_list: List[FrameBounds] = []
-    for row in range(args.rows):
-        for col in range(args.cols):
-            x0 = col * frame_w
-            y0 = row * frame_h
-            left, top, width, height = scan_bounds(
-                img, x0, y0, frame_w, frame_h, args.threshold, args.alpha_threshold
-            )
-            bounds_list.append(FrameBounds(col, row, left, top, width, height))
-
     for idx, bounds in enumerate(bounds_list):
         print(
             f"frame[{idx}] col={bounds.col} row={bounds.row} x={bounds.x} y={bounds.y} "
@@ -35,7 +35,7 @@ if (existsSync('.env')) {
 // R2 配置
 const R2_ENDPOINT = `https://${process.env.R2_ACCOUNT_ID}.r2.cloudflarestorage.com`;
 const BUCKET_NAME = process.env.R2_BUCKET_NAME;
-const COMPRESSED_EXTS = new Set(['.ogg', '.webp']);
+const COMPRESSED_EXTS = new Set(['.ogg', '.webp', '.avif']);
 const COMPRESSED_DIR_NAME = 'compressed';
 const DATA_EXTS = new Set(['.svg']);
 const AUDIO_DIR_NAMES = new Set(['sfx', 'bgm']);